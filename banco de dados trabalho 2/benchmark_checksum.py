@@ -0,0 +1,38 @@
+# Custo do checksum por pacote: soma dos bytes (formato antigo) x CRC32
+#
+# Mede cada função isolada e o caminho completo de montar + ler um quadro,
+# para conteúdos do tamanho de um heartbeat, do pacote antigo (1 KiB) e de
+# um lote de replicação grande.
+#
+#   python benchmark_checksum.py
+
+import os
+import timeit
+
+from protocolo import calcular_checksum, checksum_antigo, montar_quadro, ler_quadro
+
+TAMANHOS = [0, 64, 1024, 16 * 1024, 256 * 1024]
+
+class _SocketFalso:
+    """Entrega um quadro já montado, como se viesse da rede."""
+
+    def __init__(self, dados):
+        self.dados = memoryview(dados)
+
+    def recv(self, n):
+        pedaco, self.dados = self.dados[:n], self.dados[n:]
+        return bytes(pedaco)
+
+def medir(funcao, repeticoes):
+    """Microssegundos por chamada (melhor de 5 rodadas)."""
+    return min(timeit.repeat(funcao, number=repeticoes, repeat=5)) / repeticoes * 1e6
+
+if __name__ == "__main__":
+    print(f"{'bytes':>8} {'soma us':>9} {'crc32 us':>9} {'x':>6} {'quadro us':>10}")
+    for tamanho in TAMANHOS:
+        dados = os.urandom(tamanho)
+        repeticoes = max(10, 2_000_000 // max(tamanho, 1000))
+        soma = medir(lambda: checksum_antigo(dados), repeticoes)
+        crc = medir(lambda: calcular_checksum(dados), repeticoes)
+        ida_e_volta = medir(lambda: ler_quadro(_SocketFalso(montar_quadro(2, 1, dados))), repeticoes)
+        print(f"{tamanho:>8} {soma:>9.2f} {crc:>9.2f} {soma / crc if crc else 0:>6.0f} {ida_e_volta:>10.2f}")
@@ -0,0 +1,139 @@
+# Vazão de comandos SQL em função do tamanho do pool de conexões
+#
+# Usa um "MySQL de mentira" sobre SQLite (não precisa de servidor nem do
+# mysql.connector): cada comando espera 'latencia' segundos, como a ida e
+# volta até um servidor na rede, e pode derrubar a conexão com probabilidade
+# 'quedas' para exercitar a reconexão do pool. Os comandos passam pelo mesmo
+# caminho do middleware: ThreadPoolExecutor + PoolConexoes.
+#
+#   python benchmark_pool.py --tamanhos 1 2 4 8 --comandos 2000 --latencia 0.002
+
+import os
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from pool_conexoes import PoolConexoes
+
+class ConexaoCaiu(Exception):
+    pass
+
+class _Cursor:
+    def __init__(self, conexao):
+        self.conexao = conexao
+        self.cursor = conexao.sqlite.cursor()
+
+    def execute(self, comando, parametros=()):
+        if not self.conexao.ativa:
+            raise ConexaoCaiu("Conexão fechada")
+        time.sleep(self.conexao.latencia)
+        if random.random() < self.conexao.quedas:
+            self.conexao.ativa = False
+            raise ConexaoCaiu("Conexão perdida durante o comando")
+        self.cursor.execute(comando.replace("%s", "?"), parametros)
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    def close(self):
+        self.cursor.close()
+
+class ConexaoSQLite:
+    """O pedaço da interface de mysql.connector que o middleware usa."""
+
+    def __init__(self, arquivo, latencia, quedas):
+        self.sqlite = sqlite3.connect(arquivo, timeout=30, check_same_thread=False)
+        self.latencia = latencia
+        self.quedas = quedas
+        self.ativa = True
+
+    def cursor(self):
+        return _Cursor(self)
+
+    def commit(self):
+        self.sqlite.commit()
+
+    def rollback(self):
+        self.sqlite.rollback()
+
+    def is_connected(self):
+        return self.ativa
+
+    def ping(self):
+        if not self.ativa:
+            raise ConexaoCaiu("Conexão fechada")
+        time.sleep(self.latencia)
+
+    def close(self):
+        self.ativa = False
+        self.sqlite.close()
+
+def preparar_banco(arquivo, linhas=1000):
+    conn = sqlite3.connect(arquivo)
+    conn.execute("PRAGMA journal_mode=WAL") # Leitores não bloqueiam o escritor
+    conn.execute("CREATE TABLE clientes (id INTEGER PRIMARY KEY, nome TEXT, saldo REAL)")
+    conn.executemany("INSERT INTO clientes (nome, saldo) VALUES (?, ?)",
+                     [(f"cliente {i}", 100.0) for i in range(linhas)])
+    conn.commit()
+    conn.close()
+
+def executar(pool, comando, parametros):
+    """Um comando com cursor próprio; retorna a latência ou None se falhou."""
+    inicio = time.perf_counter()
+    try:
+        with pool.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute(comando, parametros)
+            cursor.fetchall()
+            conn.commit()
+            cursor.close()
+    except Exception:
+        return None
+    return time.perf_counter() - inicio
+
+def medir(arquivo, tamanho, comandos, latencia, escritas, quedas):
+    pool = PoolConexoes(lambda: ConexaoSQLite(arquivo, latencia, quedas), tamanho)
+    lista = []
+    for _ in range(comandos):
+        if random.random() < escritas:
+            lista.append(("UPDATE clientes SET saldo = saldo + 1 WHERE id = %s", (random.randint(1, 1000),)))
+        else:
+            lista.append(("SELECT nome, saldo FROM clientes WHERE id = %s", (random.randint(1, 1000),)))
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=tamanho) as executor:
+        tempos = list(executor.map(lambda c: executar(pool, *c), lista))
+    duracao = time.perf_counter() - inicio
+
+    ok = sorted(t for t in tempos if t is not None)
+    resumo = pool.resumo()
+    pool.fechar()
+    return {
+        'pool': tamanho,
+        'cmd_s': comandos / duracao,
+        'p50_ms': ok[len(ok) // 2] * 1000 if ok else 0.0,
+        'p95_ms': ok[int(len(ok) * 0.95)] * 1000 if ok else 0.0,
+        'falhas': comandos - len(ok),
+        'criadas': resumo['criadas'],
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vazão de comandos SQL x tamanho do pool")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--comandos", type=int, default=2000)
+    parser.add_argument("--latencia", type=float, default=0.002, help="Ida e volta simulada por comando (s)")
+    parser.add_argument("--escritas", type=float, default=0.2, help="Fração de UPDATEs")
+    parser.add_argument("--quedas", type=float, default=0.0, help="Probabilidade de a conexão cair num comando")
+    args = parser.parse_args()
+
+    print(f"{'pool':>5} {'cmd/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'falhas':>7} {'conexões':>9}")
+    with tempfile.TemporaryDirectory() as pasta:
+        for tamanho in args.tamanhos:
+            arquivo = os.path.join(pasta, f"pool_{tamanho}.db")
+            preparar_banco(arquivo)
+            r = medir(arquivo, tamanho, args.comandos, args.latencia, args.escritas, args.quedas)
+            print(f"{r['pool']:>5} {r['cmd_s']:>9.0f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} "
+                  f"{r['falhas']:>7} {r['criadas']:>9}")
@@ -1,12 +1,13 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
 import socket
-import struct
 import threading
+import json
+from protocolo import montar_quadro
 
-# --- CONFIGURAÇÃO DO PROTOCOLO (Igual ao Middleware) ---
-FORMATO_PACOTE = "ii1024sQ"
+# --- CONFIGURAÇÃO DO PROTOCOLO (Igual ao Middleware, formato em protocolo.py) ---
 MSG_QUERY = 2
+MSG_METRICAS = 7
 
 class ClienteGUI:
     def __init__(self, root):
@@ -43,6 +44,9 @@ class ClienteGUI:
         btn_enviar = ttk.Button(frame_sql, text="ENVIAR COMANDO ➤", command=self.enviar_thread)
         btn_enviar.pack(pady=5, fill="x")
 
+        btn_metricas = ttk.Button(frame_sql, text="MÉTRICAS DO NÓ", command=self.metricas_thread)
+        btn_metricas.pack(pady=5, fill="x")
+
         # --- ÁREA DE LOG ---
         frame_log = ttk.LabelFrame(root, text=" Log do Sistema ", padding=10)
         frame_log.pack(fill="both", expand=True, padx=10, pady=10)
@@ -55,9 +59,6 @@ class ClienteGUI:
         self.txt_log.insert(tk.END, f">> {mensagem}\n")
         self.txt_log.see(tk.END)
 
-    def calcular_checksum(self, conteudo_bytes):
-        return sum(conteudo_bytes)
-
     def enviar_thread(self):
         # Roda o envio em background para não travar a tela
         threading.Thread(target=self.enviar_comando, daemon=True).start()
@@ -77,10 +78,7 @@ class ClienteGUI:
             # 1. Preparar Pacote
             tipo = MSG_QUERY
             id_origem = 0 
-            conteudo_bytes = sql.encode('utf-8')[:1024].ljust(1024, b'\0')
-            checksum = self.calcular_checksum(conteudo_bytes)
-
-            pacote = struct.pack(FORMATO_PACOTE, tipo, id_origem, conteudo_bytes, checksum)
+            pacote = montar_quadro(tipo, id_origem, sql)
 
             # 2. Conectar e Enviar
             s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -107,6 +105,34 @@ class ClienteGUI:
         except Exception as e:
             self.log(f"ERRO: {e}")
 
+    def metricas_thread(self):
+        threading.Thread(target=self.pedir_metricas, daemon=True).start()
+
+    def pedir_metricas(self):
+        porta = self.porta_var.get()
+        ip = "localhost"
+        try:
+            pacote = montar_quadro(MSG_METRICAS, 0)
+            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            s.settimeout(3)
+            s.connect((ip, porta))
+            s.sendall(pacote)
+
+            # A resposta pode ser grande: lê até o nó fechar a conexão
+            resp = b''
+            while True:
+                chunk = s.recv(4096)
+                if not chunk: break
+                resp += chunk
+            s.close()
+
+            metricas = json.loads(resp.decode('utf-8'))
+            self.log(f"Métricas do Nó {porta - 5000}:")
+            for fila, valores in metricas.items():
+                self.log(f"  {fila}: " + ", ".join(f"{k}={v}" for k, v in valores.items()))
+        except Exception as e:
+            self.log(f"ERRO ao pedir métricas: {e}")
+
 if __name__ == "__main__":
     root = tk.Tk()
     app = ClienteGUI(root)
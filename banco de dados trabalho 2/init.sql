@@ -2,4 +2,11 @@ CREATE TABLE IF NOT EXISTS clientes (
     id INT AUTO_INCREMENT PRIMARY KEY,
     nome VARCHAR(100) NOT NULL,
     criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
\ No newline at end of file
+);
+-- Log de replicação: escritas numeradas pelo líder, aplicadas em ordem em cada nó
+CREATE TABLE IF NOT EXISTS log_replicacao (
+    seq BIGINT PRIMARY KEY,
+    mandato VARCHAR(64) NOT NULL DEFAULT '', -- Líder (e eleição) que criou a entrada
+    comando MEDIUMTEXT NOT NULL,
+    aplicado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -1,9 +1,13 @@
 import socket
 import threading
 import time
-import struct
 import os
+import json
+import queue
+from collections import deque
 import mysql.connector
+from pool_conexoes import PoolConexoes, TAMANHO_POOL
+from protocolo import montar_quadro, ler_quadro, ChecksumInvalido, MAX_CONTEUDO
 
 # --- CONFIGURAÇÕES ---
 # Pega do Docker ou usa localhost
@@ -12,13 +16,119 @@ DB_USER = "root"
 DB_PASS = "root"
 DB_NAME = "banco_distribuido"
 
-FORMATO_PACOTE = "ii1024sQ"
-TAMANHO_PACOTE = struct.calcsize(FORMATO_PACOTE)
-
+# Formato dos pacotes: ver protocolo.py
 MSG_HEARTBEAT = 1
 MSG_QUERY = 2
 MSG_ELEICAO = 3
 MSG_COORDENADOR = 4
+MSG_REPLICACAO = 5      # Líder -> seguidor: {"anterior": [seq, mandato], "entradas": [[seq, mandato, sql], ...]}
+MSG_ACK_REPLICACAO = 6  # Seguidor -> líder: {"posicao", "mandato", "divergente"} da última entrada aplicada
+MSG_METRICAS = 7        # Cliente -> nó: responde na mesma conexão com as métricas (JSON)
+MSG_PEDIR_LOG = 8       # Líder -> seguidor à frente dele: entradas após esta posição
+MSG_LOG = 9             # Seguidor -> líder: resposta ao MSG_PEDIR_LOG (mesmo formato do MSG_REPLICACAO)
+
+# --- SERVIDOR ---
+# O accept só entrega cada conexão a uma thread que lê o pacote e o coloca
+# numa fila; um cliente lento não segura os outros. Mensagens de
+# controle (heartbeat, eleição, coordenador e os ACKs da replicação, que não
+# tocam no banco) têm uma thread só para elas e nunca esperam atrás das
+# consultas nem são descartadas com a fila de requisições cheia. Só as
+# leituras rodam em paralelo, em TRABALHADORES threads; escritas (executadas
+# no líder ou encaminhadas a ele) e lotes de replicação passam por uma
+# thread única, na ordem do accept.
+#
+# O accept nunca para: com MAX_LEITORES conexões sendo lidas, as novas
+# esperam numa fila que as threads leitoras esvaziam ao terminar, e só
+# além de MAX_ESPERA_LEITURA são recusadas (fechadas e contadas).
+MSGS_CONTROLE = (MSG_HEARTBEAT, MSG_ELEICAO, MSG_COORDENADOR, MSG_ACK_REPLICACAO)
+TRABALHADORES = int(os.getenv('TRABALHADORES', str(TAMANHO_POOL)))  # Uma conexão do pool para cada
+MAX_FILA_REQUISICOES = 1000  # Com a fila cheia, pacotes novos são descartados
+BACKLOG = 128                # Conexões esperando o accept
+MAX_LEITORES = 64            # Conexões sendo lidas ao mesmo tempo (uma thread cada)
+MAX_ESPERA_LEITURA = 1024    # Conexões aceitas esperando um leitor livre
+TIMEOUT_LEITURA = 2.0        # Tempo máximo para um cliente enviar o pacote inteiro
+AMOSTRAS_METRICAS = 1000     # Latências guardadas por fila (as mais recentes)
+
+# --- REPLICAÇÃO ---
+# Escritas vão para o líder, que as numera num log (tabela log_replicacao,
+# presente em todos os nós) e as envia em lotes aos seguidores, que as
+# aplicam em ordem. Cada seguidor responde com a posição aplicada; quem
+# está atrasado recebe o que falta a partir do log, sem dump completo.
+# Uma entrada que falha num seguidor não é pulada: ele para nela (o líder
+# reenvia a partir dali) e a falha aparece nas métricas até ser aplicada.
+#
+# Cada entrada leva o mandato do líder que a criou (id do nó + instante da
+# eleição). Mandatos diferentes na mesma posição são logs que divergiram:
+# o lote é recusado e a divergência aparece nas métricas, em vez de as
+# escritas novas serem puladas como "já aplicadas". Como a eleição escolhe
+# o maior id, e não o log mais completo, um líder novo só aceita escritas
+# depois de ouvir os seguidores e buscar deles as entradas que lhe faltam.
+INTERVALO_REPLICACAO = 0.5   # Segundos entre rodadas de envio (ou antes, se houver escrita nova)
+TIMEOUT_REPLICACAO = 2.0     # Sem ACK nesse tempo, o lote é reenviado
+LOTE_REPLICACAO = 500        # Máximo de entradas por pacote (também limitado a MAX_CONTEUDO bytes)
+TENTATIVAS_ENCAMINHAMENTO = 3  # Envios de uma escrita ao líder antes de descartá-la
+ESPERA_SINCRONIZACAO = 2.0   # Líder novo: espera máxima pelas posições dos seguidores
+TIMEOUT_SINCRONIZACAO = 5.0  # Escrita que chega durante a sincronização espera até isso; depois é recusada
+COMANDOS_LEITURA = ("SELECT", "SHOW", "DESCRIBE", "DESC", "EXPLAIN")
+
+def eh_leitura(comando):
+    palavras = comando.split(None, 1)
+    return bool(palavras) and palavras[0].upper().rstrip(";") in COMANDOS_LEITURA
+
+def percentil(amostras, p):
+    if not amostras:
+        return 0.0
+    ordenadas = sorted(amostras)
+    return ordenadas[min(int(len(ordenadas) * p), len(ordenadas) - 1)]
+
+class Fila:
+    """Fila de pacotes consumida por threads próprias, com métricas de profundidade e latência."""
+
+    def __init__(self, nome, trabalhadores, tratar, tamanho_max=0):
+        self.nome = nome
+        self.fila = queue.Queue(tamanho_max)
+        self.tratar = tratar
+        self.lock = threading.Lock()
+        self.processados = 0
+        self.descartados = 0
+        self.profundidade_max = 0
+        self.esperas = deque(maxlen=AMOSTRAS_METRICAS)   # Tempo na fila
+        self.execucoes = deque(maxlen=AMOSTRAS_METRICAS) # Tempo processando
+        for _ in range(trabalhadores):
+            threading.Thread(target=self.consumir, daemon=True).start()
+
+    def colocar(self, dados):
+        try:
+            self.fila.put_nowait((time.monotonic(), dados))
+        except queue.Full:
+            with self.lock:
+                self.descartados += 1
+            return False
+        with self.lock:
+            self.profundidade_max = max(self.profundidade_max, self.fila.qsize())
+        return True
+
+    def consumir(self):
+        while True:
+            chegada, dados = self.fila.get()
+            inicio = time.monotonic()
+            self.tratar(dados)
+            fim = time.monotonic()
+            with self.lock:
+                self.processados += 1
+                self.esperas.append(inicio - chegada)
+                self.execucoes.append(fim - inicio)
+
+    def metricas(self):
+        with self.lock:
+            esperas, execucoes = list(self.esperas), list(self.execucoes)
+            m = {'profundidade': self.fila.qsize(), 'profundidade_max': self.profundidade_max,
+                 'processados': self.processados, 'descartados': self.descartados}
+        for nome, amostras in (('espera', esperas), ('execucao', execucoes)):
+            m[f'{nome}_p50_ms'] = round(percentil(amostras, 0.5) * 1000, 2)
+            m[f'{nome}_p95_ms'] = round(percentil(amostras, 0.95) * 1000, 2)
+            m[f'{nome}_max_ms'] = round(max(amostras, default=0.0) * 1000, 2)
+        return m
 
 class Node:
     def __init__(self):
@@ -27,6 +137,23 @@ class Node:
         self.lider_id = 0
         self.em_eleicao = False
         self.ultimo_heartbeat = time.time()
+        self.quadros_rejeitados = 0  # Checksum não conferiu
+        self.conexoes_recusadas = 0  # Aceitas com a espera por leitor cheia
+
+        # Acesso ao banco: cada requisição pega uma conexão do pool
+        self.pool = PoolConexoes(self.nova_conexao_db, TAMANHO_POOL)
+
+        # Replicação
+        self.lock_log = threading.Lock() # Escritas no log (e sua aplicação) são feitas uma de cada vez, em ordem
+        self.ultimo_seq = 0              # Última entrada do log aplicada neste nó
+        self.ultimo_mandato = ''         # Mandato dessa entrada
+        self.mandato = ''                # (no líder) mandato das entradas novas
+        self.lider_desde = 0.0           # (no líder) instante da eleição
+        self.posicoes = {}               # (no líder) id do seguidor -> (última entrada que ele aplicou, mandato)
+        self.enviado_em = {}             # (no líder) id do seguidor -> instante do último lote enviado
+        self.divergentes = {}            # (no líder) id do seguidor -> posição em que o log dele diverge
+        self.falha_replicacao = None     # (no seguidor) entrada parada: {'seq', 'erro', 'tentativas'}
+        self.evento_replicacao = threading.Event()
         
         self.carregar_config()
 
@@ -36,9 +163,11 @@ class Node:
         while not self.conectar_db():
             time.sleep(2)
         print("Banco Conectado!")
+        self.preparar_log()
 
         # Inicia Monitoramento (Eleição)
         threading.Thread(target=self.rotina_monitoramento, daemon=True).start()
+        threading.Thread(target=self.rotina_replicacao, daemon=True).start()
 
     def carregar_config(self):
         try:
@@ -64,35 +193,65 @@ class Node:
             print(f"ERRO config.txt: {e}")
             exit(1)
 
+    def nova_conexao_db(self):
+        return mysql.connector.connect(
+            host=DB_HOST, user=DB_USER, password=DB_PASS, database=DB_NAME
+        )
+
     def conectar_db(self):
         try:
-            self.conn = mysql.connector.connect(
-                host=DB_HOST, user=DB_USER, password=DB_PASS, database=DB_NAME
-            )
-            return True
+            with self.pool.conexao():
+                return True
         except:
             return False
 
+    def preparar_log(self):
+        """Cria a tabela do log (bancos antigos não rodaram o init.sql novo) e lê a posição."""
+        with self.pool.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS log_replicacao ("
+                "seq BIGINT PRIMARY KEY, mandato VARCHAR(64) NOT NULL DEFAULT '', "
+                "comando MEDIUMTEXT NOT NULL, aplicado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+            )
+            conn.commit()
+            try:
+                # Tabela criada antes dos mandatos
+                cursor.execute("ALTER TABLE log_replicacao ADD COLUMN mandato VARCHAR(64) NOT NULL DEFAULT ''")
+                conn.commit()
+            except Exception:
+                conn.rollback() # A coluna já existe
+            cursor.execute("SELECT seq, mandato FROM log_replicacao ORDER BY seq DESC LIMIT 1")
+            linha = cursor.fetchone()
+            if linha:
+                self.ultimo_seq, self.ultimo_mandato = linha
+            conn.commit()
+            cursor.close()
+        print(f"Log de replicação na posição {self.ultimo_seq}")
+
+    def vizinho(self, nid):
+        for viz in self.vizinhos:
+            if viz['id'] == nid:
+                return viz
+        return None
+
     def enviar(self, ip, porta, tipo, conteudo=""):
         try:
             s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             s.settimeout(1) 
             s.connect((ip, porta))
             
-            dado_bytes = conteudo.encode('utf-8')[:1024].ljust(1024, b'\0')
-            chk = sum(dado_bytes)
-            pkt = struct.pack(FORMATO_PACOTE, tipo, self.meu_id, dado_bytes, chk)
-            
+            pkt = montar_quadro(tipo, self.meu_id, conteudo)
             s.sendall(pkt)
             s.close()
             return True
         except:
             return False
 
-    def processar_pacote(self, dados):
+    def processar_pacote(self, pacote):
         try:
-            tipo, origem, conteudo_raw, chk = struct.unpack(FORMATO_PACOTE, dados)
-            conteudo = conteudo_raw.decode('utf-8').strip('\x00')
+            tipo, origem, conteudo_raw, chk = pacote
+            conteudo = conteudo_raw.decode('utf-8')
             
             if tipo == MSG_HEARTBEAT:
                 if origem == self.lider_id:
@@ -100,10 +259,27 @@ class Node:
 
             elif tipo == MSG_QUERY:
                 print(f"--> SQL de {origem}: {conteudo}")
-                cursor = self.conn.cursor()
-                cursor.execute(conteudo)
-                self.conn.commit()
-                cursor.close()
+                self.tratar_query(conteudo)
+
+            elif tipo == MSG_REPLICACAO:
+                if origem == self.lider_id and origem != self.meu_id:
+                    self.aplicar_lote(origem, json.loads(conteudo))
+
+            elif tipo == MSG_ACK_REPLICACAO:
+                if self.lider_id == self.meu_id:
+                    self.registrar_ack(origem, json.loads(conteudo))
+
+            elif tipo == MSG_PEDIR_LOG:
+                lider = self.vizinho(origem)
+                if origem == self.lider_id and lider:
+                    self.enviar(lider['ip'], lider['porta'], MSG_LOG, json.dumps(self.ler_log(int(conteudo))))
+
+            elif tipo == MSG_LOG:
+                if self.lider_id == self.meu_id:
+                    if not self.aplicar_entradas(json.loads(conteudo)):
+                        self.marcar_divergente(origem, self.ultimo_seq)
+                    self.enviado_em.pop(origem, None)
+                    self.evento_replicacao.set()
                 
             elif tipo == MSG_ELEICAO:
                 print(f"--> Eleição de {origem}. Sou maior, vou assumir.")
@@ -119,6 +295,219 @@ class Node:
         except Exception as e:
             print(f"Erro pacote: {e}")
 
+    # --- Replicação ---
+
+    def tratar_query(self, comando):
+        """Leituras rodam aqui mesmo; escritas vão para o log do líder."""
+        if eh_leitura(comando):
+            with self.pool.conexao() as conn:
+                cursor = conn.cursor()
+                cursor.execute(comando)
+                linhas = cursor.fetchall()
+                conn.commit() # Encerra a transação de leitura antes de devolver a conexão
+                cursor.close()
+            print(f"    {len(linhas)} linha(s): {linhas[:10]}")
+            return
+
+        if self.lider_id == self.meu_id:
+            self.registrar_escrita(comando)
+            return
+        lider = self.vizinho(self.lider_id)
+        for _ in range(TENTATIVAS_ENCAMINHAMENTO if lider else 0):
+            if self.enviar(lider['ip'], lider['porta'], MSG_QUERY, comando):
+                print(f"    Encaminhada ao líder {self.lider_id}")
+                return
+            time.sleep(0.2)
+        print(f"!!! Escrita descartada: líder {self.lider_id} indisponível !!!")
+
+    def registrar_escrita(self, comando):
+        """(Líder) Executa a escrita e a acrescenta ao log, na mesma transação."""
+        if not self.cabe_no_pacote([[self.ultimo_seq + 1, self.mandato, comando]]):
+            print("!!! Escrita grande demais para ser replicada; recusada !!!")
+            return
+        if not self.aguardar_sincronizacao():
+            print("!!! Escrita recusada: líder ainda sincronizando o log com os seguidores !!!")
+            return
+        with self.lock_log, self.pool.conexao() as conn:
+            seq = self.ultimo_seq + 1
+            cursor = conn.cursor()
+            try:
+                cursor.execute(comando)
+                cursor.execute("INSERT INTO log_replicacao (seq, mandato, comando) VALUES (%s, %s, %s)",
+                               (seq, self.mandato, comando))
+                conn.commit()
+                self.ultimo_seq, self.ultimo_mandato = seq, self.mandato
+            except Exception as e:
+                conn.rollback()
+                print(f"Erro na escrita (não replicada): {e}")
+                return
+            finally:
+                cursor.close()
+        print(f"    Entrada #{seq} no log")
+        self.evento_replicacao.set()
+
+    def sincronizado(self):
+        """(Líder) Já ouviu os seguidores (ou esperou ESPERA_SINCRONIZACAO) e nenhum está à frente do log local."""
+        outros = [v['id'] for v in self.vizinhos if v['id'] != self.meu_id and v['id'] not in self.divergentes]
+        posicoes = [self.posicoes.get(nid) for nid in outros]
+        if any(p and p[0] > self.ultimo_seq for p in posicoes):
+            return False
+        return all(posicoes) or time.time() - self.lider_desde >= ESPERA_SINCRONIZACAO
+
+    def aguardar_sincronizacao(self):
+        limite = time.time() + TIMEOUT_SINCRONIZACAO
+        while not self.sincronizado():
+            if time.time() >= limite or self.lider_id != self.meu_id:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def aplicar_entradas(self, lote):
+        """
+        Aplica em ordem as entradas seguintes à posição local. Retorna False,
+        sem aplicar nada, se o lote e o log local têm mandatos diferentes numa
+        mesma posição (os logs divergiram).
+        """
+        entradas = lote['entradas']
+        conferir = entradas if lote['anterior'] is None else [lote['anterior']] + entradas
+        aplicadas = 0
+        with self.lock_log, self.pool.conexao() as conn:
+            cursor = conn.cursor()
+            # Posições que os dois logs já têm devem ter vindo do mesmo mandato
+            comuns = {e[0]: e[1] for e in conferir if e[0] <= self.ultimo_seq}
+            divergentes = []
+            if comuns:
+                cursor.execute("SELECT seq, mandato FROM log_replicacao WHERE seq BETWEEN %s AND %s",
+                               (min(comuns), max(comuns)))
+                locais = dict(cursor.fetchall())
+                conn.commit()
+                divergentes = [seq for seq, mandato in comuns.items() if locais.get(seq, mandato) != mandato]
+            for seq, mandato, comando in ([] if divergentes else entradas):
+                if seq <= self.ultimo_seq:
+                    continue # Já aplicada (lote reenviado)
+                if seq != self.ultimo_seq + 1:
+                    break # Buraco: o ACK abaixo faz o líder reenviar a partir daqui
+                try:
+                    cursor.execute(comando)
+                    cursor.execute("INSERT INTO log_replicacao (seq, mandato, comando) VALUES (%s, %s, %s)",
+                                   (seq, mandato, comando))
+                    conn.commit()
+                except Exception as e:
+                    # Pular a entrada faria a réplica divergir: paramos nela e o ACK
+                    # abaixo mantém a posição anterior, então o líder a reenvia
+                    conn.rollback()
+                    self.registrar_falha_replicacao(seq, e)
+                    break
+                self.ultimo_seq, self.ultimo_mandato = seq, mandato
+                aplicadas += 1
+            cursor.close()
+        if divergentes:
+            print(f"!!! Log divergente na posição {min(divergentes)}; lote recusado !!!")
+            return False
+        if aplicadas:
+            print(f"--> {aplicadas} entrada(s) replicada(s), posição {self.ultimo_seq}")
+        if self.falha_replicacao and self.ultimo_seq >= self.falha_replicacao['seq']:
+            print(f"--> Entrada #{self.falha_replicacao['seq']} aplicada; replicação retomada")
+            self.falha_replicacao = None
+        return True
+
+    def aplicar_lote(self, lider, lote):
+        """(Seguidor) Aplica o lote do líder e confirma a posição, ou avisa que os logs divergem."""
+        convergente = self.aplicar_entradas(lote)
+        if not convergente:
+            self.registrar_falha_replicacao(self.ultimo_seq, "log divergente do líder")
+        viz = self.vizinho(lider)
+        if viz:
+            ack = {'posicao': self.ultimo_seq, 'mandato': self.ultimo_mandato, 'divergente': not convergente}
+            self.enviar(viz['ip'], viz['porta'], MSG_ACK_REPLICACAO, json.dumps(ack))
+
+    def registrar_ack(self, origem, ack):
+        """(Líder) Guarda a posição confirmada; se ela avançou, o próximo lote sai já."""
+        if ack['divergente']:
+            self.marcar_divergente(origem, ack['posicao'])
+            return
+        anterior = self.posicoes.get(origem)
+        self.posicoes[origem] = (ack['posicao'], ack['mandato'])
+        # Sem avanço (entrada falhando no seguidor): reenvia só após TIMEOUT_REPLICACAO
+        if anterior is None or ack['posicao'] > anterior[0]:
+            self.enviado_em.pop(origem, None)
+            self.evento_replicacao.set()
+
+    def marcar_divergente(self, nid, posicao):
+        """(Líder) Para de replicar para um seguidor cujo log diverge do local."""
+        if nid not in self.divergentes:
+            print(f"!!! Log do nó {nid} diverge do líder (posição {posicao}); replicação para ele suspensa !!!")
+        self.divergentes[nid] = posicao
+
+    def registrar_falha_replicacao(self, seq, erro):
+        anterior = self.falha_replicacao
+        tentativas = anterior['tentativas'] if anterior and anterior['seq'] == seq else 0
+        if not tentativas:
+            print(f"!!! Entrada #{seq} falhou aqui ({erro}); replicação parada nela !!!")
+        # Dicionário novo a cada vez: metricas() o lê sem lock
+        self.falha_replicacao = {'seq': seq, 'erro': str(erro), 'tentativas': tentativas + 1}
+
+    def cabe_no_pacote(self, entradas):
+        return len(json.dumps(entradas).encode('utf-8')) <= MAX_CONTEUDO
+
+    def ler_log(self, depois_de):
+        """Lote com as entradas após 'depois_de' (até encher um pacote) e o mandato da entrada 'depois_de'."""
+        with self.pool.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT seq, mandato, comando FROM log_replicacao WHERE seq >= %s ORDER BY seq LIMIT %s",
+                (depois_de, LOTE_REPLICACAO + 1)
+            )
+            linhas = cursor.fetchall()
+            conn.commit() # Encerra a transação de leitura (REPEATABLE READ)
+            cursor.close()
+        anterior = None
+        if linhas and linhas[0][0] == depois_de:
+            anterior = list(linhas.pop(0)[:2])
+        lote = {'anterior': anterior, 'entradas': []}
+        for seq, mandato, comando in linhas[:LOTE_REPLICACAO]:
+            lote['entradas'].append([seq, mandato, comando])
+            if not self.cabe_no_pacote(lote):
+                lote['entradas'].pop()
+                break
+        return lote
+
+    def rotina_replicacao(self):
+        """(Líder) Envia a cada seguidor o que ele ainda não confirmou, um lote por vez."""
+        while True:
+            self.evento_replicacao.wait(INTERVALO_REPLICACAO)
+            self.evento_replicacao.clear()
+            if self.lider_id != self.meu_id:
+                self.posicoes.clear()
+                self.enviado_em.clear()
+                self.divergentes.clear()
+                continue
+            with self.lock_log:
+                topo = (self.ultimo_seq, self.ultimo_mandato)
+            agora = time.time()
+            for viz in self.vizinhos:
+                nid = viz['id']
+                if nid == self.meu_id or nid in self.divergentes:
+                    continue
+                posicao = self.posicoes.get(nid)
+                if posicao == topo:
+                    continue # Em dia
+                if posicao is not None and posicao[0] == topo[0]:
+                    self.marcar_divergente(nid, topo[0]) # Mesma posição, mandatos diferentes
+                    continue
+                if agora - self.enviado_em.get(nid, 0) < TIMEOUT_REPLICACAO:
+                    continue # Lote anterior ainda sem ACK
+                if posicao is None:
+                    # Posição desconhecida (novo líder): lote vazio só para o seguidor informar onde está
+                    tipo, conteudo = MSG_REPLICACAO, {'anterior': None, 'entradas': []}
+                elif posicao[0] > topo[0]:
+                    # Seguidor à frente deste líder: busca dele as entradas que faltam
+                    tipo, conteudo = MSG_PEDIR_LOG, topo[0]
+                else:
+                    tipo, conteudo = MSG_REPLICACAO, self.ler_log(posicao[0])
+                if self.enviar(viz['ip'], viz['porta'], tipo, json.dumps(conteudo)):
+                    self.enviado_em[nid] = agora
+
     def iniciar_eleicao(self):
         if self.em_eleicao: return
         self.em_eleicao = True
@@ -132,6 +521,11 @@ class Node:
         
         if not maior_respondeu:
             print(f">>> EU ({self.meu_id}) SOU O LIDER <<<")
+            self.posicoes.clear()
+            self.enviado_em.clear()
+            self.divergentes.clear()
+            self.mandato = f"{self.meu_id}-{time.time_ns()}"
+            self.lider_desde = time.time()
             self.lider_id = self.meu_id
             self.em_eleicao = False
             for viz in self.vizinhos:
@@ -155,25 +549,119 @@ class Node:
                     print(f"!!! Timeout Lider {self.lider_id} !!!")
                     self.iniciar_eleicao()
 
-    def server_loop(self):
+    def metricas(self):
+        return {'controle': self.fila_controle.metricas(),
+                'requisicoes': self.fila_requisicoes.metricas(),
+                'escritas': self.fila_escritas.metricas(),
+                'pool': self.pool.resumo(),
+                'replicacao': {'posicao': self.ultimo_seq, 'falha': self.falha_replicacao,
+                               'divergentes': self.divergentes},
+                'rede': {'quadros_rejeitados': self.quadros_rejeitados,
+                         'conexoes_recusadas': self.conexoes_recusadas,
+                         'esperando_leitor': len(self.espera_leitura)}}
+
+    def fila_do_pacote(self, pacote):
+        """Escritas e replicação vão para a fila de thread única, que preserva a ordem."""
+        tipo, _, conteudo, _ = pacote
+        if tipo == MSG_REPLICACAO:
+            return self.fila_escritas
+        if tipo == MSG_QUERY and not eh_leitura(conteudo.decode('utf-8', 'replace')):
+            return self.fila_escritas
+        return self.fila_requisicoes
+
+    def atender(self, conn, ordem):
+        """Lê o pacote de uma conexão (na thread dela) e o coloca na fila certa."""
+        escrita = None
+        try:
+            conn.settimeout(TIMEOUT_LEITURA)
+            pacote = ler_quadro(conn)
+            if pacote:
+                tipo = pacote[0]
+                if tipo == MSG_METRICAS:
+                    conn.sendall(json.dumps(self.metricas()).encode('utf-8'))
+                elif tipo in MSGS_CONTROLE:
+                    self.fila_controle.colocar(pacote)
+                else:
+                    fila = self.fila_do_pacote(pacote)
+                    if fila is self.fila_escritas:
+                        escrita = pacote
+                    elif not fila.colocar(pacote):
+                        print("!!! Fila de requisições cheia: pacote descartado !!!")
+        except ChecksumInvalido as e:
+            with self.lock_ordem:
+                self.quadros_rejeitados += 1
+            print(f"!!! Checksum inválido, descartado: {e} !!!")
+        except: pass
+        finally:
+            conn.close()
+            self.despachar_em_ordem(ordem, escrita)
+
+    def ler_conexoes(self, conn, ordem):
+        """Thread leitora: atende a conexão recebida e depois as que esperam por um leitor."""
+        while True:
+            self.atender(conn, ordem)
+            with self.lock_leitores:
+                if not self.espera_leitura:
+                    self.lendo -= 1
+                    return
+                conn, ordem = self.espera_leitura.popleft()
+
+    def despachar_em_ordem(self, ordem, escrita):
+        """
+        Escritas entram na fila na ordem em que as conexões foram aceitas (ex:
+        os encaminhamentos de um seguidor), mesmo que uma conexão posterior
+        termine de ser lida antes. Leituras e controle não esperam.
+        """
+        with self.lock_ordem:
+            self.lidos[ordem] = escrita
+            while self.proxima_ordem in self.lidos:
+                pacote = self.lidos.pop(self.proxima_ordem)
+                self.proxima_ordem += 1
+                if pacote and not self.fila_escritas.colocar(pacote):
+                    print("!!! Fila de escritas cheia: pacote descartado !!!")
+
+    def server_loop(self, porta=5000):
+        self.fila_controle = Fila("controle", 1, self.processar_pacote)
+        self.fila_requisicoes = Fila("requisicoes", TRABALHADORES, self.processar_pacote, MAX_FILA_REQUISICOES)
+        self.fila_escritas = Fila("escritas", 1, self.processar_pacote, MAX_FILA_REQUISICOES)
+        self.lock_leitores = threading.Lock()
+        self.lendo = 0                 # Threads leitoras ativas (até MAX_LEITORES)
+        self.espera_leitura = deque()  # (conn, ordem) aceitas sem leitor livre
+        self.lock_ordem = threading.Lock()
+        self.proxima_ordem = 0 # Próxima conexão aceita cuja escrita pode entrar na fila
+        self.lidos = {}        # ordem do accept -> escrita lida fora de ordem (ou None)
+
         server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        server.bind(('0.0.0.0', 5000))
-        server.listen(5)
-        print("--- Ouvindo na porta 5000 ---")
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(('0.0.0.0', porta))
+        server.listen(BACKLOG)
+        print(f"--- Ouvindo na porta {porta} ({TRABALHADORES} trabalhadores) ---")
         
+        ordem = 0
         while True:
             try:
                 conn, addr = server.accept()
-                dados = b''
-                while len(dados) < TAMANHO_PACOTE:
-                    chunk = conn.recv(TAMANHO_PACOTE - len(dados))
-                    if not chunk: break
-                    dados += chunk
-                
-                if len(dados) == TAMANHO_PACOTE:
-                    self.processar_pacote(dados)
+            except: continue
+            with self.lock_leitores:
+                nova_thread = self.lendo < MAX_LEITORES
+                recusada = not nova_thread and len(self.espera_leitura) >= MAX_ESPERA_LEITURA
+                if nova_thread:
+                    self.lendo += 1
+                elif not recusada:
+                    self.espera_leitura.append((conn, ordem)) # Uma thread leitora a pega ao terminar
+            if nova_thread:
+                try:
+                    threading.Thread(target=self.ler_conexoes, args=(conn, ordem), daemon=True).start()
+                except:
+                    with self.lock_leitores:
+                        self.lendo -= 1
+                    recusada = True
+            if recusada:
                 conn.close()
-            except: pass
+                with self.lock_ordem:
+                    self.conexoes_recusadas += 1
+                self.despachar_em_ordem(ordem, None) # Não deixa as escritas seguintes esperando
+            ordem += 1
 
 if __name__ == "__main__":
     Node().server_loop()
\ No newline at end of file
@@ -0,0 +1,123 @@
+# Pool de conexões com o banco
+#
+# Cada requisição pega uma conexão do pool, abre o próprio cursor e devolve
+# a conexão no fim. No máximo 'tamanho' conexões existem ao mesmo tempo; quem
+# pede além disso espera uma ser devolvida. Conexões ociosas há muito tempo
+# passam por um ping antes de serem entregues, e a que cair durante o uso é
+# descartada: a próxima requisição abre outra (reconexão automática).
+#
+# Não depende do driver: recebe a função que abre uma conexão nova
+# (mysql.connector.connect no middleware, SQLite no benchmark_pool.py).
+
+import os
+import time
+import queue
+import threading
+from contextlib import contextmanager
+
+TAMANHO_POOL = int(os.getenv('TAMANHO_POOL', '4'))
+TIMEOUT_POOL = 10.0          # Espera máxima por uma conexão livre
+INTERVALO_VERIFICACAO = 30.0 # Ociosa há mais que isso: ping antes de entregar
+TENTATIVAS_CONEXAO = 3       # Tentativas de abrir uma conexão nova
+ESPERA_RECONEXAO = 0.5       # Segundos entre elas
+
+class PoolConexoes:
+    def __init__(self, conectar, tamanho=TAMANHO_POOL):
+        self.conectar = conectar
+        self.tamanho = tamanho
+        self.livres = queue.LifoQueue()  # (conexão, instante da devolução); a mais recente sai primeiro
+        self.vagas = threading.Semaphore(tamanho)  # Uma por conexão em uso
+        self.lock = threading.Lock()
+        self.abertas = 0       # Conexões existentes (em uso + livres)
+        self.criadas = 0       # Estatísticas
+        self.descartadas = 0
+
+    def nova_conexao(self):
+        erro = None
+        for tentativa in range(TENTATIVAS_CONEXAO):
+            if tentativa:
+                time.sleep(ESPERA_RECONEXAO)
+            try:
+                conn = self.conectar()
+            except Exception as e:
+                erro = e
+                continue
+            with self.lock:
+                self.abertas += 1
+                self.criadas += 1
+            return conn
+        raise ConnectionError(f"Banco indisponível: {erro}")
+
+    def saudavel(self, conn):
+        try:
+            conn.ping()
+            return True
+        except Exception:
+            return False
+
+    def descartar(self, conn):
+        with self.lock:
+            self.abertas -= 1
+            self.descartadas += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def obter(self, timeout=TIMEOUT_POOL):
+        """Uma conexão pronta para uso. Deve voltar por devolver() ou descartar()."""
+        if not self.vagas.acquire(timeout=timeout):
+            raise TimeoutError(f"Nenhuma conexão livre em {timeout}s")
+        try:
+            while True:
+                try:
+                    conn, devolvida_em = self.livres.get_nowait()
+                except queue.Empty:
+                    return self.nova_conexao()
+                if time.time() - devolvida_em < INTERVALO_VERIFICACAO or self.saudavel(conn):
+                    return conn
+                self.descartar(conn) # Caiu enquanto estava ociosa
+        except Exception:
+            self.vagas.release()
+            raise
+
+    def devolver(self, conn):
+        self.livres.put((conn, time.time()))
+        self.vagas.release()
+
+    def liberar(self, conn):
+        """Devolve ao pool após um erro: desfaz a transação, ou descarta se a conexão caiu."""
+        try:
+            conn.rollback()
+            ativa = conn.is_connected()
+        except Exception:
+            ativa = False
+        if ativa:
+            self.devolver(conn)
+        else:
+            self.descartar(conn)
+            self.vagas.release()
+
+    @contextmanager
+    def conexao(self):
+        """with pool.conexao() as conn: ... (devolve ou descarta a conexão no fim)."""
+        conn = self.obter()
+        try:
+            yield conn
+        except BaseException:
+            self.liberar(conn)
+            raise
+        self.devolver(conn)
+
+    def fechar(self):
+        while True:
+            try:
+                conn, _ = self.livres.get_nowait()
+            except queue.Empty:
+                return
+            self.descartar(conn)
+
+    def resumo(self):
+        with self.lock:
+            return {'tamanho': self.tamanho, 'abertas': self.abertas, 'livres': self.livres.qsize(),
+                    'criadas': self.criadas, 'descartadas': self.descartadas}
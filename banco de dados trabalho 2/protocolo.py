@@ -0,0 +1,89 @@
+# Formato dos pacotes trocados entre nós e clientes
+#
+# Quadro atual (versão 2), inteiros em big-endian:
+#
+#   "SD" | versão (1B) | tipo (1B) | origem (4B) | tamanho (4B) | checksum (8B) | conteúdo (tamanho bytes)
+#
+# O checksum é o CRC32 do conteúdo (zlib, calculado em C). O formato antigo
+# usava a soma dos bytes, que não detecta bytes trocados de lugar; ele ainda
+# é aceito, verificado com a soma. Quadros com outra versão são descartados.
+#
+# Heartbeats e mensagens de eleição vão só com o cabeçalho (20 bytes) e o
+# conteúdo pode ter até MAX_CONTEUDO (comandos SQL grandes, lotes de
+# replicação). O formato antigo, de tamanho fixo ("ii1024sQ", 1044 bytes),
+# continua sendo aceito na recepção: o primeiro campo dele é o tipo em
+# little-endian, então nunca começa com "SD".
+
+import zlib
+import struct
+
+MAGICO = b"SD"
+VERSAO = 2
+FORMATO_CABECALHO = "!2sBBiIQ"
+TAMANHO_CABECALHO = struct.calcsize(FORMATO_CABECALHO)
+MAX_CONTEUDO = 1024 * 1024
+
+# Formato antigo
+FORMATO_PACOTE = "ii1024sQ"
+TAMANHO_PACOTE = struct.calcsize(FORMATO_PACOTE)
+
+class ChecksumInvalido(Exception):
+    pass
+
+def calcular_checksum(dados):
+    return zlib.crc32(dados)
+
+def checksum_antigo(dados):
+    """Soma dos bytes, usada pelo formato antigo."""
+    return sum(dados)
+
+def montar_quadro(tipo, origem, conteudo=b""):
+    if isinstance(conteudo, str):
+        conteudo = conteudo.encode('utf-8')
+    if len(conteudo) > MAX_CONTEUDO:
+        raise ValueError(f"Conteúdo de {len(conteudo)} bytes passa do máximo ({MAX_CONTEUDO})")
+    cabecalho = struct.pack(FORMATO_CABECALHO, MAGICO, VERSAO, tipo, origem,
+                            len(conteudo), calcular_checksum(conteudo))
+    return cabecalho + conteudo
+
+def receber_exato(conn, n):
+    dados = b''
+    while len(dados) < n:
+        chunk = conn.recv(n - len(dados))
+        if not chunk:
+            return None
+        dados += chunk
+    return dados
+
+def ler_quadro(conn):
+    """
+    Lê um pacote (quadro novo ou formato antigo) do socket.
+    Retorna (tipo, origem, conteúdo em bytes, checksum recebido) ou None
+    se a conexão fechou antes do fim ou o quadro é inválido. Levanta
+    ChecksumInvalido se o conteúdo chegou corrompido.
+    """
+    inicio = receber_exato(conn, len(MAGICO))
+    if inicio is None:
+        return None
+
+    if inicio != MAGICO:
+        resto = receber_exato(conn, TAMANHO_PACOTE - len(inicio))
+        if resto is None:
+            return None
+        tipo, origem, conteudo, chk = struct.unpack(FORMATO_PACOTE, inicio + resto)
+        if checksum_antigo(conteudo) != chk:
+            raise ChecksumInvalido(f"Pacote antigo do tipo {tipo} vindo de {origem}")
+        return tipo, origem, conteudo.rstrip(b'\0'), chk
+
+    resto = receber_exato(conn, TAMANHO_CABECALHO - len(MAGICO))
+    if resto is None:
+        return None
+    _, versao, tipo, origem, tamanho, chk = struct.unpack(FORMATO_CABECALHO, inicio + resto)
+    if versao != VERSAO or tamanho > MAX_CONTEUDO:
+        return None
+    conteudo = receber_exato(conn, tamanho)
+    if conteudo is None:
+        return None
+    if calcular_checksum(conteudo) != chk:
+        raise ChecksumInvalido(f"Quadro do tipo {tipo} vindo de {origem}")
+    return tipo, origem, conteudo, chk
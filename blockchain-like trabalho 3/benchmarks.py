@@ -0,0 +1,514 @@
+# Benchmarks simples das estruturas da blockchain
+#
+# Uso: python benchmarks.py [nome ...]   (sem argumentos roda todos)
+
+import sys
+import time
+import tempfile
+import json
+import hashlib
+import logging
+import random
+import socket
+import threading
+from types import MappingProxyType
+from typing import Any, Dict
+
+from util.block import criar_bloco, preparar_hash_cabecalho, hash_com_nonce
+from util.blockchain import (iniciar_blockchain, calcular_saldo, indexar_bloco, reconstruir_indices,
+                             adicionar_bloco, adicionar_transacao, construir_locator)
+from util.dificuldade import (calcular_alvo, alvo_para_hex, trabalho_do_bloco, ALVO_INICIAL,
+                              TEMPO_ALVO_BLOCO, INTERVALO_AJUSTE)
+from util.instantaneo import publicar_instantaneo
+from util.validacao import validar_blocos, aplicar_saldos, encerrar_validadores, RECOMPENSA_MINERACAO
+from util import node_functions
+from util.node_functions import criar_estado_no, iniciar_no, encerrar_no
+from util.armazenamento import abrir_blockchain, fechar_blockchain
+from util import peers
+from util.mempool import criar_mempool, adicionar_a_mempool, remover_confirmadas, selecionar_para_bloco
+from util.transaction import criar_transacao
+from util.protocolo import (msg_resposta_blocos, mensagem_para_bytes, bytes_para_mensagem,
+                            msg_solicitar_cabecalhos, TAMANHO_MAXIMO_MENSAGEM,
+                            msg_nova_transacao, msg_submeter_transacoes, msg_ping)
+from util.codec import CODEC_JSON, CODEC_BINARIO
+
+def _cronometrar(funcao, repeticoes: int) -> float:
+    """Retorna o tempo médio (em microssegundos) de uma chamada."""
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) / repeticoes * 1e6
+
+def _receber_exato(sock: socket.socket, tamanho: int) -> bytearray:
+    """Lê exatamente 'tamanho' bytes do socket (buffer único preenchido com recv_into)."""
+    buffer = bytearray(tamanho)
+    visao = memoryview(buffer)
+    recebidos = 0
+    while recebidos < tamanho:
+        lidos = sock.recv_into(visao[recebidos:], tamanho - recebidos)
+        if lidos == 0:
+            raise ConnectionError("Conexão encerrada pelo peer")
+        recebidos += lidos
+    return buffer
+
+def _receber_mensagem(sock: socket.socket) -> Dict[str, Any]:
+    """Cliente síncrono dos benchmarks: lê um quadro ([4 bytes de tamanho] + corpo)."""
+    tamanho = int.from_bytes(_receber_exato(sock, 4), 'big')
+    if tamanho > TAMANHO_MAXIMO_MENSAGEM:
+        raise ValueError(f"Mensagem de {tamanho} bytes excede o limite")
+    return bytes_para_mensagem(_receber_exato(sock, tamanho))
+
+def _enviar_mensagem(sock: socket.socket, mensagem: Dict[str, Any]):
+    sock.sendall(mensagem_para_bytes(mensagem))
+
+def _gerar_cadeia(altura: int) -> Dict[str, Any]:
+    """
+    Monta uma blockchain sintética (sem PoW) com uma coinbase e uma
+    transferência por bloco, alimentando o índice como adicionar_bloco faria.
+    """
+    blockchain = iniciar_blockchain()
+    for i in range(1, altura):
+        minerador = f"no{i % 10}"
+        txs = [
+            criar_transacao("coinbase", minerador, 50.0, timestamp=i),
+            criar_transacao(minerador, f"no{(i + 1) % 10}", 1.0, timestamp=i),
+        ]
+        ultimo = blockchain["chain"][-1]
+        bloco = criar_bloco(i, ultimo["hash"], txs, timestamp=i, hash_bloco=str(i))
+        blockchain["chain"].append(bloco)
+        indexar_bloco(blockchain, bloco)
+    publicar_instantaneo(blockchain)
+    return blockchain
+
+def _saldo_por_varredura(blockchain: Dict[str, Any], endereco: str) -> float:
+    """Implementação antiga de calcular_saldo, mantida só para comparação."""
+    saldo = 0.0
+    for bloco in blockchain["chain"]:
+        for tx in bloco["transactions"]:
+            if tx["destino"] == endereco:
+                saldo += tx["valor"]
+            if tx["origem"] == endereco:
+                saldo -= tx["valor"]
+    for tx in blockchain["mempool"]["txs"].values():
+        if tx["origem"] == endereco:
+            saldo -= tx["valor"]
+    return saldo
+
+def bench_saldo():
+    """Consulta de saldo: varredura completa vs índice incremental."""
+    print(f"{'altura':>8} | {'varredura (us)':>15} | {'índice (us)':>12}")
+    for altura in (1_000, 10_000, 100_000):
+        blockchain = _gerar_cadeia(altura)
+        varredura = _cronometrar(lambda: _saldo_por_varredura(blockchain, "no3"), 5)
+        indice = _cronometrar(lambda: calcular_saldo(blockchain, "no3"), 100_000)
+        assert abs(_saldo_por_varredura(blockchain, "no3") - calcular_saldo(blockchain, "no3")) < 1e-6
+        print(f"{altura:>8} | {varredura:>15.1f} | {indice:>12.3f}")
+
+def bench_instantaneo():
+    """Publicação do instantâneo após um bloco: cópia de todos os saldos vs camadas."""
+    print(f"{'endereços':>10} | {'cópia (us)':>11} | {'camadas (us)':>13} | {'saldo (us)':>11}")
+    for enderecos in (1_000, 10_000, 100_000):
+        blockchain = iniciar_blockchain()
+        blockchain["saldos"].update((f"end{i}", 1.0) for i in range(enderecos))
+        publicar_instantaneo(blockchain)
+        txs = [criar_transacao(f"end{i}", f"end{i + 1}", 0.001, timestamp=i) for i in range(10)]
+        bloco = criar_bloco(1, blockchain["chain"][-1]["hash"], txs, timestamp=1, hash_bloco="1")
+        copia = _cronometrar(lambda: MappingProxyType(dict(blockchain["saldos"])), 50)
+
+        def publicar():
+            indexar_bloco(blockchain, bloco)
+            publicar_instantaneo(blockchain)
+        camadas = _cronometrar(publicar, 500)
+        saldo = _cronometrar(lambda: calcular_saldo(blockchain, "end5"), 100_000)
+        print(f"{enderecos:>10} | {copia:>11.1f} | {camadas:>13.1f} | {saldo:>11.3f}")
+
+def _hash_por_json(bloco: Dict[str, Any]) -> str:
+    """Hash antigo do bloco (JSON de todos os campos), só para comparação."""
+    dados = bloco.copy()
+    dados.pop("hash", None)
+    return hashlib.sha256(json.dumps(dados, sort_keys=True).encode()).hexdigest()
+
+def bench_hash():
+    """Custo por tentativa de nonce: JSON do bloco inteiro vs prefixo do cabeçalho."""
+    print(f"{'txs':>6} | {'json (us)':>10} | {'cabeçalho (us)':>15}")
+    for qtd in (1, 100, 1000):
+        txs = [criar_transacao("a", "b", 1.0) for _ in range(qtd)]
+        bloco = criar_bloco(1, "0" * 64, txs)
+        base = preparar_hash_cabecalho(bloco)
+        antigo = _cronometrar(lambda: _hash_por_json(bloco), 200)
+        novo = _cronometrar(lambda: hash_com_nonce(base, 123456), 100_000)
+        print(f"{qtd:>6} | {antigo:>10.2f} | {novo:>15.3f}")
+
+def bench_codec():
+    """Mensagem RESPONSE_BLOCKS (100 blocos x 20 txs): JSON vs codec binário."""
+    blocos = []
+    anterior = "0" * 64
+    for i in range(1, 101):
+        txs = [criar_transacao(f"no{j}", f"no{j + 1}", 1.5) for j in range(20)]
+        bloco = criar_bloco(i, anterior, txs, hash_bloco=hashlib.sha256(str(i).encode()).hexdigest())
+        blocos.append(bloco)
+        anterior = bloco["hash"]
+    msg = msg_resposta_blocos(blocos)
+    print(f"{'codec':>6} | {'bytes':>9} | {'codificar (ms)':>15} | {'decodificar (ms)':>17}")
+    for codec in (CODEC_JSON, CODEC_BINARIO):
+        dados = mensagem_para_bytes(msg, codec)[4:]  # sem o cabeçalho de tamanho
+        assert bytes_para_mensagem(dados) == msg
+        codificar = _cronometrar(lambda: mensagem_para_bytes(msg, codec), 20) / 1000
+        decodificar = _cronometrar(lambda: bytes_para_mensagem(dados), 20) / 1000
+        print(f"{codec:>6} | {len(dados):>9} | {codificar:>15.2f} | {decodificar:>17.2f}")
+
+def bench_reinicio():
+    """Reabertura de uma blockchain em disco: snapshot + índice mmap vs reindexar a cadeia."""
+    print(f"{'altura':>8} | {'snapshot (ms)':>14} | {'reindexar (ms)':>15}")
+    for altura in (1_000, 10_000):
+        with tempfile.TemporaryDirectory() as diretorio:
+            blockchain = abrir_blockchain(diretorio)
+            for i in range(1, altura):
+                minerador = f"no{i % 10}"
+                txs = [criar_transacao("coinbase", minerador, 50.0, timestamp=i)]
+                bloco = criar_bloco(i, blockchain["chain"][-1]["hash"], txs, timestamp=i)
+                blockchain["chain"].append(bloco)
+                indexar_bloco(blockchain, bloco)
+            saldos = dict(blockchain["saldos"])
+            fechar_blockchain(blockchain)
+
+            inicio = time.perf_counter()
+            blockchain = abrir_blockchain(diretorio)
+            snapshot = (time.perf_counter() - inicio) * 1000
+            assert blockchain["saldos"] == saldos
+            inicio = time.perf_counter()
+            reconstruir_indices(blockchain)
+            reindexar = (time.perf_counter() - inicio) * 1000
+            assert blockchain["saldos"] == saldos
+            blockchain["chain"].fechar()
+            print(f"{altura:>8} | {snapshot:>14.1f} | {reindexar:>15.1f}")
+
+def _podar_lista(pendentes, bloco):
+    """Poda antiga da mempool (lista recriada a cada bloco), só para comparação."""
+    ids_no_bloco = {tx["id"] for tx in bloco}
+    return [tx for tx in pendentes if tx["id"] not in ids_no_bloco]
+
+def bench_mempool():
+    """Poda de um bloco de 100 txs e montagem do modelo de bloco, por tamanho da mempool."""
+    print(f"{'mempool':>8} | {'poda lista (ms)':>16} | {'poda índice (ms)':>17} | {'modelo (ms)':>12}")
+    for quantidade in (1_000, 10_000, 50_000):
+        txs = [criar_transacao(f"no{i % 50}", "b", 1.0, taxa=(i % 7) / 10) for i in range(quantidade)]
+        bloco = txs[::quantidade // 100][:100]
+        lista = _cronometrar(lambda: _podar_lista(txs, bloco), 5) / 1000
+
+        mempool = criar_mempool()
+        for tx in txs:
+            adicionar_a_mempool(mempool, tx)
+        indice = 0.0
+        for _ in range(20):
+            inicio = time.perf_counter()
+            remover_confirmadas(mempool, bloco)
+            indice += (time.perf_counter() - inicio) * 1000 / 20
+            for tx in bloco:
+                adicionar_a_mempool(mempool, tx)
+        modelo = _cronometrar(lambda: selecionar_para_bloco(mempool), 5) / 1000
+        print(f"{quantidade:>8} | {lista:>16.2f} | {indice:>17.3f} | {modelo:>12.1f}")
+
+def _minerar_blocos(quantidade: int, txs_por_bloco: int):
+    """
+    Blocos válidos (PoW de verdade) em sequência a partir do gênesis. Os
+    timestamps ficam espaçados pelo tempo-alvo, terminando agora, para que
+    o reajuste mantenha o alvo inicial.
+    """
+    cadeia = iniciar_blockchain()["chain"]
+    inicio = time.time() - quantidade * TEMPO_ALVO_BLOCO
+    for i in range(1, quantidade + 1):
+        # Só a coinbase emite moeda: ela vai para "fundos", que a reparte entre no0, no1, ...
+        txs = [criar_transacao("coinbase", "fundos", RECOMPENSA_MINERACAO)]
+        txs += [criar_transacao("fundos", f"no{j}", RECOMPENSA_MINERACAO / (txs_por_bloco + 1))
+                for j in range(txs_por_bloco)]
+        alvo = calcular_alvo(cadeia.__getitem__, i)
+        bloco = criar_bloco(i, cadeia[-1]["hash"], txs, timestamp=inicio + i * TEMPO_ALVO_BLOCO, alvo=alvo)
+        base = preparar_hash_cabecalho(bloco)
+        while int(bloco["hash"], 16) >= alvo:
+            bloco["nonce"] += 1
+            bloco["hash"] = hash_com_nonce(base, bloco["nonce"])
+        cadeia.append(bloco)
+    return cadeia[1:]
+
+def _rodada_contencao(porta: int, blocos, clientes: int, requisicoes: int, lock_global):
+    """
+    Um nó recebe blocos (validação + aplicação) enquanto 'clientes' conexões
+    pedem cabeçalhos em paralelo. Retorna (requisições/s, latência p99 em ms).
+    """
+    no_estado = criar_estado_no("localhost", porta)
+    iniciar_no(no_estado)
+    locator = construir_locator(no_estado["blockchain"]["chain"])
+
+    latencias = []
+
+    def cliente():
+        with socket.create_connection(("localhost", porta)) as sock:
+            for _ in range(requisicoes):
+                enviado = time.perf_counter()
+                _enviar_mensagem(sock, msg_solicitar_cabecalhos(locator))
+                _receber_mensagem(sock)
+                latencias.append(time.perf_counter() - enviado)
+
+    def escritor():
+        for bloco in blocos:
+            if lock_global:
+                with lock_global:
+                    adicionar_bloco(no_estado["blockchain"], bloco)
+            else:
+                adicionar_bloco(no_estado["blockchain"], bloco)
+
+    threads = [threading.Thread(target=cliente) for _ in range(clientes)]
+    inicio = time.perf_counter()
+    threading.Thread(target=escritor, daemon=True).start()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duracao = time.perf_counter() - inicio
+    encerrar_no(no_estado)
+    latencias.sort()
+    return clientes * requisicoes / duracao, latencias[int(len(latencias) * 0.99)] * 1000
+
+def bench_contencao():
+    """Requisições/s de leitura com blocos chegando: lock global do nó vs locks finos + instantâneos."""
+    logging.disable(logging.CRITICAL)
+    blocos = _minerar_blocos(40, 500)
+    original = node_functions._processar_mensagem
+    lock_global = threading.RLock()
+
+    def processar_com_lock_global(no_estado, msg):
+        # Como era antes: todo o despacho serializado num único lock
+        with lock_global:
+            return original(no_estado, msg)
+
+    print(f"{'clientes':>8} | {'global (req/s)':>15} | {'p99 (ms)':>9} | {'finos (req/s)':>14} | {'p99 (ms)':>9}")
+    porta = 5900
+    for clientes in (1, 2, 4, 8):
+        resultados = []
+        for modo in ("global", "finos"):
+            porta += 1
+            if modo == "global":
+                node_functions._processar_mensagem = processar_com_lock_global
+                try:
+                    resultados.append(_rodada_contencao(porta, blocos, clientes, 200, lock_global))
+                finally:
+                    node_functions._processar_mensagem = original
+            else:
+                resultados.append(_rodada_contencao(porta, blocos, clientes, 200, None))
+        (vazao_global, p99_global), (vazao_finos, p99_finos) = resultados
+        print(f"{clientes:>8} | {vazao_global:>15.0f} | {p99_global:>9.1f} | {vazao_finos:>14.0f} | {p99_finos:>9.1f}")
+    logging.disable(logging.NOTSET)
+
+def bench_validacao():
+    """Validação de 1000 blocos x 20 txs recebidos: tempo total e até o primeiro prefixo aplicável."""
+    blocos = _minerar_blocos(1000, 20)
+    genesis = iniciar_blockchain()["chain"][0]
+    print(f"{'processos':>9} | {'total (ms)':>11} | {'1º prefixo (ms)':>16}")
+    for processos in (1, 2, 4):
+        if processos > 1:
+            validar_blocos(genesis, blocos, [genesis], processos=processos)  # sobe o pool fora da medição
+        primeiro = []
+        inicio = time.perf_counter()
+        saldos = {}
+        aplicar_saldos(saldos, genesis)
+        validos = validar_blocos(genesis, blocos, [genesis], saldos, processos=processos,
+                                 ao_progredir=lambda n: primeiro or primeiro.append(time.perf_counter()))
+        total = (time.perf_counter() - inicio) * 1000
+        assert validos == len(blocos)
+        print(f"{processos:>9} | {total:>11.1f} | {(primeiro[0] - inicio) * 1000:>16.1f}")
+    encerrar_validadores()
+
+def bench_dificuldade():
+    """
+    Simulação do reajuste: a taxa de hashes da rede sobe 8x no bloco 200 e
+    cai pela metade no 400. Mostra o tempo médio entre blocos por período.
+    """
+    random.seed(1)
+    hashes_por_s = (1 << 256) / ALVO_INICIAL / TEMPO_ALVO_BLOCO  # Rede que acerta o tempo-alvo no início
+    cadeia = [{"index": 0, "timestamp": 0.0}]
+    for altura in range(1, 601):
+        if altura == 200:
+            hashes_por_s *= 8
+        elif altura == 400:
+            hashes_por_s /= 2
+        alvo = calcular_alvo(cadeia.__getitem__, altura)
+        bloco = {"index": altura, "alvo": alvo_para_hex(alvo)}
+        # Tempo até achar o bloco: exponencial com média trabalho / taxa de hashes
+        bloco["timestamp"] = cadeia[-1]["timestamp"] + random.expovariate(hashes_por_s / trabalho_do_bloco(bloco))
+        cadeia.append(bloco)
+    print(f"{'blocos':>9} | {'tempo médio (s)':>16} | {'dificuldade relativa':>21}")
+    for inicio in range(1, 601, 2 * INTERVALO_AJUSTE):
+        fim = inicio + 2 * INTERVALO_AJUSTE
+        media = (cadeia[fim - 1]["timestamp"] - cadeia[inicio - 1]["timestamp"]) / (fim - inicio)
+        relativa = ALVO_INICIAL / int(cadeia[fim - 1]["alvo"], 16)
+        print(f"{inicio:>4}-{fim - 1:<4} | {media:>16.1f} | {relativa:>21.2f}")
+
+def _rodada_lote(porta: int, bloco, transacoes, tamanho_lote: int):
+    """
+    Submete 'transacoes' a um nó ligado a um vizinho: uma NEW_TRANSACTION por
+    transação (tamanho_lote 0) ou lotes SUBMIT_TRANSACTIONS. Retorna
+    (transações/s admitidas, segundos até o vizinho ter todas na mempool).
+    """
+    no_estado, vizinho = criar_estado_no("localhost", porta), criar_estado_no("localhost", porta + 1)
+    for no in (no_estado, vizinho):
+        iniciar_no(no)
+        adicionar_bloco(no["blockchain"], bloco)
+    node_functions.adicionar_peers(no_estado, [vizinho["address"]])
+
+    inicio = time.perf_counter()
+    with socket.create_connection(("localhost", porta)) as sock:
+        if tamanho_lote:
+            for i in range(0, len(transacoes), tamanho_lote):
+                _enviar_mensagem(sock, msg_submeter_transacoes(transacoes[i:i + tamanho_lote]))
+                assert _receber_mensagem(sock)["payload"]["aceitas"] == len(transacoes[i:i + tamanho_lote])
+        else:
+            for tx in transacoes:
+                _enviar_mensagem(sock, msg_nova_transacao(tx))
+            _enviar_mensagem(sock, msg_ping())  # Conexão processada em ordem: o PONG marca o fim
+            _receber_mensagem(sock)
+    admissao = time.perf_counter() - inicio
+    while len(vizinho["blockchain"]["mempool"]["txs"]) < len(transacoes) and time.perf_counter() - inicio < 30:
+        time.sleep(0.01)
+    propagacao = time.perf_counter() - inicio
+    for no in (no_estado, vizinho):
+        encerrar_no(no)
+    return len(transacoes) / admissao, propagacao
+
+def bench_lote():
+    """Admissão de 5000 transações: uma mensagem por transação vs lotes SUBMIT_TRANSACTIONS."""
+    logging.disable(logging.CRITICAL)
+    bloco = _minerar_blocos(1, 100)[0]  # Dá saldo às origens no0..no99
+    transacoes = [criar_transacao(f"no{i % 100}", "loja", 0.001) for i in range(5000)]
+    print(f"{'modo':>12} | {'admissão (tx/s)':>16} | {'até o vizinho (s)':>18}")
+    porta = 5950
+    for tamanho_lote in (0, 100, 1000, 5000):
+        porta += 2
+        vazao, propagacao = _rodada_lote(porta, bloco, transacoes, tamanho_lote)
+        modo = f"lote {tamanho_lote}" if tamanho_lote else "individual"
+        print(f"{modo:>12} | {vazao:>16.0f} | {propagacao:>18.2f}")
+    logging.disable(logging.NOTSET)
+
+def _rodada_fanout(porta: int, quantidade: int, fanout: int, rodadas: int):
+    """
+    'quantidade' nós todos ligados entre si; um deles cria transações e o
+    gossip as espalha. Retorna (ms até a última chegar a todos, mensagens
+    enviadas por transação somando a rede, fração dos nós alcançados).
+    """
+    nos = [criar_estado_no("localhost", porta + i) for i in range(quantidade)]
+    fundos = _minerar_blocos(1, 1)[0]  # Dá saldo a no0, a origem das transações
+    for no in nos:
+        adicionar_bloco(no["blockchain"], fundos)
+        iniciar_no(no)
+        node_functions.adicionar_peers(no, [outro["address"] for outro in nos])
+    origem = nos[0]
+    enviadas_antes = sum(no["trafego"]["msgs_enviadas"] for no in nos)
+    original, peers.FANOUT = peers.FANOUT, fanout
+    tempos = []
+    alcancados = 0
+    try:
+        for i in range(rodadas):
+            tx = criar_transacao("no0", f"d{i}", 0.001)
+            inicio = time.perf_counter()
+            adicionar_transacao(origem["blockchain"], tx)
+            node_functions.anunciar_transacao(origem, tx)
+            # Um nó que ficou fora do gossip nunca recebe: o prazo evita esperar para sempre
+            while time.perf_counter() - inicio < 3.0:
+                faltam = sum(tx["id"] not in no["blockchain"]["mempool"]["txs"] for no in nos)
+                if not faltam:
+                    break
+                time.sleep(0.002)
+            tempos.append(time.perf_counter() - inicio)
+            alcancados += quantidade - faltam
+    finally:
+        peers.FANOUT = original
+    enviadas = sum(no["trafego"]["msgs_enviadas"] for no in nos) - enviadas_antes
+    for no in nos:
+        encerrar_no(no)
+    return sum(tempos) / len(tempos) * 1000, enviadas / rodadas, alcancados / (quantidade * rodadas)
+
+def bench_fanout():
+    """Gossip de uma transação numa rede toda conectada: broadcast para todos vs para os FANOUT melhores."""
+    logging.disable(logging.CRITICAL)
+    print(f"{'nós':>4} | {'todos (ms)':>11} | {'msgs/tx':>8} | {f'fanout {peers.FANOUT} (ms)':>14} | "
+          f"{'msgs/tx':>8} | {'cobertura':>9}")
+    porta = 6600
+    for quantidade in (8, 16, 32):
+        todos = _rodada_fanout(porta, quantidade, quantidade, 10)
+        limitado = _rodada_fanout(porta + quantidade, quantidade, peers.FANOUT, 10)
+        porta += 2 * quantidade
+        print(f"{quantidade:>4} | {todos[0]:>11.1f} | {todos[1]:>8.0f} | {limitado[0]:>14.1f} | "
+              f"{limitado[1]:>8.0f} | {limitado[2]:>9.0%}")
+    logging.disable(logging.NOTSET)
+
+def _rodada_remetentes(porta: int, bloco, remetentes: int, mensagens, lock_global):
+    """
+    'remetentes' threads entregam juntas as 'mensagens' (repartidas entre
+    elas) direto ao despacho _processar_mensagem de um nó, sem passar pela
+    rede. Retorna mensagens/s.
+    """
+    no_estado = criar_estado_no("localhost", porta)
+    iniciar_no(no_estado)
+    adicionar_bloco(no_estado["blockchain"], bloco)
+    partes = [mensagens[i::remetentes] for i in range(remetentes)]
+    largada = threading.Barrier(remetentes + 1)
+
+    def remetente(parte):
+        largada.wait()
+        for msg in parte:
+            if lock_global:
+                with lock_global:
+                    node_functions._processar_mensagem(no_estado, msg)
+            else:
+                node_functions._processar_mensagem(no_estado, msg)
+
+    threads = [threading.Thread(target=remetente, args=(parte,)) for parte in partes]
+    for t in threads:
+        t.start()
+    largada.wait()
+    inicio = time.perf_counter()
+    for t in threads:
+        t.join()
+    duracao = time.perf_counter() - inicio
+    encerrar_no(no_estado)
+    return len(mensagens) / duracao
+
+def bench_remetentes():
+    """Mensagens/s no despacho com N remetentes concorrentes: lock global do nó vs locks finos."""
+    logging.disable(logging.CRITICAL)
+    bloco = _minerar_blocos(1, 100)[0]  # Dá saldo às origens no0..no99
+    locator = construir_locator([iniciar_blockchain()["chain"][0], bloco])
+    print(f"{'remetentes':>10} | {'global (msgs/s)':>16} | {'finos (msgs/s)':>15}")
+    porta = 6500
+    for remetentes in (1, 2, 4, 8, 16):
+        # Metade transações novas (mempool + inventário), metade pedidos de cabeçalhos (instantâneo)
+        mensagens = []
+        for i in range(2000):
+            mensagens.append(msg_nova_transacao(criar_transacao(f"no{i % 100}", "loja", 0.001)))
+            mensagens.append(msg_solicitar_cabecalhos(locator))
+        vazao_global = _rodada_remetentes(porta, bloco, remetentes, mensagens, threading.RLock())
+        vazao_finos = _rodada_remetentes(porta + 1, bloco, remetentes, mensagens, None)
+        porta += 2
+        print(f"{remetentes:>10} | {vazao_global:>16.0f} | {vazao_finos:>15.0f}")
+    logging.disable(logging.NOTSET)
+
+BENCHMARKS = {
+    "saldo": bench_saldo,
+    "instantaneo": bench_instantaneo,
+    "hash": bench_hash,
+    "codec": bench_codec,
+    "reinicio": bench_reinicio,
+    "mempool": bench_mempool,
+    "contencao": bench_contencao,
+    "remetentes": bench_remetentes,
+    "validacao": bench_validacao,
+    "dificuldade": bench_dificuldade,
+    "lote": bench_lote,
+    "fanout": bench_fanout,
+}
+
+if __name__ == "__main__":
+    nomes = sys.argv[1:] or list(BENCHMARKS)
+    for nome in nomes:
+        print(f"== {nome} ==")
+        BENCHMARKS[nome]()
@@ -0,0 +1,227 @@
+# Nó sem interface gráfica (servidores, vários nós por máquina, testes de carga)
+#
+# Sobe o nó P2P, conecta aos bootstraps e, opcionalmente, minera sem parar.
+# O controle é uma API local de JSON por linha sobre TCP (só em 127.0.0.1):
+# cada linha enviada é um comando e cada linha recebida, a resposta.
+#
+#   echo '{"cmd": "status"}' | nc localhost 6000
+#
+# Comandos: status, saldo [endereco], altura, mempool,
+#           transacao {destino, valor, taxa}, minerar {ativo}, encerrar
+# Respostas: {"ok": true, ...} ou {"ok": false, "erro": "..."}
+#
+# Não importa o Tkinter (ver main.py para a interface).
+
+import json
+import signal
+import socket
+import socketserver
+import threading
+import argparse
+import logging
+from typing import Any, Dict, Optional
+
+from util.node_functions import (
+    criar_estado_no, iniciar_no, encerrar_no, conectar_a_peer, anunciar_transacao, anunciar_bloco
+)
+from util.blockchain import calcular_saldo, adicionar_transacao, adicionar_bloco
+from util.transaction import criar_transacao
+from util.miner_pow import minerar_bloco, interromper_mineracao, encerrar_mineradores
+from util.validacao import encerrar_validadores
+from util.peers import resumo_peers
+
+DESLOCAMENTO_CONTROLE = 1000  # Porta de controle padrão: porta P2P + isto
+TAMANHO_MAXIMO_COMANDO = 1024 * 1024
+
+def criar_daemon(no_estado: Dict[str, Any], processos: Optional[int] = None) -> Dict[str, Any]:
+    """Estado do daemon: o nó e a mineração contínua."""
+    return {
+        "no": no_estado,
+        "processos": processos,   # Workers de mineração (padrão: número de CPUs)
+        "minerando": False,
+        "thread_mineracao": None,
+        "lock": threading.Lock(), # Serializa iniciar/parar a mineração
+        "servidor": None,
+    }
+
+# --- Mineração contínua ---
+
+def _loop_mineracao(daemon: Dict[str, Any]):
+    no_estado = daemon["no"]
+    while daemon["minerando"] and no_estado["running"]:
+        bloco = minerar_bloco(no_estado, no_estado["address"], processos=daemon["processos"])
+        if bloco is None:
+            continue
+        if adicionar_bloco(no_estado["blockchain"], bloco):
+            no_estado["logger"].info(f"Bloco #{bloco['index']} minerado e adicionado localmente.")
+            anunciar_bloco(no_estado, bloco)
+        else:
+            # Outro bloco chegou pela rede enquanto minerávamos: recomeça sobre o novo topo
+            no_estado["logger"].info(f"Bloco #{bloco['index']} minerado ficou obsoleto.")
+
+def iniciar_mineracao(daemon: Dict[str, Any]):
+    with daemon["lock"]:
+        if daemon["minerando"]:
+            return
+        daemon["minerando"] = True
+        daemon["thread_mineracao"] = threading.Thread(target=_loop_mineracao, args=(daemon,), daemon=True)
+        daemon["thread_mineracao"].start()
+
+def parar_mineracao(daemon: Dict[str, Any]):
+    """Para a mineração e espera o bloco em andamento ser abandonado."""
+    with daemon["lock"]:
+        daemon["minerando"] = False
+        thread = daemon["thread_mineracao"]
+        # minerar_bloco liga a flag ao começar: insiste até a thread sair
+        while thread is not None and thread.is_alive():
+            interromper_mineracao(daemon["no"])
+            thread.join(0.1)
+        daemon["thread_mineracao"] = None
+
+# --- API de controle ---
+
+def _status(daemon: Dict[str, Any]) -> Dict[str, Any]:
+    no_estado = daemon["no"]
+    blockchain = no_estado["blockchain"]
+    return {
+        "endereco": no_estado["address"],
+        "altura": blockchain["instantaneo"]["altura"],
+        "topo": blockchain["instantaneo"]["topo"]["hash"],
+        "mempool": len(blockchain["mempool"]["txs"]),
+        "saldo": calcular_saldo(blockchain, no_estado["address"]),
+        "peers": resumo_peers(no_estado["tabela_peers"]),
+        "minerando": daemon["minerando"],
+        "trafego": dict(no_estado["trafego"]),
+    }
+
+def executar_comando(daemon: Dict[str, Any], comando: Dict[str, Any]) -> Dict[str, Any]:
+    """Executa um comando da API de controle e monta a resposta."""
+    no_estado = daemon["no"]
+    blockchain = no_estado["blockchain"]
+    cmd = comando.get("cmd")
+
+    if cmd == "status":
+        return {"ok": True, **_status(daemon)}
+
+    elif cmd == "saldo":
+        endereco = comando.get("endereco") or no_estado["address"]
+        return {"ok": True, "endereco": endereco, "saldo": calcular_saldo(blockchain, endereco)}
+
+    elif cmd == "altura":
+        return {"ok": True, "altura": blockchain["instantaneo"]["altura"]}
+
+    elif cmd == "mempool":
+        return {"ok": True, "transacoes": len(blockchain["mempool"]["txs"]),
+                "bytes": blockchain["mempool"]["bytes"]}
+
+    elif cmd == "transacao":
+        try:
+            tx = criar_transacao(no_estado["address"], comando["destino"], float(comando["valor"]),
+                                 taxa=float(comando.get("taxa", 0.0)))
+        except (KeyError, TypeError, ValueError) as e:
+            return {"ok": False, "erro": f"Transação inválida: {e}"}
+        if not adicionar_transacao(blockchain, tx):
+            return {"ok": False, "erro": "Saldo insuficiente, duplicata ou mempool cheia."}
+        anunciar_transacao(no_estado, tx)
+        return {"ok": True, "id": tx["id"]}
+
+    elif cmd == "minerar":
+        if comando.get("ativo", True):
+            iniciar_mineracao(daemon)
+        else:
+            parar_mineracao(daemon)
+        return {"ok": True, "minerando": daemon["minerando"]}
+
+    elif cmd == "encerrar":
+        # shutdown() espera o serve_forever sair: não pode rodar na thread da requisição
+        threading.Thread(target=daemon["servidor"].shutdown, daemon=True).start()
+        return {"ok": True}
+
+    return {"ok": False, "erro": f"Comando desconhecido: {cmd}"}
+
+class _TratadorControle(socketserver.StreamRequestHandler):
+    """Uma conexão de controle: um comando JSON por linha, uma resposta por linha."""
+
+    def handle(self):
+        daemon = self.server.daemon
+        while True:
+            linha = self.rfile.readline(TAMANHO_MAXIMO_COMANDO)
+            if not linha:
+                return
+            if not linha.strip():
+                continue
+            try:
+                comando = json.loads(linha)
+                resposta = executar_comando(daemon, comando) if isinstance(comando, dict) else \
+                    {"ok": False, "erro": "O comando deve ser um objeto JSON."}
+            except json.JSONDecodeError as e:
+                resposta = {"ok": False, "erro": f"JSON inválido: {e}"}
+            except Exception as e:
+                daemon["no"]["logger"].error(f"Erro no comando de controle: {e}")
+                resposta = {"ok": False, "erro": str(e)}
+            self.wfile.write(json.dumps(resposta).encode("utf-8") + b"\n")
+
+class _ServidorControle(socketserver.ThreadingTCPServer):
+    """ThreadingTCPServer que leva o estado do daemon até os tratadores."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, endereco, daemon: Dict[str, Any]):
+        self.daemon = daemon
+        super().__init__(endereco, _TratadorControle)
+
+def enviar_comando(porta_controle: int, comando: Dict[str, Any], host: str = "127.0.0.1",
+                   timeout: float = 30.0) -> Dict[str, Any]:
+    """Cliente da API de controle: envia um comando e retorna a resposta."""
+    with socket.create_connection((host, porta_controle), timeout=timeout) as sock:
+        sock.sendall(json.dumps(comando).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as leitor:
+            return json.loads(leitor.readline())
+
+# --- Execução ---
+
+def executar_daemon(daemon: Dict[str, Any], bootstraps, porta_controle: int, minerar: bool = False):
+    """Inicia o nó e atende a API de controle até 'encerrar' ou SIGTERM/SIGINT."""
+    no_estado = daemon["no"]
+    iniciar_no(no_estado)
+    for b in bootstraps:
+        threading.Thread(target=conectar_a_peer, args=(no_estado, b), daemon=True).start()
+    if minerar:
+        iniciar_mineracao(daemon)
+
+    daemon["servidor"] = _ServidorControle(("127.0.0.1", porta_controle), daemon)
+
+    def ao_sinal(signum, frame):
+        threading.Thread(target=daemon["servidor"].shutdown, daemon=True).start()
+    signal.signal(signal.SIGTERM, ao_sinal)
+    signal.signal(signal.SIGINT, ao_sinal)
+
+    no_estado["logger"].info(f"Controle local em 127.0.0.1:{porta_controle}")
+    try:
+        daemon["servidor"].serve_forever()
+    finally:
+        daemon["servidor"].server_close()
+        parar_mineracao(daemon)
+        encerrar_no(no_estado)
+        encerrar_mineradores()
+        encerrar_validadores()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Nó da blockchain sem interface gráfica")
+    parser.add_argument("--h", type=str, default="localhost")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--bootstrap", nargs="*", default=[])
+    parser.add_argument("--dados", type=str, default=None, help="Diretório da blockchain (padrão: dados_<porta>)")
+    parser.add_argument("--memoria", action="store_true", help="Não persiste a blockchain em disco")
+    parser.add_argument("--controle", type=int, default=None,
+                        help=f"Porta da API de controle (padrão: porta + {DESLOCAMENTO_CONTROLE})")
+    parser.add_argument("--minerar", action="store_true", help="Começa minerando continuamente")
+    parser.add_argument("--processos", type=int, default=None, help="Workers de mineração (padrão: CPUs)")
+    parser.add_argument("--log", type=str, default=None, help="Arquivo de log (padrão: node_<porta>.log)")
+    args = parser.parse_args()
+    diretorio_dados = None if args.memoria else (args.dados or f"dados_{args.port}")
+
+    logging.basicConfig(filename=args.log or f"node_{args.port}.log", level=logging.INFO)
+
+    daemon = criar_daemon(criar_estado_no(args.h, args.port, diretorio_dados), args.processos)
+    executar_daemon(daemon, args.bootstrap, args.controle or args.port + DESLOCAMENTO_CONTROLE, args.minerar)
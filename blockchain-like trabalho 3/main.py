@@ -1,24 +1,26 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext
+from tkinter import ttk, messagebox, scrolledtext, simpledialog
 import threading
 import argparse
 import logging
 
 # Importando suas funções procedurais
-from util.node_functions import criar_estado_no, iniciar_no, conectar_a_peer, propagar_mensagem
-from util.blockchain import calcular_saldo, adicionar_transacao
+from util.node_functions import (
+    criar_estado_no, iniciar_no, encerrar_no, conectar_a_peer, confirmar_pagamento,
+    sincronizar_com_peer, anunciar_transacao, anunciar_bloco
+)
+from util.blockchain import calcular_saldo, adicionar_transacao, CONFIRMACOES_PAGAMENTO
 from util.miner_pow import minerar_bloco, interromper_mineracao
-from util.protocolo import msg_nova_transacao, msg_novo_bloco
 
 class BlockchainApp:
-    def __init__(self, root, host, port, bootstraps):
+    def __init__(self, root, host, port, bootstraps, diretorio_dados=None):
         self.root = root
         self.root.title(f"Blockchain Node - {host}:{port}")
         self.root.geometry("700x600")
         #print(port)
 
         # 1. Inicializa o Estado do Nó (Procedural)
-        self.no_estado = criar_estado_no(host, port)
+        self.no_estado = criar_estado_no(host, port, diretorio_dados)
         
         # Configura logging para arquivo para não poluir o terminal
         logging.basicConfig(filename=f"node_{port}.log", level=logging.INFO)
@@ -32,8 +34,14 @@ class BlockchainApp:
         for b in bootstraps:
             threading.Thread(target=conectar_a_peer, args=(self.no_estado, b), daemon=True).start()
 
+        self.root.protocol("WM_DELETE_WINDOW", self.ao_fechar)
         self.log("Sistema iniciado. Aguardando conexões...")
 
+    def ao_fechar(self):
+        """Encerra o nó (gravando a blockchain em disco) antes de fechar a janela."""
+        encerrar_no(self.no_estado)
+        self.root.destroy()
+
     def _setup_ui(self):
         """Define o layout da interface Tkinter."""
         # Frame Superior: Status
@@ -54,6 +62,7 @@ class BlockchainApp:
         ttk.Button(actions_frame, text="Minerar Bloco", command=self.acao_minerar).pack(side="left", expand=True, fill="x")
         ttk.Button(actions_frame, text="Ver Blockchain", command=self.acao_ver_chain).pack(side="left", expand=True, fill="x")
         ttk.Button(actions_frame, text="Sincronizar", command=self.acao_sync).pack(side="left", expand=True, fill="x")
+        ttk.Button(actions_frame, text="Verificar Pagamento", command=self.acao_verificar_pagamento).pack(side="left", expand=True, fill="x")
 
         # Frame Inferior: Log de Eventos
         log_frame = ttk.LabelFrame(self.root, text=" Log da Rede ")
@@ -79,7 +88,7 @@ class BlockchainApp:
         """Abre um popup para criar transação."""
         win = tk.Toplevel(self.root)
         win.title("Enviar Moedas")
-        win.geometry("300x200")
+        win.geometry("300x260")
 
         ttk.Label(win, text="Destino (host:port):").pack(pady=5)
         ent_destino = ttk.Entry(win)
@@ -89,18 +98,23 @@ class BlockchainApp:
         ent_valor = ttk.Entry(win)
         ent_valor.pack(fill="x", padx=20)
 
+        ttk.Label(win, text="Taxa (opcional):").pack(pady=5)
+        ent_taxa = ttk.Entry(win)
+        ent_taxa.pack(fill="x", padx=20)
+
         def enviar():
             try:
                 dest = ent_destino.get()
                 val = float(ent_valor.get())
+                taxa = float(ent_taxa.get() or 0)
                 
                 # Lógica procedural: cria e propaga
                 from util.transaction import criar_transacao
-                tx = criar_transacao(self.no_estado["address"], dest, val)
+                tx = criar_transacao(self.no_estado["address"], dest, val, taxa=taxa)
                 
                 if adicionar_transacao(self.no_estado["blockchain"], tx):
-                    msg = msg_nova_transacao(tx)
-                    propagar_mensagem(self.no_estado, msg)
+                    # Os peers recebem só o id (INV) e pedem o corpo se não o tiverem
+                    anunciar_transacao(self.no_estado, tx)
                     self.log(f"Transação enviada: {tx['id'][:8]}")
                     win.destroy()
                 else:
@@ -125,11 +139,8 @@ class BlockchainApp:
                 if sucesso:
                     self.log(f"Bloco #{bloco['index']} minerado e adicionado localmente!")
             
-                    # 2. Propaga para os outros
-                    from util.protocolo import msg_novo_bloco
-                    msg = msg_novo_bloco(bloco)
-                    msg["sender"] = self.no_estado["address"]
-                    propagar_mensagem(self.no_estado, msg, self.no_estado["peers"])
+                    # 2. Anuncia aos outros (eles pedem o bloco com GETDATA)
+                    anunciar_bloco(self.no_estado, bloco)
             
                     # 3. Atualiza a UI (Saldo)
                     self.root.after(0, self.atualizar_saldo_ui)
@@ -141,18 +152,38 @@ class BlockchainApp:
         threading.Thread(target=tarefa, daemon=True).start()
 
     def acao_ver_chain(self):
-        self.log(f"Blockchain atual possui {len(self.no_estado['blockchain']['chain'])} blocos.")
-        for b in self.no_estado['blockchain']['chain']:
+        instantaneo = self.no_estado['blockchain']['instantaneo']
+        self.log(f"Blockchain atual possui {instantaneo['altura']} blocos.")
+        for b in instantaneo['chain']:
             self.log(f"Bloco {b['index']} | Hash: {b['hash'][:10]}... | Txs: {len(b['transactions'])}")
 
     def acao_sync(self):
         self.log("Sincronizando com peers...")
-        from util.protocolo import msg_solicitar_chain
-        msg = msg_solicitar_chain()
-        # Adiciona o sender para o peer saber para quem responder
-        msg["sender"] = self.no_estado["address"] 
-        propagar_mensagem(self.no_estado, msg, self.no_estado["peers"])
-        self.atualizar_saldo_ui()
+
+        def tarefa():
+            # Cada peer só envia os cabeçalhos/blocos que nos faltam
+            for peer in list(self.no_estado["peers"]):
+                if sincronizar_com_peer(self.no_estado, peer):
+                    self.log(f"Blockchain sincronizada com {peer}.")
+            self.root.after(0, self.atualizar_saldo_ui)
+
+        threading.Thread(target=tarefa, daemon=True).start()
+
+    def acao_verificar_pagamento(self):
+        """Confirma uma transação pela prova de Merkle, sem baixar a cadeia."""
+        tx_id = simpledialog.askstring("Verificar Pagamento", "ID da transação:", parent=self.root)
+        if not tx_id:
+            return
+
+        def tarefa():
+            prova = confirmar_pagamento(self.no_estado, tx_id.strip())
+            if prova:
+                self.log(f"Pagamento {tx_id[:8]} confirmado no bloco #{prova['header']['index']}.")
+            else:
+                self.log(f"Pagamento {tx_id[:8]} não encontrado, prova inválida ou ainda sem "
+                         f"{CONFIRMACOES_PAGAMENTO} confirmações.")
+
+        threading.Thread(target=tarefa, daemon=True).start()
 
 # --- Inicialização ---
 if __name__ == "__main__":
@@ -160,8 +191,11 @@ if __name__ == "__main__":
     parser.add_argument("--h", type=str, default="localhost")
     parser.add_argument("--port", type=int, default=5000)
     parser.add_argument("--bootstrap", nargs="*", default=[])
+    parser.add_argument("--dados", type=str, default=None, help="Diretório da blockchain (padrão: dados_<porta>)")
+    parser.add_argument("--memoria", action="store_true", help="Não persiste a blockchain em disco")
     args = parser.parse_args()
+    diretorio_dados = None if args.memoria else (args.dados or f"dados_{args.port}")
 
     root = tk.Tk()
-    app = BlockchainApp(root, args.h, args.port, args.bootstrap)
+    app = BlockchainApp(root, args.h, args.port, args.bootstrap, diretorio_dados)
     root.mainloop()
\ No newline at end of file
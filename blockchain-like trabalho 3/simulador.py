@@ -0,0 +1,293 @@
+# Simulador de cluster local para medir a rede P2P
+#
+# Sobe N nós neste processo (portas consecutivas em localhost), liga cada
+# novo nó a alguns dos anteriores com conectar_a_peer e gera carga
+# sintética: transações a uma taxa fixa e blocos minerados por nós
+# sorteados (chegadas de Poisson, então às vezes dois nós mineram ao mesmo
+# tempo e surgem forks). Um observador percorre os instantâneos de cada nó
+# e anota quando cada bloco chegou a ele.
+#
+# Mede: latência de propagação de blocos (percentis), tempo até a
+# confirmação das transações, mensagens/bytes por nó e taxa de órfãos.
+# O resultado é um JSON (stdout ou --saida) para comparar versões.
+#
+# Uso: python simulador.py --nos 8 --duracao 30 --tps 50 --intervalo-bloco 2
+#
+# Os nós dividem o GIL deste processo: os números servem para comparar
+# versões na mesma máquina, não como medida absoluta da rede.
+
+import os
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from util.node_functions import (
+    criar_estado_no, iniciar_no, encerrar_no, conectar_a_peer, anunciar_transacao, anunciar_bloco
+)
+from util.blockchain import iniciar_blockchain, adicionar_bloco, adicionar_transacao
+from util.block import criar_bloco, preparar_hash_cabecalho, hash_com_nonce
+from util.dificuldade import calcular_alvo, TEMPO_ALVO_BLOCO
+from util.transaction import criar_transacao
+from util.miner_pow import minerar_bloco, RECOMPENSA_MINERACAO
+
+INTERVALO_OBSERVACAO = 0.005  # Segundos entre varreduras dos instantâneos
+VALOR_TX = 0.01
+TAXA_TX = 0.001
+TIMEOUT_CONVERGENCIA = 15.0   # Segundos esperando os nós concordarem no topo ao final
+
+# --- Montagem do cluster ---
+
+def _blocos_de_fundos(enderecos: List[str]) -> List[Dict[str, Any]]:
+    """
+    Um bloco por nó, cuja coinbase (RECOMPENSA_MINERACAO) vai para ele, para
+    que todos possam transacionar desde o início. Os timestamps ficam
+    espaçados pelo tempo-alvo, terminando agora, para não mexer no alvo.
+    """
+    cadeia = iniciar_blockchain()["chain"]
+    inicio = time.time() - len(enderecos) * TEMPO_ALVO_BLOCO
+    for i, endereco in enumerate(enderecos, start=1):
+        alvo = calcular_alvo(cadeia.__getitem__, i)
+        txs = [criar_transacao("coinbase", endereco, RECOMPENSA_MINERACAO)]
+        bloco = criar_bloco(i, cadeia[-1]["hash"], txs, timestamp=inicio + i * TEMPO_ALVO_BLOCO, alvo=alvo)
+        base = preparar_hash_cabecalho(bloco)
+        while int(bloco["hash"], 16) >= alvo:
+            bloco["nonce"] += 1
+            bloco["hash"] = hash_com_nonce(base, bloco["nonce"])
+        cadeia.append(bloco)
+    return cadeia[1:]
+
+def criar_cluster(quantidade: int, porta_base: int, grau: int, rng: random.Random) -> List[Dict[str, Any]]:
+    """
+    Inicia 'quantidade' nós em memória e liga cada um a até 'grau' nós
+    anteriores sorteados (o grafo fica conexo).
+    """
+    nos = [criar_estado_no("localhost", porta_base + i) for i in range(quantidade)]
+    fundos = _blocos_de_fundos([no["address"] for no in nos])
+    for no in nos:
+        for bloco in fundos:
+            adicionar_bloco(no["blockchain"], bloco)
+        iniciar_no(no)
+    for i, no in enumerate(nos[1:], start=1):
+        for anterior in rng.sample(nos[:i], min(grau, i)):
+            conectar_a_peer(no, anterior["address"])
+    return nos
+
+# --- Observação ---
+
+def criar_medicao(nos: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Estado compartilhado entre carga, mineração e observador."""
+    return {
+        "lock": threading.Lock(),
+        "chegadas": {},       # hash -> {índice do nó: instante em que o bloco entrou na cadeia dele}
+        "minerados": {},      # hash -> (índice do nó, instante em que foi aceito localmente)
+        "enviadas": {},       # id da tx -> (índice do nó, instante do envio)
+        "confirmadas": {},    # id da tx -> instante em que entrou num bloco do nó que a enviou
+        "recusadas": 0,
+        "reorganizacoes": [0] * len(nos),
+        "topos": [None] * len(nos),
+        "vistos": [set() for _ in nos],
+        "ativo": True,
+    }
+
+def _observar_no(medicao: Dict[str, Any], i: int, no: Dict[str, Any]):
+    instantaneo = no["blockchain"]["instantaneo"]
+    topo = instantaneo["topo"]["hash"]
+    anterior = medicao["topos"][i]
+    if topo == anterior:
+        return
+    agora = time.perf_counter()
+    chain, vistos = instantaneo["chain"], medicao["vistos"][i]
+    # Desce do topo até um bloco já visto por este nó: o resto é novo
+    altura = instantaneo["altura"] - 1
+    novos = []
+    while altura >= 0 and chain[altura]["hash"] not in vistos:
+        novos.append(chain[altura])
+        altura -= 1
+    # Se os novos não continuam o topo antigo, ele saiu da cadeia: reorganização
+    if anterior is not None and (not novos or novos[-1]["previous_hash"] != anterior):
+        medicao["reorganizacoes"][i] += 1
+    medicao["topos"][i] = topo
+    with medicao["lock"]:
+        for bloco in novos:
+            vistos.add(bloco["hash"])
+            medicao["chegadas"].setdefault(bloco["hash"], {}).setdefault(i, agora)
+            for tx in bloco["transactions"]:
+                envio = medicao["enviadas"].get(tx["id"])
+                if envio is not None and envio[0] == i:
+                    medicao["confirmadas"].setdefault(tx["id"], agora)
+
+def _observador(medicao: Dict[str, Any], nos: List[Dict[str, Any]]):
+    while medicao["ativo"]:
+        for i, no in enumerate(nos):
+            _observar_no(medicao, i, no)
+        time.sleep(INTERVALO_OBSERVACAO)
+
+# --- Carga sintética ---
+
+def _gerar_transacoes(medicao: Dict[str, Any], nos: List[Dict[str, Any]], tps: float, fim: float,
+                      rng: random.Random):
+    """Uma transação a cada 1/tps segundos, de um nó sorteado para outro."""
+    proxima = time.perf_counter()
+    while time.perf_counter() < fim:
+        i, j = rng.sample(range(len(nos)), 2)
+        no = nos[i]
+        tx = criar_transacao(no["address"], nos[j]["address"], VALOR_TX, taxa=TAXA_TX)
+        with medicao["lock"]:
+            medicao["enviadas"][tx["id"]] = (i, time.perf_counter())
+        if adicionar_transacao(no["blockchain"], tx):
+            anunciar_transacao(no, tx)
+        else:
+            with medicao["lock"]:
+                del medicao["enviadas"][tx["id"]]
+                medicao["recusadas"] += 1
+        proxima += 1 / tps
+        time.sleep(max(0.0, proxima - time.perf_counter()))
+
+def _minerar_em(medicao: Dict[str, Any], nos: List[Dict[str, Any]], i: int, ocupados: set):
+    no = nos[i]
+    try:
+        bloco = minerar_bloco(no, no["address"], processos=1)
+        if bloco and adicionar_bloco(no["blockchain"], bloco):
+            with medicao["lock"]:
+                medicao["minerados"][bloco["hash"]] = (i, time.perf_counter())
+            anunciar_bloco(no, bloco)
+    finally:
+        ocupados.discard(i)
+
+def _agendar_mineracao(medicao: Dict[str, Any], nos: List[Dict[str, Any]], intervalo: float, fim: float,
+                       rng: random.Random):
+    """Blocos em chegadas de Poisson (média 'intervalo'), cada um num nó sorteado."""
+    ocupados = set()
+    with ThreadPoolExecutor(max_workers=len(nos), thread_name_prefix="minerador") as executor:
+        while True:
+            espera = rng.expovariate(1 / intervalo)
+            if time.perf_counter() + espera >= fim:
+                break
+            time.sleep(espera)
+            i = rng.randrange(len(nos))
+            if i in ocupados:  # Um nó minera um bloco por vez (mining_active é por nó)
+                continue
+            ocupados.add(i)
+            executor.submit(_minerar_em, medicao, nos, i, ocupados)
+
+# --- Resultado ---
+
+def _percentis(valores: List[float]) -> Dict[str, Any]:
+    """Resumo em ms de uma lista de durações em segundos."""
+    if not valores:
+        return {"amostras": 0}
+    valores = sorted(v * 1000 for v in valores)
+
+    def p(q: float) -> float:
+        return round(valores[min(len(valores) - 1, int(q * len(valores)))], 2)
+
+    return {"amostras": len(valores), "p50": p(0.50), "p90": p(0.90), "p99": p(0.99),
+            "max": round(valores[-1], 2), "media": round(sum(valores) / len(valores), 2)}
+
+def _commit_atual() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=5, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def _convergir(nos: List[Dict[str, Any]]) -> bool:
+    """Espera todos os nós terem o mesmo topo (ou o tempo acabar)."""
+    limite = time.perf_counter() + TIMEOUT_CONVERGENCIA
+    while time.perf_counter() < limite:
+        if len({no["blockchain"]["instantaneo"]["topo"]["hash"] for no in nos}) == 1:
+            return True
+        time.sleep(0.1)
+    return False
+
+def resumir(medicao: Dict[str, Any], nos: List[Dict[str, Any]], convergiu: bool) -> Dict[str, Any]:
+    principal = {bloco["hash"] for bloco in nos[0]["blockchain"]["instantaneo"]["chain"]}
+    propagacao = []
+    for hash_bloco, (origem, instante) in medicao["minerados"].items():
+        for i, chegada in medicao["chegadas"].get(hash_bloco, {}).items():
+            if i != origem:
+                propagacao.append(max(0.0, chegada - instante))
+    orfaos = [h for h in medicao["minerados"] if h not in principal]
+    enviadas = medicao["enviadas"]
+    confirmacao = [medicao["confirmadas"][tx_id] - enviadas[tx_id][1]
+                   for tx_id in medicao["confirmadas"] if tx_id in enviadas]
+    minerados = len(medicao["minerados"])
+    return {
+        "blocos": {
+            "minerados": minerados,
+            "orfaos": len(orfaos),
+            "taxa_orfaos": round(len(orfaos) / minerados, 4) if minerados else 0.0,
+            "reorganizacoes": sum(medicao["reorganizacoes"]),
+        },
+        "propagacao_bloco_ms": _percentis(propagacao),
+        "confirmacao_tx_ms": {
+            "enviadas": len(enviadas),
+            "recusadas": medicao["recusadas"],
+            "confirmadas": len(confirmacao),
+            **_percentis(confirmacao),
+        },
+        "convergiu": convergiu,
+        "nos": [{
+            "endereco": no["address"],
+            "altura": no["blockchain"]["instantaneo"]["altura"],
+            "mempool": len(no["blockchain"]["mempool"]["txs"]),
+            "peers": len(no["peers"]),
+            "reorganizacoes": medicao["reorganizacoes"][i],
+            **no["trafego"],
+        } for i, no in enumerate(nos)],
+    }
+
+def simular(quantidade: int = 8, duracao: float = 30.0, tps: float = 50.0, intervalo_bloco: float = 2.0,
+            grau: int = 2, porta_base: int = 7000, semente: int = 1) -> Dict[str, Any]:
+    """Roda uma simulação completa e retorna o resultado (serializável em JSON)."""
+    rng = random.Random(semente)
+    nos = criar_cluster(quantidade, porta_base, grau, rng)
+    medicao = criar_medicao(nos)
+    observador = threading.Thread(target=_observador, args=(medicao, nos), daemon=True)
+    observador.start()
+    try:
+        fim = time.perf_counter() + duracao
+        carga = threading.Thread(target=_gerar_transacoes, args=(medicao, nos, tps, fim, random.Random(semente + 1)),
+                                 daemon=True)
+        carga.start()
+        _agendar_mineracao(medicao, nos, intervalo_bloco, fim, random.Random(semente + 2))
+        carga.join()
+        convergiu = _convergir(nos)
+        time.sleep(INTERVALO_OBSERVACAO * 4)  # Última varredura do observador
+        medicao["ativo"] = False
+        observador.join()
+        resultado = resumir(medicao, nos, convergiu)
+    finally:
+        medicao["ativo"] = False
+        for no in nos:
+            encerrar_no(no)
+    resultado["config"] = {"nos": quantidade, "duracao": duracao, "tps": tps, "intervalo_bloco": intervalo_bloco,
+                           "grau": grau, "semente": semente, "commit": _commit_atual()}
+    return resultado
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simula um cluster local e mede a rede P2P")
+    parser.add_argument("--nos", type=int, default=8)
+    parser.add_argument("--duracao", type=float, default=30.0, help="Segundos de carga")
+    parser.add_argument("--tps", type=float, default=50.0, help="Transações por segundo (somando todos os nós)")
+    parser.add_argument("--intervalo-bloco", type=float, default=2.0, help="Segundos médios entre blocos")
+    parser.add_argument("--grau", type=int, default=2, help="Nós anteriores a que cada novo nó se conecta")
+    parser.add_argument("--porta", type=int, default=7000, help="Porta do primeiro nó")
+    parser.add_argument("--semente", type=int, default=1)
+    parser.add_argument("--saida", type=str, default=None, help="Arquivo JSON (padrão: stdout)")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    resultado = simular(args.nos, args.duracao, args.tps, args.intervalo_bloco, args.grau, args.porta, args.semente)
+    texto = json.dumps(resultado, indent=2)
+    if args.saida:
+        with open(args.saida, "w") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
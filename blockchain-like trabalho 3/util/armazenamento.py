@@ -0,0 +1,322 @@
+# Armazenamento persistente da blockchain
+#
+# Layout do diretório de dados:
+#   blocos.dat  - segmento append-only: [4 bytes de tamanho] + bloco no codec binário
+#   indice.idx  - índice mapeado em memória (mmap): [8 bytes: altura] seguido de
+#                 um registro fixo por altura (offset, tamanho, hash de 32 bytes)
+#   estado.snap - snapshot dos índices de saldo e da mempool (codec binário)
+#
+# A cadeia em disco se comporta como a lista 'chain' (len, índice, fatia,
+# append, del chain[i:]), então o resto do código não precisa mudar. Só
+# os blocos mais acessados ficam em memória.
+
+import os
+import mmap
+import struct
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Any, Dict, List
+
+from .block import criar_bloco_genesis
+from .codec import codificar, decodificar
+from .blockchain import iniciar_blockchain, reconstruir_indices, adicionar_transacao, indexar_bloco
+from .instantaneo import publicar_instantaneo
+from .mempool import listar_mempool
+
+ARQUIVO_BLOCOS = "blocos.dat"
+ARQUIVO_INDICE = "indice.idx"
+ARQUIVO_SNAPSHOT = "estado.snap"
+
+CACHE_BLOCOS = 256            # Blocos decodificados mantidos em memória (LRU)
+CAPACIDADE_INICIAL = 1024     # Registros reservados no índice ao criá-lo
+SNAPSHOT_A_CADA_BLOCOS = 100  # Blocos anexados que tornam o snapshot velho (ver snapshot_pendente)
+
+_CABECALHO_INDICE = struct.Struct(">Q")      # altura
+_REGISTRO = struct.Struct(">QI32s")          # offset, tamanho, hash
+_TAMANHO_QUADRO = 4
+
+class CadeiaPersistente(Sequence):
+    """
+    Lista de blocos gravada em disco.
+    É uma classe (e não um dicionário de estado) porque precisa ocupar o
+    lugar da lista blockchain["chain"], que o resto do código indexa e fatia.
+    """
+
+    def __init__(self, diretorio: str):
+        os.makedirs(diretorio, exist_ok=True)
+        self.diretorio = diretorio
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[int, Dict]" = OrderedDict()
+        self._lock_snapshot = threading.Lock()  # Um snapshot gravado por vez
+        self.anexados = 0  # Blocos anexados desde o último snapshot
+        self._arquivo = open(os.path.join(diretorio, ARQUIVO_BLOCOS), "a+b")
+        self._fim_dados = self._arquivo.seek(0, os.SEEK_END)
+
+        caminho_indice = os.path.join(diretorio, ARQUIVO_INDICE)
+        novo = not os.path.exists(caminho_indice) or os.path.getsize(caminho_indice) < _CABECALHO_INDICE.size
+        self._arquivo_indice = open(caminho_indice, "w+b" if novo else "r+b")
+        if novo:
+            self._arquivo_indice.truncate(_CABECALHO_INDICE.size + CAPACIDADE_INICIAL * _REGISTRO.size)
+        self._mapa = mmap.mmap(self._arquivo_indice.fileno(), 0)
+        self._altura = _CABECALHO_INDICE.unpack_from(self._mapa, 0)[0]
+        if novo and self._fim_dados:
+            self._reconstruir_indice()
+        self._recuperar()
+
+    # --- Índice mapeado ---
+
+    def _capacidade(self) -> int:
+        return (len(self._mapa) - _CABECALHO_INDICE.size) // _REGISTRO.size
+
+    def _registro(self, altura: int):
+        return _REGISTRO.unpack_from(self._mapa, _CABECALHO_INDICE.size + altura * _REGISTRO.size)
+
+    def _gravar_registro(self, altura: int, offset: int, tamanho: int, hash_bloco: str):
+        if altura >= self._capacidade():
+            # Dobra o arquivo do índice e refaz o mapeamento
+            self._mapa.close()
+            self._arquivo_indice.truncate(_CABECALHO_INDICE.size + 2 * max(altura, CAPACIDADE_INICIAL) * _REGISTRO.size)
+            self._mapa = mmap.mmap(self._arquivo_indice.fileno(), 0)
+        _REGISTRO.pack_into(self._mapa, _CABECALHO_INDICE.size + altura * _REGISTRO.size,
+                            offset, tamanho, bytes.fromhex(hash_bloco))
+
+    def _definir_altura(self, altura: int):
+        self._altura = altura
+        _CABECALHO_INDICE.pack_into(self._mapa, 0, altura)
+
+    def _recuperar(self):
+        """
+        Descarta o que uma queda deixou pela metade: registros que apontam
+        além do fim do segmento e bytes do segmento sem registro no índice.
+        """
+        while self._altura > 0:
+            offset, tamanho, _ = self._registro(self._altura - 1)
+            if offset + _TAMANHO_QUADRO + tamanho <= self._fim_dados:
+                break
+            self._definir_altura(self._altura - 1)
+        fim = 0
+        if self._altura > 0:
+            offset, tamanho, _ = self._registro(self._altura - 1)
+            fim = offset + _TAMANHO_QUADRO + tamanho
+        if fim < self._fim_dados:
+            self._arquivo.truncate(fim)
+            self._fim_dados = fim
+
+    def _reconstruir_indice(self):
+        """Índice perdido: percorre o segmento de blocos e o recria."""
+        self._definir_altura(0)
+        self._arquivo.seek(0)
+        offset = 0
+        while True:
+            prefixo = self._arquivo.read(_TAMANHO_QUADRO)
+            if len(prefixo) < _TAMANHO_QUADRO:
+                break
+            tamanho = int.from_bytes(prefixo, "big")
+            corpo = self._arquivo.read(tamanho)
+            if len(corpo) < tamanho:
+                break
+            bloco = decodificar(corpo)
+            self._gravar_registro(self._altura, offset, tamanho, bloco["hash"])
+            self._definir_altura(self._altura + 1)
+            offset += _TAMANHO_QUADRO + tamanho
+
+    # --- Protocolo de lista ---
+
+    def __len__(self) -> int:
+        return self._altura
+
+    def hash_em(self, altura: int) -> str:
+        """Hash do bloco numa altura, lido direto do índice (sem decodificar o bloco)."""
+        with self._lock:
+            return self._registro(altura)[2].hex()
+
+    def hashes(self, fim: int) -> List[str]:
+        """Hashes das alturas 0..fim-1, numa passada pelo índice."""
+        with self._lock:
+            return [h.hex() for _, _, h in _REGISTRO.iter_unpack(
+                self._mapa[_CABECALHO_INDICE.size:_CABECALHO_INDICE.size + fim * _REGISTRO.size])]
+
+    def _ler_intervalo(self, inicio: int, fim: int) -> List[Dict]:
+        """Lê blocos consecutivos com uma única leitura do segmento."""
+        primeiro, _, _ = self._registro(inicio)
+        ultimo, tamanho, _ = self._registro(fim - 1)
+        self._arquivo.seek(primeiro)
+        dados = memoryview(self._arquivo.read(ultimo + _TAMANHO_QUADRO + tamanho - primeiro))
+        blocos = []
+        pos = 0
+        for _ in range(inicio, fim):
+            tamanho = int.from_bytes(dados[pos:pos + _TAMANHO_QUADRO], "big")
+            pos += _TAMANHO_QUADRO
+            blocos.append(decodificar(dados[pos:pos + tamanho]))
+            pos += tamanho
+        return blocos
+
+    def __getitem__(self, chave):
+        with self._lock:
+            if isinstance(chave, slice):
+                inicio, fim, passo = chave.indices(self._altura)
+                if passo != 1:
+                    raise ValueError("CadeiaPersistente só aceita fatias contíguas")
+                if inicio >= fim:
+                    return []
+                # Fatias servem o histórico (sync, REQUEST_BLOCKS) e não passam pelo cache
+                return self._ler_intervalo(inicio, fim)
+            if chave < 0:
+                chave += self._altura
+            if not 0 <= chave < self._altura:
+                raise IndexError("índice fora da cadeia")
+            bloco = self._cache.get(chave)
+            if bloco is not None:
+                self._cache.move_to_end(chave)
+                return bloco
+            bloco = self._ler_intervalo(chave, chave + 1)[0]
+            self._cache[chave] = bloco
+            if len(self._cache) > CACHE_BLOCOS:
+                self._cache.popitem(last=False)
+            return bloco
+
+    def __iter__(self):
+        passo = 512
+        for inicio in range(0, len(self), passo):
+            yield from self[inicio:inicio + passo]
+
+    def append(self, bloco: Dict[str, Any]):
+        corpo = codificar(bloco)
+        with self._lock:
+            offset = self._fim_dados
+            self._arquivo.write(len(corpo).to_bytes(_TAMANHO_QUADRO, "big") + corpo)
+            # Bloco no segmento antes do registro: uma queda aqui só deixa bytes órfãos
+            self._arquivo.flush()
+            self._fim_dados = offset + _TAMANHO_QUADRO + len(corpo)
+            self._gravar_registro(self._altura, offset, len(corpo), bloco["hash"])
+            self._cache[self._altura] = bloco
+            self._definir_altura(self._altura + 1)
+            self.anexados += 1
+            if len(self._cache) > CACHE_BLOCOS:
+                self._cache.popitem(last=False)
+
+    def __delitem__(self, chave):
+        """Só remove um sufixo (del chain[i:]), que é o que uma reorganização faz."""
+        if not isinstance(chave, slice) or chave.stop is not None or chave.step not in (None, 1):
+            raise ValueError("CadeiaPersistente só permite remover o final da cadeia")
+        with self._lock:
+            inicio = chave.indices(self._altura)[0]
+            if inicio >= self._altura:
+                return
+            offset, _, _ = self._registro(inicio)
+            self._definir_altura(inicio)
+            self._arquivo.truncate(offset)
+            self._fim_dados = offset
+            for altura in [a for a in self._cache if a >= inicio]:
+                del self._cache[altura]
+
+    # --- Durabilidade ---
+
+    def sincronizar(self):
+        """Força a gravação em disco (segmento e índice)."""
+        with self._lock:
+            self._arquivo.flush()
+            os.fsync(self._arquivo.fileno())
+            self._mapa.flush()
+
+    def fechar(self):
+        self.sincronizar()
+        with self._lock:
+            self._mapa.close()
+            self._arquivo_indice.close()
+            self._arquivo.close()
+
+# --- Snapshot dos índices ---
+
+def _caminho_snapshot(cadeia: CadeiaPersistente) -> str:
+    return os.path.join(cadeia.diretorio, ARQUIVO_SNAPSHOT)
+
+def salvar_snapshot(blockchain: Dict[str, Any]):
+    """
+    Grava os índices de saldo e a mempool junto com a altura e o hash do
+    topo. A troca do arquivo é atômica (os.replace).
+    """
+    cadeia = blockchain["chain"]
+    with cadeia._lock_snapshot:
+        with blockchain["lock"], blockchain["mempool"]["lock"]:
+            cadeia.sincronizar()
+            cadeia.anexados = 0
+            dados = codificar({
+                "altura": len(cadeia),
+                "hash": cadeia.hash_em(len(cadeia) - 1),
+                "saldos": blockchain["saldos"],
+                "ids_confirmados": blockchain["ids_confirmados"],
+                "trabalho": blockchain["trabalho"],
+                "pending_transactions": listar_mempool(blockchain["mempool"]),
+            })
+        caminho = _caminho_snapshot(cadeia)
+        with open(caminho + ".tmp", "wb") as f:
+            f.write(dados)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(caminho + ".tmp", caminho)
+
+def snapshot_pendente(blockchain: Dict[str, Any]) -> bool:
+    """
+    Indica se já entraram SNAPSHOT_A_CADA_BLOCOS blocos desde o último
+    snapshot. Sem gravá-lo de tempos em tempos, uma queda faz a próxima
+    carga reaplicar tudo desde o último fechamento limpo.
+    """
+    cadeia = blockchain["chain"]
+    return isinstance(cadeia, CadeiaPersistente) and cadeia.anexados >= SNAPSHOT_A_CADA_BLOCOS
+
+def _carregar_snapshot(blockchain: Dict[str, Any]) -> bool:
+    """
+    Restaura os índices a partir do snapshot e aplica só os blocos gravados
+    depois dele. Retorna False se o snapshot não existir ou não corresponder
+    à cadeia em disco (ex: houve uma reorganização abaixo dele).
+    """
+    cadeia = blockchain["chain"]
+    try:
+        with open(_caminho_snapshot(cadeia), "rb") as f:
+            snapshot = decodificar(f.read())
+    except (OSError, ValueError, IndexError):
+        return False
+    altura = snapshot["altura"]
+    if altura > len(cadeia) or cadeia.hash_em(altura - 1) != snapshot["hash"]:
+        return False
+    if "trabalho" not in snapshot:
+        return False  # Snapshot anterior ao trabalho acumulado: reindexa
+
+    blockchain["saldos"] = snapshot["saldos"]
+    blockchain["ids_confirmados"] = snapshot["ids_confirmados"]
+    blockchain["trabalho"] = snapshot["trabalho"]
+    blockchain["altura_por_hash"] = {h: i for i, h in enumerate(cadeia.hashes(altura))}
+    for bloco in cadeia[altura:]:
+        indexar_bloco(blockchain, bloco)
+    publicar_instantaneo(blockchain)
+    for tx in snapshot["pending_transactions"]:
+        adicionar_transacao(blockchain, tx, confiavel=True)
+    return True
+
+# --- Abertura/fechamento ---
+
+def abrir_blockchain(diretorio: str) -> Dict[str, Any]:
+    """
+    Carrega (ou cria) a blockchain persistida em 'diretorio'.
+    Com um snapshot válido a carga não lê os blocos antigos; sem ele os
+    índices são reconstruídos percorrendo a cadeia uma vez.
+    """
+    blockchain = iniciar_blockchain()
+    cadeia = CadeiaPersistente(diretorio)
+    if len(cadeia) == 0:
+        cadeia.append(criar_bloco_genesis())
+    elif cadeia.hash_em(0) != blockchain["chain"][0]["hash"]:
+        cadeia.fechar()
+        raise ValueError(f"O diretório {diretorio} contém uma cadeia com outro bloco gênesis")
+    blockchain["chain"] = cadeia
+    if not _carregar_snapshot(blockchain):
+        reconstruir_indices(blockchain)
+    return blockchain
+
+def fechar_blockchain(blockchain: Dict[str, Any]):
+    """Grava o snapshot e fecha os arquivos (só para cadeias persistentes)."""
+    if isinstance(blockchain["chain"], CadeiaPersistente):
+        salvar_snapshot(blockchain)
+        blockchain["chain"].fechar()
@@ -2,38 +2,76 @@
 # Funções utilitárias para lidar com blocos
 
 import hashlib
-import json
 import time
 from typing import Any, Dict, List
+from .merkle import calcular_merkle_root
+from .dificuldade import ALVO_MAXIMO, alvo_do_bloco, alvo_para_hex, hash_atende_alvo
+
+# Campos que compõem o cabeçalho do bloco (o que é de fato hasheado)
+CAMPOS_CABECALHO = ("index", "previous_hash", "merkle_root", "timestamp", "alvo", "nonce")
+
+def prefixo_cabecalho(bloco: Dict[str, Any]) -> bytes:
+    """
+    Serializa o cabeçalho sem o nonce. O formato é fixo para que todos
+    os nós cheguem ao mesmo hash: index|previous_hash|merkle_root|timestamp|alvo|
+    (o gênesis não tem alvo e termina no timestamp).
+    """
+    timestamp = repr(float(bloco["timestamp"]))
+    prefixo = f"{bloco['index']}|{bloco['previous_hash']}|{bloco['merkle_root']}|{timestamp}|"
+    if "alvo" in bloco:
+        prefixo += f"{bloco['alvo']}|"
+    return prefixo.encode()
+
+def preparar_hash_cabecalho(bloco: Dict[str, Any]) -> "hashlib._Hash":
+    """
+    Retorna um objeto sha256 já alimentado com o prefixo do cabeçalho.
+    Na mineração basta copiá-lo (.copy()) e acrescentar o nonce.
+    """
+    return hashlib.sha256(prefixo_cabecalho(bloco))
+
+def hash_com_nonce(hasher_prefixo: "hashlib._Hash", nonce: int) -> str:
+    """Completa o hash do cabeçalho pré-calculado com um nonce."""
+    h = hasher_prefixo.copy()
+    h.update(str(nonce).encode())
+    return h.hexdigest()
 
 def calcular_hash_bloco(bloco: Dict[str, Any]) -> str:
     """
     Calcula o hash SHA-256 do bloco.
-    O hash é baseado em todos os campos exceto o próprio campo 'hash'.
+    O hash cobre apenas o cabeçalho; as transações entram pela merkle_root,
+    então o custo não depende da quantidade de transações.
     """
-    # Criamos uma cópia para não alterar o bloco original e removemos o hash
-    dados_para_hash = bloco.copy()
-    dados_para_hash.pop("hash", None)
-    
-    # sort_keys=True é VITAL para que o JSON seja sempre igual, 
-    # caso contrário, a ordem das chaves mudaria o hash.
-    bloco_string = json.dumps(dados_para_hash, sort_keys=True)
-    return hashlib.sha256(bloco_string.encode()).hexdigest()
+    return hash_com_nonce(preparar_hash_cabecalho(bloco), bloco["nonce"])
+
+def extrair_cabecalho(bloco: Dict[str, Any]) -> Dict[str, Any]:
+    """Retorna só o cabeçalho do bloco (campos hasheados + hash)."""
+    cabecalho = {campo: bloco[campo] for campo in CAMPOS_CABECALHO if campo in bloco}
+    cabecalho["hash"] = bloco["hash"]
+    return cabecalho
+
+def validar_merkle_root(bloco: Dict[str, Any]) -> bool:
+    """Confere se a merkle_root do cabeçalho corresponde às transações do bloco."""
+    return bloco.get("merkle_root") == calcular_merkle_root(bloco["transactions"])
 
 def criar_bloco(index: int, previous_hash: str, transacoes: List[Dict], 
-                nonce: int = 0, timestamp: float = None, hash_bloco: str = "") -> Dict[str, Any]:
+                nonce: int = 0, timestamp: float = None, hash_bloco: str = "",
+                alvo: int = None) -> Dict[str, Any]:
     """
     Cria a estrutura de um bloco.
     Se não for passado um hash, ele calcula automaticamente.
+    O alvo do PoW (ver util/dificuldade.py) só fica de fora no gênesis.
     """
     bloco = {
         "index": index,
         "previous_hash": previous_hash,
         "transactions": transacoes,
+        "merkle_root": calcular_merkle_root(transacoes),
         "nonce": nonce,
         "timestamp": timestamp if timestamp != None else time.time(),
         "hash": hash_bloco
     }
+    if alvo is not None:
+        bloco["alvo"] = alvo_para_hex(alvo)
     
     if not bloco["hash"]:
         bloco["hash"] = calcular_hash_bloco(bloco)
@@ -53,8 +91,14 @@ def criar_bloco_genesis() -> Dict[str, Any]:
         timestamp=0  # Um valor fixo garante que o hash do gênesis seja o mesmo para todos
     )
 
-def validar_proof_of_work(bloco: Dict[str, Any], dificuldade: str = "000") -> bool:
+def validar_proof_of_work(bloco: Dict[str, Any]) -> bool:
     """
-    Verifica se o hash do bloco começa com a quantidade de zeros exigida.
+    Verifica se o hash do bloco, como inteiro, é menor que o alvo declarado
+    nele. Se esse alvo é o exigido pela cadeia é conferido à parte
+    (alvo_e_tempo_validos), pois depende dos blocos anteriores.
     """
-    return bloco["hash"].startswith(dificuldade)
\ No newline at end of file
+    try:
+        alvo = alvo_do_bloco(bloco) if "alvo" in bloco else 0
+        return 0 < alvo <= ALVO_MAXIMO and hash_atende_alvo(bloco["hash"], alvo)
+    except (ValueError, TypeError):
+        return False  # Alvo ou hash que não são hex
\ No newline at end of file
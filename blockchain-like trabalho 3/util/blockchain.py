@@ -1,103 +1,335 @@
 # Funções utilitárias para lidar com a blockchain
+#
+# Concorrência: quem altera a cadeia (blocos, índices, ramos) usa
+# blockchain["lock"] e, para aplicar a alteração, mempool["lock"] (sempre
+# nesta ordem). Quem só lê usa blockchain["instantaneo"], sem lock.
 
-from typing import Any, Dict, List
-from .block import criar_bloco_genesis, calcular_hash_bloco, validar_proof_of_work
-from .transaction import comparar_transacoes
+import threading
+from collections import ChainMap
+from typing import Any, Dict, List, Optional
+from .block import (
+    criar_bloco_genesis, calcular_hash_bloco, validar_proof_of_work,
+    extrair_cabecalho
+)
+from .merkle import gerar_prova_merkle, verificar_prova_merkle
+from .transaction import validar_estrutura_transacao
+from .mempool import (
+    criar_mempool, adicionar_a_mempool, remover_da_mempool, remover_confirmadas, listar_mempool,
+    custo_transacao, vitimas_para_lote
+)
+from .instantaneo import publicar_instantaneo, preservar_visoes
+from .validacao import (
+    validar_blocos, validar_bloco_isolado, encadeado, aplicar_saldos, saldos_na_altura,
+    MIN_BLOCOS_PARALELO, ORIGENS_RESERVADAS
+)
+from .dificuldade import trabalho_do_bloco, alvo_e_tempo_validos
 
-# Configurações Globais
-DIFICULDADE = "000"
+# Configurações Globais (a dificuldade do PoW fica em util/dificuldade.py)
+MAX_BLOCOS_RAMOS = 500        # Limite de blocos guardados na árvore de forks
+PROFUNDIDADE_MAX_RAMOS = 100  # Ramos que saíram da cadeia há mais que isso são descartados
+MAX_TRANSACOES_LOTE = 5000    # Transações aceitas numa única submissão em lote
+CONFIRMACOES_PAGAMENTO = 3    # Blocos (o da transação incluído) para considerar um pagamento confirmado
 
 def iniciar_blockchain() -> Dict[str, Any]:
     """
     Inicializa o estado da blockchain.
     Substitui o __init__ da classe.
     """
+    genesis = criar_bloco_genesis()
+    blockchain = {
+        "chain": [genesis],
+        "mempool": criar_mempool(), # Transações pendentes (limitada, ordenada por taxa)
+        # Índices incrementais: evitam percorrer a cadeia a cada consulta de saldo
+        "saldos": {},             # endereço -> saldo confirmado nos blocos
+        "saldos_alterados": set(),  # Endereços mudados desde o último instantâneo
+        "ids_confirmados": {},    # id da transação -> índice do bloco
+        # Blocos já verificados: os da cadeia principal (hash -> índice) e os
+        # de ramos laterais (árvore de forks), para trocar de ramo sem novo download
+        "altura_por_hash": {genesis["hash"]: 0},
+        "ramos": {},              # hash -> bloco validado fora da cadeia principal
+        "trabalho": 0,            # Trabalho acumulado da cadeia principal (escolha entre forks)
+        "lock": threading.RLock() # Serializa os escritores da cadeia (leitores usam o instantâneo)
+    }
+    publicar_instantaneo(blockchain)
+    return blockchain
+
+def exportar_blockchain(blockchain: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Retorna apenas os dados serializáveis da blockchain (sem os índices),
+    no formato esperado pelas mensagens RESPONSE_CHAIN. Lê o instantâneo.
+    """
     return {
-        "chain": [criar_bloco_genesis()],
-        "pending_transactions": []
+        "chain": list(blockchain["instantaneo"]["chain"]),
+        "pending_transactions": listar_mempool(blockchain["mempool"])
     }
 
 def obter_ultimo_bloco(blockchain: Dict[str, Any]) -> Dict[str, Any]:
-    """Retorna o último bloco da lista 'chain'."""
-    return blockchain["chain"][-1]
+    """Retorna o último bloco da cadeia (do instantâneo atual)."""
+    return blockchain["instantaneo"]["topo"]
+
+# --- Índice de saldos ---
+
+def _somar(indice: Dict[str, float], endereco: str, valor: float):
+    """Soma (ou subtrai) um valor no índice, descartando entradas zeradas."""
+    novo = indice.get(endereco, 0.0) + valor
+    if abs(novo) < 1e-9:
+        indice.pop(endereco, None)
+    else:
+        indice[endereco] = novo
+
+def indexar_bloco(blockchain: Dict[str, Any], bloco: Dict[str, Any], sinal: int = 1):
+    """
+    Aplica (sinal=1) ou desfaz (sinal=-1) as transações de um bloco
+    nos índices de saldos e de ids confirmados, e o seu trabalho no total.
+    """
+    saldos = blockchain["saldos"]
+    alterados = blockchain["saldos_alterados"]
+    ids = blockchain["ids_confirmados"]
+    blockchain["trabalho"] += sinal * trabalho_do_bloco(bloco)
+    if sinal > 0:
+        blockchain["altura_por_hash"][bloco["hash"]] = bloco["index"]
+    else:
+        blockchain["altura_por_hash"].pop(bloco["hash"], None)
+    for tx in bloco["transactions"]:
+        _somar(saldos, tx["destino"], sinal * tx["valor"])
+        _somar(saldos, tx["origem"], -sinal * custo_transacao(tx))
+        alterados.add(tx["destino"])
+        alterados.add(tx["origem"])
+        if sinal > 0:
+            ids[tx["id"]] = bloco["index"]
+        else:
+            ids.pop(tx["id"], None)
+
+def reconstruir_indices(blockchain: Dict[str, Any]):
+    """
+    Recalcula todos os índices do zero (ex: blockchain carregada de outra fonte).
+    Custo linear no tamanho da cadeia, por isso só deve ser usado na carga.
+    """
+    blockchain["saldos"] = {}
+    blockchain["ids_confirmados"] = {}
+    blockchain["altura_por_hash"] = {}
+    blockchain["trabalho"] = 0
+    for bloco in blockchain["chain"]:
+        indexar_bloco(blockchain, bloco)
+    publicar_instantaneo(blockchain)
+
+def _remover_sem_saldo(blockchain: Dict[str, Any], origens):
+    """
+    Depois de aplicar blocos: tira da mempool as transações pendentes das
+    'origens' cujo saldo confirmado não cobre mais o que elas gastam (ex:
+    um bloco concorrente confirmou outro gasto do mesmo saldo). Na ordem de
+    chegada, ficam as que ainda cabem. Sem isso o minerador as colocaria em
+    todo modelo de bloco, e todo bloco minerado seria recusado.
+    Deve ser chamada com o lock da mempool.
+    """
+    mempool = blockchain["mempool"]
+    saldos = blockchain["saldos"]
+    disponivel = {origem: saldos.get(origem, 0.0) for origem in origens
+                  if saldos.get(origem, 0.0) < mempool["saidas"].get(origem, 0.0) - 1e-9}
+    if not disponivel:
+        return
+    for tx in list(mempool["txs"].values()):
+        origem = tx["origem"]
+        if origem not in disponivel:
+            continue
+        custo = custo_transacao(tx)
+        if disponivel[origem] < custo - 1e-9:
+            remover_da_mempool(mempool, tx["id"])
+        else:
+            disponivel[origem] -= custo
 
 def calcular_saldo(blockchain: Dict[str, Any], endereco: str) -> float:
     """
-    Calcula o saldo percorrendo toda a cadeia e transações pendentes.
+    Retorna o saldo disponível: confirmado nos blocos menos o que já
+    saiu da conta em transações pendentes. Consulta O(1) nos índices,
+    sem lock (saldos do instantâneo).
     Regra do escopo: não permitir saldo negativo.
     """
-    saldo = 0.0
-    
-    # 1. Saldo em blocos confirmados
-    for bloco in blockchain["chain"]:
-        for tx in bloco["transactions"]:
-            if tx["destino"] == endereco:
-                saldo += tx["valor"]
-            if tx["origem"] == endereco:
-                saldo -= tx["valor"]
-                
-    # 2. Subtrai transações que já saíram da conta mas estão na mempool
-    for tx in blockchain["pending_transactions"]:
-        if tx["origem"] == endereco:
-            saldo -= tx["valor"]
-            
-    return saldo
+    return (blockchain["instantaneo"]["saldos"].get(endereco, 0.0)
+            - blockchain["mempool"]["saidas"].get(endereco, 0.0))
+
+def obter_prova_transacao(blockchain: Dict[str, Any], tx_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Monta a prova de inclusão de uma transação confirmada:
+    a transação, o cabeçalho do bloco e o caminho de Merkle até a raiz.
+    Retorna None se a transação não estiver em nenhum bloco.
+    """
+    indice_bloco = blockchain["ids_confirmados"].get(tx_id)
+    chain = blockchain["instantaneo"]["chain"]
+    if indice_bloco is None or indice_bloco >= len(chain):
+        return None
+    bloco = chain[indice_bloco]
+    for posicao, tx in enumerate(bloco["transactions"]):
+        if tx["id"] == tx_id:
+            return {
+                "transaction": tx,
+                "header": extrair_cabecalho(bloco),
+                "proof": gerar_prova_merkle(bloco["transactions"], posicao)
+            }
+    return None
+
+def verificar_prova_transacao(blockchain: Dict[str, Any], prova: Dict[str, Any], tx_id: str,
+                              confirmacoes: int = CONFIRMACOES_PAGAMENTO) -> bool:
+    """
+    Verifica a prova de um peer para a transação 'tx_id': a transação é a
+    pedida, o cabeçalho tem hash e PoW válidos e é o bloco daquela altura na
+    cadeia principal local (instantâneo), com pelo menos 'confirmacoes'
+    blocos até o topo, e a transação está sob a merkle_root dele.
+    Uma prova malformada é simplesmente inválida.
+    """
+    try:
+        cabecalho = prova["header"]
+        transacao = prova["transaction"]
+        if transacao["id"] != tx_id:
+            return False
+        if cabecalho["hash"] != calcular_hash_bloco(cabecalho) or not validar_proof_of_work(cabecalho):
+            return False
+        # Um cabeçalho só é aceito se for de um bloco que este nó já validou
+        instantaneo = blockchain["instantaneo"]
+        altura = cabecalho["index"]
+        if not (isinstance(altura, int) and 0 <= altura < instantaneo["altura"]):
+            return False
+        if instantaneo["chain"][altura]["hash"] != cabecalho["hash"]:
+            return False
+        if instantaneo["altura"] - altura < confirmacoes:
+            return False
+        return verificar_prova_merkle(transacao, prova["proof"], cabecalho["merkle_root"])
+    except (KeyError, TypeError, ValueError, AttributeError, IndexError):
+        return False
 
 def adicionar_transacao(blockchain: Dict[str, Any], transacao: Dict[str, Any], confiavel: bool = False) -> bool:
     """
-    Tenta adicionar uma transação à lista de pendentes.
+    Tenta adicionar uma transação à mempool.
+    Pode ser recusada por saldo, duplicata ou por falta de espaço na mempool.
+    Origens que emitem moeda ("genesis", "coinbase") nunca entram: só os
+    blocos as trazem.
+    Só usa o lock da mempool: não espera a validação de blocos.
     """
-    # Evita duplicatas na mempool
-    if any(comparar_transacoes(tx, transacao) for tx in blockchain["pending_transactions"]):
+    if transacao.get("taxa", 0.0) < 0 or transacao["origem"] in ORIGENS_RESERVADAS:
         return False
-        
-    # Evita duplicatas em blocos já minerados
-    for bloco in blockchain["chain"]:
-        if any(comparar_transacoes(tx, transacao) for tx in bloco["transactions"]):
+    with blockchain["mempool"]["lock"]:
+        # Evita duplicatas na mempool e em blocos já minerados (consulta O(1) nos índices)
+        if transacao["id"] in blockchain["mempool"]["txs"]:
             return False
-            
-    # Validação de saldo (exceto para geração inicial de moedas)
-    if not confiavel and transacao["origem"] not in ("genesis", "coinbase"):
-        saldo_atual = calcular_saldo(blockchain, transacao["origem"])
-        if saldo_atual < transacao["valor"]:
+        if transacao["id"] in blockchain["ids_confirmados"]:
             return False
-            
-    blockchain["pending_transactions"].append(transacao)
-    return True
+                
+        # Validação de saldo. Os blocos são aplicados com este lock, então o
+        # instantâneo aqui está em dia
+        if not confiavel:
+            saldo_atual = calcular_saldo(blockchain, transacao["origem"])
+            if saldo_atual < custo_transacao(transacao):
+                return False
+                
+        return adicionar_a_mempool(blockchain["mempool"], transacao)
+
+def _motivo_recusa_lote(blockchain: Dict[str, Any], transacao: Dict[str, Any], no_lote: set,
+                        gastos: Dict[str, float]) -> Optional[str]:
+    """Por que a transação não pode entrar junto com as anteriores do lote (None se pode)."""
+    if not isinstance(transacao, dict):
+        return "estrutura"
+    try:
+        validar_estrutura_transacao(transacao)
+        transacao["id"]
+    except (ValueError, KeyError, TypeError):
+        return "estrutura"
+    if transacao["id"] in no_lote:
+        return "repetida no lote"
+    if transacao["id"] in blockchain["mempool"]["txs"] or transacao["id"] in blockchain["ids_confirmados"]:
+        return "duplicada"
+    # Quem submete de fora não emite moeda: essas origens são só dos blocos
+    origem = transacao["origem"]
+    if origem in ORIGENS_RESERVADAS:
+        return "origem reservada"
+    if calcular_saldo(blockchain, origem) - gastos.get(origem, 0.0) < custo_transacao(transacao):
+        return "saldo"
+    return None
+
+def adicionar_lote_transacoes(blockchain: Dict[str, Any], transacoes: List[Dict[str, Any]]) -> List[List[str]]:
+    """
+    Admite um lote de transações de uma vez: ou entram todas ou nenhuma.
+    Todas são conferidas contra o mesmo instantâneo de saldos, somando o
+    que as anteriores do lote já gastam da mesma origem.
+    Retorna as recusadas como pares [id, motivo]; lista vazia = lote aceito.
+    Com a mempool cheia, o espaço (e quem sai para abri-lo) é calculado antes
+    de qualquer inserção: um lote que não cabe é recusado sem mexer nela.
+    """
+    if not isinstance(transacoes, list):
+        return [[None, "estrutura"]]
+    if len(transacoes) > MAX_TRANSACOES_LOTE:
+        return [[None, "lote grande demais"]]
+    mempool = blockchain["mempool"]
+    with mempool["lock"]:
+        recusadas = []
+        no_lote = set()
+        gastos: Dict[str, float] = {}
+        for tx in transacoes:
+            motivo = _motivo_recusa_lote(blockchain, tx, no_lote, gastos)
+            if motivo:
+                recusadas.append([tx.get("id") if isinstance(tx, dict) else None, motivo])
+                continue
+            no_lote.add(tx["id"])
+            gastos[tx["origem"]] = gastos.get(tx["origem"], 0.0) + custo_transacao(tx)
+        if recusadas:
+            return recusadas
+
+        vitimas = vitimas_para_lote(mempool, transacoes)
+        if vitimas is None:
+            return [[None, "mempool cheia"]]
+        for tx_id in vitimas:
+            remover_da_mempool(mempool, tx_id)
+        for tx in transacoes:
+            adicionar_a_mempool(mempool, tx) # Há espaço para todas: nenhuma é recusada
+        return []
 
 def validar_bloco(blockchain: Dict[str, Any], bloco: Dict[str, Any]) -> bool:
     """Valida se o bloco pode ser inserido na cadeia atual."""
-    ultimo = obter_ultimo_bloco(blockchain)
+    instantaneo = blockchain["instantaneo"]
     
     # Verifica continuidade
-    if bloco["index"] != len(blockchain["chain"]):
-        return False
-    if bloco["previous_hash"] != ultimo["hash"]:
+    if not encadeado(instantaneo["topo"], bloco):
         return False
         
-    # Verifica integridade matemática e PoW
-    if not validar_proof_of_work(bloco, DIFICULDADE):
+    # Verifica integridade matemática, PoW e estrutura das transações
+    if not validar_bloco_isolado(bloco):
         return False
-    if bloco["hash"] != calcular_hash_bloco(bloco):
+
+    # O alvo precisa ser o exigido pela cadeia, e o timestamp, plausível
+    if not alvo_e_tempo_validos(instantaneo["chain"].__getitem__, bloco):
         return False
-        
-    return True
+
+    # Nenhuma transação pode gastar mais do que a origem tem (rascunho sobre os saldos do instantâneo)
+    return aplicar_saldos(ChainMap({}, instantaneo["saldos"]), bloco)
 
 def adicionar_bloco(blockchain: Dict[str, Any], bloco: Dict[str, Any]) -> bool:
-    """Valida e anexa o bloco, limpando a mempool."""
+    """
+    Valida e anexa o bloco, limpando a mempool.
+    A validação (merkle, hash, PoW) roda sem lock; sob o lock só se
+    confere que o topo não mudou e se aplica o bloco.
+    """
     if not validar_bloco(blockchain, bloco):
         return False
-        
-    # Remove da mempool as transações que agora estão confirmadas neste bloco
-    ids_no_bloco = [tx["id"] for tx in bloco["transactions"]]
-    blockchain["pending_transactions"] = [
-        tx for tx in blockchain["pending_transactions"] 
-        if tx["id"] not in ids_no_bloco
-    ]
-    
-    blockchain["chain"].append(bloco)
+
+    with blockchain["lock"]:
+        if blockchain["chain"][-1]["hash"] != bloco["previous_hash"]:
+            return False # Outro bloco entrou no topo durante a validação
+        with blockchain["mempool"]["lock"]:
+            blockchain["chain"].append(bloco)
+            indexar_bloco(blockchain, bloco)
+            # Remove da mempool as transações que agora estão confirmadas neste bloco
+            # e as que ficaram sem saldo por causa dele
+            remover_confirmadas(blockchain["mempool"], bloco["transactions"])
+            _remover_sem_saldo(blockchain, {tx["origem"] for tx in bloco["transactions"]})
+            publicar_instantaneo(blockchain)
     return True
 
+def validar_sufixo(ancora: Dict[str, Any], blocos: List[Dict], cadeia_local: List[Dict]) -> bool:
+    """
+    Verifica se uma sequência de blocos (ou cabeçalhos) continua a partir
+    de 'ancora', bloco de 'cadeia_local' já conhecido e válido. Não confere saldos.
+    """
+    return validar_blocos(ancora, blocos, cadeia_local) == len(blocos)
+
 def validar_cadeia_completa(chain: List[Dict]) -> bool:
     """
     Verifica se uma lista de blocos é uma blockchain válida.
@@ -109,49 +341,232 @@ def validar_cadeia_completa(chain: List[Dict]) -> bool:
 
     if chain[0]["hash"] != genesis_esperado["hash"]:
         return False
-    # Valida o encadeamento
-    for i in range(1, len(chain)):
-        bloco_atual = chain[i]
-        bloco_anterior = chain[i-1]
-        
-        if bloco_atual["previous_hash"] != bloco_anterior["hash"]:
-            return False
-        if bloco_atual["hash"] != calcular_hash_bloco(bloco_atual):
-            return False
-        if not validar_proof_of_work(bloco_atual, DIFICULDADE):
-            return False
-            
-    return True
+    # Valida o resto pelo pipeline (estágio paralelo + encadeamento e saldos)
+    saldos = {}
+    aplicar_saldos(saldos, chain[0])
+    return validar_blocos(chain[0], chain[1:], chain, saldos) == len(chain) - 1
 
 def substituir_pela_corrente_mais_longa(no_estado: Dict[str, Any], chain_recebida: List[Dict]) -> bool:
     """
-    Aplica a regra da corrente mais longa (Nakamoto Consensus).
+    Aplica a regra da cadeia de maior trabalho acumulado (Nakamoto
+    Consensus; o nome vem de quando valia a mais longa).
+    Aceita a cadeia completa ou apenas um sufixo dela (primeiro bloco com
+    index > 0). Só os blocos após o ancestral comum com a cadeia local são
+    validados, e blocos já verificados (cadeia ou ramos) não são refeitos.
+    Cadeias grandes passam pelo pipeline de validação: cada prefixo
+    verificado que já supera a cadeia local é aplicado sem esperar o resto
+    (um bloco inválido no fim não desfaz o prefixo válido já aplicado).
     Retorna True se a cadeia local foi substituída.
     """
 
     blockchain_local = no_estado["blockchain"]
-    
-    # 1. Verifica se a nova cadeia é realmente maior
-    if len(chain_recebida) <= len(blockchain_local["chain"]):
+    if not chain_recebida:
         return False
+    base = chain_recebida[0]["index"]
 
-    # 2. Valida a integridade da cadeia recebida (hashes e Proof of Work)
-    if not validar_cadeia_completa(chain_recebida):
-        no_estado["logger"].warning("Recebida uma blockchain maior, porém inválida.")
+    # 1. Localiza o ancestral comum com a cadeia local (no instantâneo, sem lock)
+    instantaneo = blockchain_local["instantaneo"]
+    chain_local = instantaneo["chain"]
+    divergencia = _ponto_de_divergencia(chain_local, chain_recebida, base)
+    if divergencia == 0 or divergencia > len(chain_local):
+        no_estado["logger"].warning("Recebida uma blockchain sem ancestral comum com a local.")
+        return False
+    ancora = chain_local[divergencia - 1]
+    novos = list(chain_recebida[divergencia - base:])
+
+    # 2. Verifica se a nova cadeia tem mais trabalho desde o ancestral comum
+    # (pelos alvos declarados; o pipeline confere se são os exigidos)
+    trabalho_ancora = instantaneo["trabalho"] - sum(map(trabalho_do_bloco, chain_local[divergencia:]))
+    acumulado = [0]
+    for bloco in novos:
+        acumulado.append(acumulado[-1] + trabalho_do_bloco(bloco))
+    if trabalho_ancora + acumulado[-1] <= instantaneo["trabalho"]:
         return False
 
-    # 3. Substituição atômica
-    with no_estado["lock"]:
-        blockchain_local["chain"] = chain_recebida
-        # Limpa da mempool local transações que já estão na nova cadeia
-        txs_na_nova_chain = set()
-        for bloco in chain_recebida:
+    # 3. Valida apenas o sufixo divergente. Blocos já verificados são trocados
+    # pela cópia local e pulam o estágio paralelo
+    conhecidos = set()
+    for i, bloco in enumerate(novos):
+        local = obter_bloco_verificado(blockchain_local, bloco["hash"])
+        if local is not None:
+            novos[i] = local
+            conhecidos.add(local["hash"])
+    saldos = saldos_na_altura(instantaneo, divergencia)
+    aplicados = 0
+
+    def ao_progredir(verificados: int):
+        # 4. Substituição atômica de cada prefixo verificado que torna a cadeia recebida a mais pesada
+        nonlocal aplicados
+        if len(novos) >= MIN_BLOCOS_PARALELO:
+            no_estado["logger"].info(f"Validação: {verificados}/{len(novos)} blocos verificados.")
+        if _aplicar_verificados(blockchain_local, ancora, divergencia, novos[:verificados],
+                                trabalho_ancora + acumulado[verificados]):
+            aplicados = verificados
+
+    validos = validar_blocos(ancora, novos, chain_local, saldos, ao_progredir, conhecidos)
+    if validos < len(novos):
+        no_estado["logger"].warning("Recebida uma blockchain maior, porém inválida.")
+    return aplicados > 0
+
+def _aplicar_verificados(blockchain: Dict[str, Any], ancora: Dict[str, Any], divergencia: int,
+                         verificados: List[Dict], trabalho: int) -> bool:
+    """
+    Troca a cadeia local a partir de 'divergencia' pelos blocos verificados,
+    se a cadeia resultante ('trabalho' acumulado) for mais pesada. Numa troca
+    em partes o começo já está na cadeia, e só o que falta é aplicado.
+    """
+    with blockchain["lock"]:
+        chain_local = blockchain["chain"]
+        # A cadeia local pode ter mudado durante a validação
+        if trabalho <= blockchain["trabalho"]:
+            return False
+        if chain_local[divergencia - 1]["hash"] != ancora["hash"]:
+            return False
+        ponto = _ponto_de_divergencia(chain_local, verificados, divergencia)
+        _reorganizar(blockchain, ponto, verificados[ponto - divergencia:])
+    return True
+
+def obter_bloco_verificado(blockchain: Dict[str, Any], hash_bloco: str) -> Optional[Dict]:
+    """Retorna a cópia local de um bloco já verificado (cadeia principal ou ramo)."""
+    altura = blockchain["altura_por_hash"].get(hash_bloco)
+    if altura is not None:
+        chain = blockchain["instantaneo"]["chain"]
+        if altura < len(chain) and chain[altura]["hash"] == hash_bloco:
+            return chain[altura]
+    return blockchain["ramos"].get(hash_bloco)
+
+def _reorganizar(blockchain: Dict[str, Any], divergencia: int, novos: List[Dict]):
+    """
+    Troca os blocos da cadeia a partir de 'divergencia' pelos 'novos'
+    (já validados). Os blocos abandonados vão para a árvore de forks.
+    Deve ser chamada com blockchain["lock"] adquirido.
+    """
+    chain_local = blockchain["chain"]
+    ramos = blockchain["ramos"]
+    abandonados = chain_local[divergencia:]
+
+    with blockchain["mempool"]["lock"]:
+        # Instantâneos ainda em uso guardam os blocos que vão sair da cadeia viva
+        preservar_visoes(blockchain, divergencia, abandonados)
+
+        # Desfaz os blocos locais abandonados e aplica os novos no índice
+        for bloco in reversed(abandonados):
+            indexar_bloco(blockchain, bloco, sinal=-1)
+            ramos[bloco["hash"]] = bloco
+        del chain_local[divergencia:]
+        for bloco in novos:
+            ramos.pop(bloco["hash"], None)
+            chain_local.append(bloco)
+            indexar_bloco(blockchain, bloco)
+            # Limpa da mempool local transações que já estão na nova cadeia
+            remover_confirmadas(blockchain["mempool"], bloco["transactions"])
+        # Créditos desfeitos e gastos novos mudam saldos de qualquer origem pendente
+        _remover_sem_saldo(blockchain, list(blockchain["mempool"]["saidas"]))
+        publicar_instantaneo(blockchain)
+
+        # Transações dos blocos abandonados que ficaram fora da nova cadeia voltam
+        # para a mempool (se ainda houver saldo para elas)
+        for bloco in abandonados:
             for tx in bloco["transactions"]:
-                txs_na_nova_chain.add(tx["id"])
-        print(4)
-        blockchain_local["pending_transactions"] = [
-            tx for tx in blockchain_local["pending_transactions"] 
-            if tx["id"] not in txs_na_nova_chain
-        ]
-    
-    return True
\ No newline at end of file
+                if tx["origem"] not in ORIGENS_RESERVADAS:
+                    adicionar_transacao(blockchain, tx)
+    _podar_ramos(blockchain)
+
+def _podar_ramos(blockchain: Dict[str, Any]):
+    """Descarta ramos muito antigos e mantém a árvore de forks limitada."""
+    ramos = blockchain["ramos"]
+    limite = len(blockchain["chain"]) - PROFUNDIDADE_MAX_RAMOS
+    for hash_bloco in [h for h, b in ramos.items() if b["index"] < limite]:
+        del ramos[hash_bloco]
+    if len(ramos) > MAX_BLOCOS_RAMOS:
+        excedentes = sorted(ramos.values(), key=lambda b: b["index"])[:len(ramos) - MAX_BLOCOS_RAMOS]
+        for bloco in excedentes:
+            del ramos[bloco["hash"]]
+
+def adicionar_bloco_lateral(blockchain: Dict[str, Any], bloco: Dict[str, Any]) -> bool:
+    """
+    Guarda um bloco válido que não estende o topo (ramo concorrente).
+    Se o ramo ficar com mais trabalho acumulado que a cadeia principal,
+    troca para ele usando apenas os blocos já guardados na árvore de forks.
+    Retorna True se a cadeia principal foi reorganizada.
+    """
+    with blockchain["lock"]:
+        if obter_bloco_verificado(blockchain, bloco["hash"]) is not None:
+            return False
+        pai = obter_bloco_verificado(blockchain, bloco["previous_hash"])
+        if pai is None or not encadeado(pai, bloco) or not validar_bloco_isolado(bloco):
+            return False
+
+        # Sobe pelo ramo até encontrar o ancestral na cadeia principal
+        ramo = [bloco]
+        while ramo[-1]["previous_hash"] not in blockchain["altura_por_hash"]:
+            anterior = blockchain["ramos"].get(ramo[-1]["previous_hash"])
+            if anterior is None:
+                return False
+            ramo.append(anterior)
+        ramo.reverse()
+        divergencia = ramo[0]["index"]
+        chain = blockchain["chain"]
+
+        # O alvo exigido depende dos blocos anteriores do próprio ramo
+        def obter_bloco(altura: int) -> Dict[str, Any]:
+            return ramo[altura - divergencia] if altura >= divergencia else chain[altura]
+        if not alvo_e_tempo_validos(obter_bloco, bloco):
+            return False
+        blockchain["ramos"][bloco["hash"]] = bloco
+
+        if sum(map(trabalho_do_bloco, ramo)) <= sum(map(trabalho_do_bloco, chain[divergencia:])):
+            _podar_ramos(blockchain)
+            return False
+
+        # Os saldos só podem ser conferidos agora, sobre o ancestral comum
+        saldos = saldos_na_altura(blockchain["instantaneo"], divergencia)
+        if not all(aplicar_saldos(saldos, b) for b in ramo):
+            blockchain["ramos"].pop(bloco["hash"], None)
+            return False
+        _reorganizar(blockchain, divergencia, ramo)
+        return True
+
+def _ponto_de_divergencia(chain_local: List[Dict], chain_nova: List[Dict], base: int = 0) -> int:
+    """
+    Retorna o índice do primeiro bloco em que as cadeias diferem
+    (chain_nova começa no índice 'base').
+    Como os blocos são encadeados por hash, basta procurar a partir do topo
+    o último bloco em comum: o custo é proporcional à profundidade do fork.
+    """
+    i = min(len(chain_local), base + len(chain_nova)) - 1
+    while i >= base and chain_local[i]["hash"] != chain_nova[i - base]["hash"]:
+        i -= 1
+    return i + 1
+
+# --- Sincronização por cabeçalhos ---
+
+def construir_locator(chain: List[Dict]) -> List[List]:
+    """
+    Monta o 'block locator': pares [index, hash] do topo para trás, primeiro
+    um a um e depois em passos que dobram, terminando sempre no gênesis.
+    Com poucos itens o peer encontra o último bloco em comum mesmo após um fork.
+    """
+    locator = []
+    passo = 1
+    i = len(chain) - 1
+    while i > 0:
+        locator.append([i, chain[i]["hash"]])
+        if len(locator) >= 10:
+            passo *= 2
+        i -= passo
+    locator.append([0, chain[0]["hash"]])
+    return locator
+
+def cabecalhos_apos_locator(blockchain: Dict[str, Any], locator: List[List], limite: int) -> List[Dict]:
+    """
+    Responde a um locator: encontra o primeiro bloco em comum e devolve
+    os cabeçalhos seguintes (no máximo 'limite').
+    """
+    chain = blockchain["instantaneo"]["chain"]
+    inicio = 0
+    for index, hash_bloco in locator:
+        if index < len(chain) and chain[index]["hash"] == hash_bloco:
+            inicio = index + 1
+            break
+    return [extrair_cabecalho(b) for b in chain[inicio:inicio + limite]]
@@ -0,0 +1,338 @@
+# Codec binário compacto para as mensagens do protocolo
+#
+# Alternativa ao JSON negociada entre os peers (ver MessageType.VERSION).
+# Hashes hex de 64 caracteres viram 32 bytes, UUIDs viram 16 bytes, floats
+# são empacotados com struct e tamanhos/inteiros usam varint. Transações e
+# blocos no formato padrão têm um layout fixo; o resto usa valores com tag.
+#
+# Listas de transações padrão (o grosso de blocos, mempool e lotes) vão em
+# colunas: todos os ids num bloco de bytes, origens e destinos numa string
+# só e os números num único struct. Assim a decodificação faz poucas
+# chamadas em C por lista em vez de várias por transação, e fica mais
+# barata que o json (ver "benchmarks.py codec").
+
+import re
+import struct
+from typing import Any, Dict, Optional, Tuple
+
+CODEC_JSON = "json"
+CODEC_BINARIO = "bin1"
+
+# Primeiro byte de um corpo binário (um corpo JSON sempre começa com '{')
+MAGICO = 0xB1
+VERSAO = 1
+
+# Tags de valor
+T_NONE, T_FALSE, T_TRUE, T_INT, T_FLOAT, T_STR, T_HASH, T_UUID, T_LISTA, T_DICT, \
+    T_INTERNADA, T_TRANSACAO, T_BLOCO, T_BLOCO_ALVO, T_TRANSACOES = range(15)
+
+# Tabelas de internação: SÓ acrescentar no final (o índice faz parte do formato)
+CHAVES = [
+    "type", "payload", "sender", "transaction", "block", "blocks", "headers",
+    "index", "previous_hash", "transactions", "merkle_root", "nonce", "timestamp",
+    "hash", "id", "origem", "destino", "valor", "chain", "pending_transactions",
+    "blockchain", "locator", "inicio", "quantidade", "tx_id", "proof", "lado",
+    "header", "peers", "versao", "codecs", "codec", "taxa", "limite", "itens",
+    "alvo", "trabalho", "aceitas", "recusadas",
+]
+STRINGS = [
+    "NEW_TRANSACTION", "NEW_BLOCK", "REQUEST_CHAIN", "RESPONSE_CHAIN", "REQUEST_MEMPOOL",
+    "RESPONSE_MEMPOOL", "PING", "PONG", "DISCOVER_PEERS", "PEERS_LIST", "REQUEST_HEADERS",
+    "RESPONSE_HEADERS", "REQUEST_BLOCKS", "RESPONSE_BLOCKS", "REQUEST_TX_PROOF",
+    "RESPONSE_TX_PROOF", "VERSION", "coinbase", "genesis", "esquerda", "direita",
+    CODEC_JSON, CODEC_BINARIO, "INV", "GETDATA", "tx", "bloco",
+    "SUBMIT_TRANSACTIONS", "RESPONSE_SUBMIT",
+]
+_INDICE_CHAVES = {c: i for i, c in enumerate(CHAVES)}
+_INDICE_STRINGS = {s: i for i, s in enumerate(STRINGS)}
+
+# Layouts fixos: só são usados quando o dicionário tem exatamente estas chaves
+# e os tipos esperados, para que a decodificação devolva o mesmo valor
+# (um int virando float mudaria o JSON e, portanto, o hash).
+CHAVES_TRANSACAO = frozenset(("id", "origem", "destino", "valor", "timestamp"))
+CHAVES_TRANSACAO_TAXA = CHAVES_TRANSACAO | {"taxa"}  # "taxa" só existe quando não é zero
+CHAVES_BLOCO = frozenset(("index", "previous_hash", "transactions", "merkle_root", "nonce", "timestamp", "hash"))
+CHAVES_BLOCO_ALVO = CHAVES_BLOCO | {"alvo"}  # Todos os blocos após o gênesis
+
+_HEX64 = re.compile(r"[0-9a-f]{64}")
+_UUID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+_UUIDS = re.compile(r"(?:[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})*")
+_SEPARADOR = "\0"  # Entre as origens e destinos de uma lista de transações
+_SEM_TAXA = float("nan")
+_FLOAT = struct.Struct(">d")
+_DOIS_FLOATS = struct.Struct(">dd")
+
+# --- Primitivas ---
+
+def _varint(n: int, saida: bytearray):
+    """Inteiro não negativo em base 128 (LEB128)."""
+    while n > 0x7F:
+        saida.append((n & 0x7F) | 0x80)
+        n >>= 7
+    saida.append(n)
+
+def _ler_varint(dados: memoryview, pos: int) -> Tuple[int, int]:
+    n = deslocamento = 0
+    while True:
+        byte = dados[pos]
+        pos += 1
+        n |= (byte & 0x7F) << deslocamento
+        if byte < 0x80:
+            return n, pos
+        deslocamento += 7
+
+def _eh_hash(texto: str) -> bool:
+    return len(texto) == 64 and _HEX64.fullmatch(texto) is not None
+
+def _eh_uuid(texto: str) -> bool:
+    """Só a forma canônica (minúscula, com hífens) volta idêntica do decodificador."""
+    return len(texto) == 36 and _UUID.fullmatch(texto) is not None
+
+def _uuid_para_bytes(texto: str) -> bytes:
+    return bytes.fromhex(texto.replace("-", ""))
+
+def _ler_uuid(dados: memoryview, pos: int) -> Tuple[str, int]:
+    h = dados[pos:pos + 16].hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}", pos + 16
+
+def _str_bruta(texto: str, saida: bytearray):
+    dados = texto.encode("utf-8")
+    _varint(len(dados), saida)
+    saida += dados
+
+def _ler_str_bruta(dados: memoryview, pos: int) -> Tuple[str, int]:
+    tamanho, pos = _ler_varint(dados, pos)
+    return str(dados[pos:pos + tamanho], "utf-8"), pos + tamanho
+
+# --- Codificação ---
+
+def _codificar_str(texto: str, saida: bytearray):
+    indice = _INDICE_STRINGS.get(texto)
+    if indice is not None:
+        saida.append(T_INTERNADA)
+        _varint(indice, saida)
+    elif _eh_hash(texto):
+        saida.append(T_HASH)
+        saida += bytes.fromhex(texto)
+    elif _eh_uuid(texto):
+        saida.append(T_UUID)
+        saida += _uuid_para_bytes(texto)
+    else:
+        saida.append(T_STR)
+        _str_bruta(texto, saida)
+
+def _eh_transacao_padrao(valor: Dict) -> bool:
+    return (valor.keys() == CHAVES_TRANSACAO
+            and type(valor["valor"]) is float and type(valor["timestamp"]) is float
+            and isinstance(valor["origem"], str) and isinstance(valor["destino"], str)
+            and isinstance(valor["id"], str) and _eh_uuid(valor["id"]))
+
+def _eh_bloco_padrao(valor: Dict) -> bool:
+    chaves = valor.keys()
+    return ((chaves == CHAVES_BLOCO or chaves == CHAVES_BLOCO_ALVO)
+            and type(valor["index"]) is int and type(valor["nonce"]) is int
+            and type(valor["timestamp"]) is float and isinstance(valor["transactions"], list)
+            and all(isinstance(valor[c], str) and _eh_hash(valor[c])
+                    for c in ("previous_hash", "merkle_root", "hash", "alvo") if c in valor))
+
+def _codificar_transacao(tx: Dict, saida: bytearray):
+    saida.append(T_TRANSACAO)
+    saida += _uuid_para_bytes(tx["id"])
+    _codificar_str(tx["origem"], saida)
+    _codificar_str(tx["destino"], saida)
+    saida += _DOIS_FLOATS.pack(tx["valor"], tx["timestamp"])
+
+def _colunas_transacoes(lista: list) -> Optional[Tuple]:
+    """Colunas de uma lista só de transações padrão, ou None se alguma não for."""
+    if not all(type(tx) is dict and (tx.keys() == CHAVES_TRANSACAO or tx.keys() == CHAVES_TRANSACAO_TAXA)
+               for tx in lista):
+        return None
+    ids = [tx["id"] for tx in lista]
+    textos = [tx["origem"] for tx in lista] + [tx["destino"] for tx in lista]
+    numeros = ([tx["valor"] for tx in lista] + [tx["timestamp"] for tx in lista]
+               + [tx.get("taxa", _SEM_TAXA) for tx in lista])
+    if (not all(type(i) is str for i in ids) or not _UUIDS.fullmatch("".join(ids))
+            or not all(type(t) is str for t in textos) or not all(type(n) is float for n in numeros)):
+        return None
+    taxas = numeros[2 * len(lista):]
+    if any(t != t for t in taxas if t is not _SEM_TAXA):
+        return None  # Uma taxa NaN de verdade não se distinguiria da ausência
+    if all(t is _SEM_TAXA for t in taxas):
+        del numeros[2 * len(lista):]  # Nenhuma taxa: a coluna não vai
+    juntos = _SEPARADOR.join(ids + textos)  # Os ids já foram validados como uuid
+    if juntos.count(_SEPARADOR) != 3 * len(lista) - 1:
+        return None  # Algum endereço contém o separador
+    return juntos, numeros
+
+def _codificar_transacoes(quantidade: int, colunas: Tuple, saida: bytearray):
+    textos, numeros = colunas
+    saida.append(T_TRANSACOES)
+    _varint(quantidade, saida)
+    saida.append(len(numeros) > 2 * quantidade)  # Com coluna de taxas
+    _str_bruta(textos, saida)
+    saida += struct.pack(f">{len(numeros)}d", *numeros)
+
+def _codificar_bloco(bloco: Dict, saida: bytearray):
+    if "alvo" in bloco:
+        saida.append(T_BLOCO_ALVO)
+        saida += bytes.fromhex(bloco["alvo"])
+    else:
+        saida.append(T_BLOCO)
+    _varint(bloco["index"], saida)
+    saida += bytes.fromhex(bloco["previous_hash"])
+    saida += bytes.fromhex(bloco["merkle_root"])
+    saida += bytes.fromhex(bloco["hash"])
+    _varint(bloco["nonce"], saida)
+    saida += _FLOAT.pack(bloco["timestamp"])
+    _codificar_valor(bloco["transactions"], saida)
+
+def _codificar_valor(valor: Any, saida: bytearray):
+    tipo = type(valor)
+    if tipo is str:
+        _codificar_str(valor, saida)
+    elif tipo is dict:
+        if _eh_transacao_padrao(valor):
+            _codificar_transacao(valor, saida)
+        elif _eh_bloco_padrao(valor):
+            _codificar_bloco(valor, saida)
+        else:
+            saida.append(T_DICT)
+            _varint(len(valor), saida)
+            for chave, item in valor.items():
+                indice = _INDICE_CHAVES.get(chave)
+                if indice is not None:
+                    _varint(indice + 1, saida)
+                else:
+                    _varint(0, saida)
+                    _str_bruta(chave, saida)
+                _codificar_valor(item, saida)
+    elif tipo is list or tipo is tuple:
+        colunas = _colunas_transacoes(valor) if valor and type(valor[0]) is dict else None
+        if colunas is not None:
+            _codificar_transacoes(len(valor), colunas, saida)
+            return
+        saida.append(T_LISTA)
+        _varint(len(valor), saida)
+        for item in valor:
+            _codificar_valor(item, saida)
+    elif tipo is float:
+        saida.append(T_FLOAT)
+        saida += _FLOAT.pack(valor)
+    elif tipo is bool:
+        saida.append(T_TRUE if valor else T_FALSE)
+    elif tipo is int:
+        saida.append(T_INT)
+        _varint(valor * 2 if valor >= 0 else -valor * 2 - 1, saida)  # zigzag
+    elif valor is None:
+        saida.append(T_NONE)
+    else:
+        raise TypeError(f"Tipo não suportado pelo codec binário: {tipo.__name__}")
+
+def codificar(mensagem: Dict[str, Any]) -> bytes:
+    """Serializa uma mensagem (ou qualquer valor compatível com JSON) em binário."""
+    saida = bytearray((MAGICO, VERSAO))
+    _codificar_valor(mensagem, saida)
+    return bytes(saida)
+
+# --- Decodificação ---
+
+def _ler_hash(dados: memoryview, pos: int) -> Tuple[str, int]:
+    return dados[pos:pos + 32].hex(), pos + 32
+
+def _ler_transacoes(dados: memoryview, pos: int) -> Tuple[list, int]:
+    n, pos = _ler_varint(dados, pos)
+    com_taxa = dados[pos]
+    textos, pos = _ler_str_bruta(dados, pos + 1)
+    textos = textos.split(_SEPARADOR)
+    if len(textos) != 3 * n:
+        raise ValueError("Lista de transações truncada no codec binário")
+    colunas = 3 if com_taxa else 2
+    numeros = struct.unpack_from(f">{colunas * n}d", dados, pos)
+    pos += 8 * colunas * n
+    transacoes = [{"id": i, "origem": o, "destino": d, "valor": v, "timestamp": t}
+                  for i, o, d, v, t in zip(textos[:n], textos[n:2 * n], textos[2 * n:], numeros[:n], numeros[n:])]
+    if com_taxa:
+        for tx, taxa in zip(transacoes, numeros[2 * n:]):
+            if taxa == taxa:
+                tx["taxa"] = taxa
+    return transacoes, pos
+
+def _decodificar_valor(dados: memoryview, pos: int) -> Tuple[Any, int]:
+    tag = dados[pos]
+    pos += 1
+    if tag == T_INTERNADA:
+        indice, pos = _ler_varint(dados, pos)
+        return STRINGS[indice], pos
+    if tag == T_STR:
+        return _ler_str_bruta(dados, pos)
+    if tag == T_HASH:
+        return _ler_hash(dados, pos)
+    if tag == T_UUID:
+        return _ler_uuid(dados, pos)
+    if tag == T_TRANSACAO:
+        tx_id, pos = _ler_uuid(dados, pos)
+        origem, pos = _decodificar_valor(dados, pos)
+        destino, pos = _decodificar_valor(dados, pos)
+        valor, timestamp = _DOIS_FLOATS.unpack_from(dados, pos)
+        return {"id": tx_id, "origem": origem, "destino": destino,
+                "valor": valor, "timestamp": timestamp}, pos + 16
+    if tag == T_TRANSACOES:
+        return _ler_transacoes(dados, pos)
+    if tag == T_BLOCO or tag == T_BLOCO_ALVO:
+        if tag == T_BLOCO_ALVO:
+            alvo, pos = _ler_hash(dados, pos)
+        index, pos = _ler_varint(dados, pos)
+        previous_hash, pos = _ler_hash(dados, pos)
+        merkle_root, pos = _ler_hash(dados, pos)
+        hash_bloco, pos = _ler_hash(dados, pos)
+        nonce, pos = _ler_varint(dados, pos)
+        (timestamp,) = _FLOAT.unpack_from(dados, pos)
+        transacoes, pos = _decodificar_valor(dados, pos + 8)
+        bloco = {"index": index, "previous_hash": previous_hash, "transactions": transacoes,
+                 "merkle_root": merkle_root, "nonce": nonce, "timestamp": timestamp,
+                 "hash": hash_bloco}
+        if tag == T_BLOCO_ALVO:
+            bloco["alvo"] = alvo
+        return bloco, pos
+    if tag == T_DICT:
+        quantidade, pos = _ler_varint(dados, pos)
+        resultado = {}
+        for _ in range(quantidade):
+            codigo, pos = _ler_varint(dados, pos)
+            if codigo:
+                chave = CHAVES[codigo - 1]
+            else:
+                chave, pos = _ler_str_bruta(dados, pos)
+            resultado[chave], pos = _decodificar_valor(dados, pos)
+        return resultado, pos
+    if tag == T_LISTA:
+        quantidade, pos = _ler_varint(dados, pos)
+        lista = []
+        for _ in range(quantidade):
+            item, pos = _decodificar_valor(dados, pos)
+            lista.append(item)
+        return lista, pos
+    if tag == T_FLOAT:
+        return _FLOAT.unpack_from(dados, pos)[0], pos + 8
+    if tag == T_INT:
+        n, pos = _ler_varint(dados, pos)
+        return (n >> 1) if not n & 1 else -((n + 1) >> 1), pos
+    if tag == T_TRUE:
+        return True, pos
+    if tag == T_FALSE:
+        return False, pos
+    if tag == T_NONE:
+        return None, pos
+    raise ValueError(f"Tag desconhecida no codec binário: {tag}")
+
+def eh_binario(dados: bytes) -> bool:
+    """Indica se o corpo recebido está no formato binário."""
+    return len(dados) > 0 and dados[0] == MAGICO
+
+def decodificar(dados: bytes) -> Dict[str, Any]:
+    """Decodifica um corpo binário produzido por codificar()."""
+    visao = memoryview(dados)
+    if visao[0] != MAGICO or visao[1] != VERSAO:
+        raise ValueError("Corpo binário com cabeçalho ou versão inválidos")
+    valor, _ = _decodificar_valor(visao, 2)
+    return valor
@@ -0,0 +1,67 @@
+# Dificuldade do Proof of Work: alvo numérico e reajuste
+#
+# Um bloco é válido quando o hash, lido como inteiro de 256 bits, é menor
+# que o alvo gravado no próprio bloco (campo "alvo", 64 caracteres hex, que
+# entra no cabeçalho). O alvo exigido é recalculado a cada INTERVALO_AJUSTE
+# blocos comparando o tempo que eles levaram com o esperado; entre os
+# reajustes vale o alvo do bloco anterior.
+# A cadeia escolhida é a de maior trabalho acumulado, não a mais longa.
+
+import time
+from statistics import median
+from typing import Any, Callable, Dict
+
+ALVO_MAXIMO = 1 << 244          # Alvo mais fácil aceito (equivale ao antigo prefixo "000")
+ALVO_INICIAL = ALVO_MAXIMO      # Alvo dos primeiros blocos após o gênesis
+TEMPO_ALVO_BLOCO = 10.0         # Segundos desejados entre blocos
+INTERVALO_AJUSTE = 20           # Blocos por período de reajuste
+AJUSTE_MAXIMO = 4               # O alvo muda no máximo 4x (para cima ou para baixo) por reajuste
+BLOCOS_MEDIANA = 11             # O timestamp precisa superar a mediana destes últimos blocos
+TOLERANCIA_FUTURO = 2 * 60 * 60 # Segundos que um timestamp pode estar adiantado em relação ao relógio local
+
+def alvo_para_hex(alvo: int) -> str:
+    return f"{alvo:064x}"
+
+def alvo_do_bloco(bloco: Dict[str, Any]) -> int:
+    """Alvo gravado no bloco (o gênesis não tem: vale o inicial)."""
+    alvo = bloco.get("alvo")
+    return int(alvo, 16) if alvo else ALVO_INICIAL
+
+def trabalho_do_bloco(bloco: Dict[str, Any]) -> int:
+    """Número esperado de hashes para achar o bloco (o gênesis não conta)."""
+    if not bloco.get("alvo"):
+        return 0
+    return (1 << 256) // (int(bloco["alvo"], 16) + 1)
+
+def hash_atende_alvo(hash_bloco: str, alvo: int) -> bool:
+    return int(hash_bloco, 16) < alvo
+
+def calcular_alvo(obter_bloco: Callable[[int], Dict[str, Any]], altura: int) -> int:
+    """
+    Alvo exigido do bloco na 'altura'. 'obter_bloco(h)' devolve o bloco de
+    altura h da cadeia em questão (só blocos abaixo de 'altura' são lidos).
+    """
+    anterior = obter_bloco(altura - 1)
+    alvo = alvo_do_bloco(anterior)
+    if altura % INTERVALO_AJUSTE != 0:
+        return alvo
+    inicio = obter_bloco(altura - INTERVALO_AJUSTE)
+    esperado = int(TEMPO_ALVO_BLOCO * 1000) * (INTERVALO_AJUSTE - 1)
+    decorrido = int((anterior["timestamp"] - inicio["timestamp"]) * 1000)
+    decorrido = min(max(decorrido, esperado // AJUSTE_MAXIMO), esperado * AJUSTE_MAXIMO)
+    # Aritmética inteira (em ms) para que todos os nós cheguem ao mesmo alvo
+    return min(alvo * decorrido // esperado, ALVO_MAXIMO)
+
+def alvo_e_tempo_validos(obter_bloco: Callable[[int], Dict[str, Any]], bloco: Dict[str, Any]) -> bool:
+    """
+    Regras que dependem dos blocos anteriores: o alvo declarado é o exigido
+    e o timestamp não volta atrás (mediana dos últimos blocos) nem está
+    adiantado demais. Impede que um minerador manipule o reajuste.
+    """
+    altura = bloco["index"]
+    if bloco.get("alvo") != alvo_para_hex(calcular_alvo(obter_bloco, altura)):
+        return False
+    recentes = [obter_bloco(h)["timestamp"] for h in range(max(0, altura - BLOCOS_MEDIANA), altura)]
+    if bloco["timestamp"] <= median(recentes):
+        return False
+    return bloco["timestamp"] <= time.time() + TOLERANCIA_FUTURO
@@ -0,0 +1,124 @@
+# Instantâneos (snapshots) imutáveis da blockchain para leitura sem lock
+#
+# Depois de cada alteração da cadeia o escritor publica um novo instantâneo
+# em blockchain["instantaneo"]: a altura, o bloco do topo, o trabalho
+# acumulado, os saldos e uma visão da cadeia congelada naquela altura. Leitores (saldo,
+# REQUEST_CHAIN/HEADERS/BLOCKS, interface) só pegam a referência atual e
+# nunca bloqueiam quem escreve.
+#
+# Os saldos também não são copiados inteiros a cada bloco: sobre uma cópia
+# base ficam camadas imutáveis só com os endereços alterados (ChainMap).
+#
+# A visão não copia a lista de blocos: ela lê da cadeia viva até a sua
+# altura. Apêndices não a afetam; numa reorganização, os blocos que seriam
+# sobrescritos são guardados nas visões ainda em uso antes do corte.
+
+import weakref
+from collections import ChainMap
+from collections.abc import Sequence
+from types import MappingProxyType
+from typing import Any, Dict, List
+
+MAX_CAMADAS_SALDOS = 8  # Camadas de alterações sobre a base antes de serem juntadas numa só
+FRACAO_COMPACTAR = 4    # Alterações acumuladas acima de 1/4 da base: a base é refeita
+
+class VisaoCadeia(Sequence):
+    """
+    Cadeia congelada numa altura. É uma classe pelo mesmo motivo que a
+    CadeiaPersistente: substitui uma lista de blocos para quem a lê.
+    """
+
+    def __init__(self, base, altura: int):
+        self._base = base
+        self._altura = altura
+        self._preservados: Dict[int, Dict] = {}  # altura -> bloco que saiu da cadeia viva
+
+    def __len__(self) -> int:
+        return self._altura
+
+    def _bloco(self, i: int) -> Dict[str, Any]:
+        # Lê a cadeia viva primeiro e confere os preservados depois: o escritor
+        # preserva antes de cortar, então uma leitura no meio do corte ainda
+        # devolve o bloco certo
+        try:
+            bloco = self._base[i]
+        except IndexError:
+            bloco = None
+        return self._preservados.get(i, bloco)
+
+    def __getitem__(self, chave):
+        if isinstance(chave, slice):
+            inicio, fim, passo = chave.indices(self._altura)
+            if passo == 1 and inicio < fim:
+                # Caminho comum: fatia direto da cadeia viva (a CadeiaPersistente lê tudo de uma vez)
+                blocos = self._base[inicio:fim]
+                if not self._preservados and len(blocos) == fim - inicio:
+                    return blocos
+            return [self._bloco(i) for i in range(inicio, fim, passo)]
+        if chave < 0:
+            chave += self._altura
+        if not 0 <= chave < self._altura:
+            raise IndexError("índice fora do instantâneo")
+        return self._bloco(chave)
+
+    def __iter__(self):
+        passo = 512
+        for inicio in range(0, self._altura, passo):
+            yield from self[inicio:inicio + passo]
+
+def _camadas_saldos(blockchain: Dict[str, Any]) -> List[Dict[str, float]]:
+    """
+    Camadas de saldos do novo instantâneo (a mais nova primeiro, a base por
+    último). Só os endereços alterados desde a publicação anterior são
+    copiados; juntar as camadas e refazer a base custam, em média, o
+    proporcional ao que mudou. Nenhuma camada publicada é alterada depois.
+    """
+    saldos = blockchain["saldos"]
+    alterados = blockchain["saldos_alterados"]
+    indice, camadas = blockchain.get("camadas_saldos", (None, None))
+    if indice is not saldos:
+        # Primeira publicação ou índice substituído (reconstrução, snapshot)
+        camadas = [dict(saldos)]
+    elif alterados:
+        # Endereço zerado sai do índice: na camada ele fica com 0.0, escondendo a base
+        camadas = [{e: saldos.get(e, 0.0) for e in alterados}] + camadas
+        base = camadas[-1]
+        if sum(len(c) for c in camadas[:-1]) > len(base) // FRACAO_COMPACTAR:
+            camadas = [dict(saldos)]
+        elif len(camadas) > MAX_CAMADAS_SALDOS + 1:
+            juntas = {}
+            for camada in reversed(camadas[:-1]):
+                juntas.update(camada)
+            camadas = [juntas, base]
+    alterados.clear()
+    blockchain["camadas_saldos"] = (saldos, camadas)
+    return camadas
+
+def publicar_instantaneo(blockchain: Dict[str, Any]):
+    """
+    Publica o estado atual como novo instantâneo. Deve ser chamada pelo
+    escritor, com o lock da cadeia, ao fim de cada alteração.
+    """
+    chain = blockchain["chain"]
+    visao = VisaoCadeia(chain, len(chain))
+    if "visoes" not in blockchain:
+        blockchain["visoes"] = weakref.WeakSet()
+    blockchain["visoes"].add(visao)
+    # A troca da referência é atômica: o leitor vê o instantâneo antigo ou o novo inteiro
+    blockchain["instantaneo"] = {
+        "altura": len(chain),
+        "topo": chain[-1],
+        "trabalho": blockchain["trabalho"],
+        "chain": visao,
+        "saldos": MappingProxyType(ChainMap(*_camadas_saldos(blockchain))),
+    }
+
+def preservar_visoes(blockchain: Dict[str, Any], divergencia: int, abandonados: List[Dict]):
+    """
+    Antes de cortar a cadeia viva em 'divergencia', copia para as visões
+    ainda referenciadas os blocos abandonados que elas enxergam.
+    """
+    for visao in list(blockchain.get("visoes", ())):
+        # Alturas além dos abandonados já foram preservadas numa reorganização anterior
+        for i in range(divergencia, min(visao._altura, divergencia + len(abandonados))):
+            visao._preservados.setdefault(i, abandonados[i - divergencia])
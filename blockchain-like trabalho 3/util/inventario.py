@@ -0,0 +1,79 @@
+# Funções utilitárias para o gossip por inventário (INV/GETDATA)
+#
+# Os nós anunciam só os identificadores (id da transação, hash do bloco) e
+# cada peer pede o corpo apenas do que ainda não conhece. O estado aqui
+# lembra o que já foi visto (LRU com validade) e o que já foi pedido a
+# algum peer, para não baixar o mesmo item de vários vizinhos.
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+ITEM_TX = "tx"
+ITEM_BLOCO = "bloco"
+
+MAX_VISTOS = 100_000     # Itens lembrados no cache de vistos
+VALIDADE_VISTOS = 600    # Segundos até um item visto ser esquecido
+TIMEOUT_PEDIDO = 10      # Segundos até um GETDATA sem resposta poder ser refeito a outro peer
+
+def criar_inventario(capacidade: int = MAX_VISTOS, validade: float = VALIDADE_VISTOS) -> Dict[str, Any]:
+    """Inicializa o cache de itens vistos e de pedidos em andamento."""
+    return {
+        "vistos": OrderedDict(),  # (tipo, id) -> instante em que foi visto
+        "pedidos": {},            # (tipo, id) -> instante do GETDATA
+        "capacidade": capacidade,
+        "validade": validade,
+        "lock": threading.Lock(),  # Usado pelas threads do executor ao mesmo tempo
+    }
+
+def foi_visto(inventario: Dict[str, Any], item: Tuple[str, str]) -> bool:
+    with inventario["lock"]:
+        return _foi_visto(inventario, item)
+
+def _foi_visto(inventario: Dict[str, Any], item: Tuple[str, str]) -> bool:
+    visto_em = inventario["vistos"].get(item)
+    if visto_em is None:
+        return False
+    if time.monotonic() - visto_em > inventario["validade"]:
+        del inventario["vistos"][item]
+        return False
+    return True
+
+def marcar_visto(inventario: Dict[str, Any], item: Tuple[str, str]) -> bool:
+    """
+    Registra o item como visto. Retorna False se ele já tinha sido visto
+    (mensagem repetida, que pode ser descartada sem processar).
+    """
+    with inventario["lock"]:
+        inventario["pedidos"].pop(item, None)
+        if _foi_visto(inventario, item):
+            return False
+        vistos = inventario["vistos"]
+        vistos[item] = time.monotonic()
+        while len(vistos) > inventario["capacidade"]:
+            vistos.popitem(last=False)
+        return True
+
+def itens_para_pedir(inventario: Dict[str, Any], itens: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """
+    Filtra um anúncio: devolve os itens não vistos e sem pedido em andamento
+    (ou com pedido vencido) e os registra como pedidos.
+    """
+    agora = time.monotonic()
+    pedidos = inventario["pedidos"]
+    novos = []
+    with inventario["lock"]:
+        for item in itens:
+            if _foi_visto(inventario, item):
+                continue
+            pedido_em = pedidos.get(item)
+            if pedido_em is not None and agora - pedido_em < TIMEOUT_PEDIDO:
+                continue
+            pedidos[item] = agora
+            novos.append(item)
+        # Pedidos que nunca foram respondidos não ficam acumulando
+        if len(pedidos) > inventario["capacidade"]:
+            for item in [i for i, t in pedidos.items() if agora - t >= TIMEOUT_PEDIDO]:
+                del pedidos[item]
+    return novos
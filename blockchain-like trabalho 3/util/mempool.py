@@ -0,0 +1,185 @@
+# Funções utilitárias para a mempool (transações pendentes)
+#
+# A mempool é um dicionário de estado, como a blockchain:
+#   - "txs": id -> transação, na ordem de chegada (remoção O(1) por id)
+#   - um heap de mínimo por (prioridade, ordem de chegada) escolhe quem sai
+#     quando o limite de transações ou de bytes é atingido
+# A prioridade é a taxa por byte; sem taxa, sai a transação mais antiga.
+# As funções que alteram a mempool devem ser chamadas com mempool["lock"];
+# as de leitura (listar, selecionar) o adquirem sozinhas.
+
+import heapq
+import json
+import threading
+from typing import Any, Dict, List, Optional
+
+MAX_TRANSACOES_MEMPOOL = 50_000
+MAX_BYTES_MEMPOOL = 32 * 1024 * 1024
+MAX_TRANSACOES_BLOCO = 2_000     # Limites do modelo de bloco entregue ao minerador
+MAX_BYTES_BLOCO = 1024 * 1024
+
+def criar_mempool(max_transacoes: int = MAX_TRANSACOES_MEMPOOL, max_bytes: int = MAX_BYTES_MEMPOOL) -> Dict[str, Any]:
+    """Inicializa uma mempool vazia com os limites dados."""
+    return {
+        "txs": {},                # id -> transação
+        "entradas": {},           # id -> (prioridade, sequência, tamanho em bytes)
+        "heap": [],               # (prioridade, sequência, id); entradas removidas ficam até a limpeza
+        "saidas": {},             # endereço -> total (valor + taxa) já gasto na mempool
+        "bytes": 0,
+        "sequencia": 0,
+        "max_transacoes": max_transacoes,
+        "max_bytes": max_bytes,
+        "lock": threading.RLock(),
+    }
+
+def tamanho_transacao(transacao: Dict[str, Any]) -> int:
+    """Tamanho aproximado da transação no fio (JSON)."""
+    return len(json.dumps(transacao))
+
+def custo_transacao(transacao: Dict[str, Any]) -> float:
+    """Quanto sai da conta de origem: valor mais a taxa (opcional)."""
+    return transacao["valor"] + transacao.get("taxa", 0.0)
+
+def _somar_saida(mempool: Dict[str, Any], endereco: str, valor: float):
+    novo = mempool["saidas"].get(endereco, 0.0) + valor
+    if abs(novo) < 1e-9:
+        mempool["saidas"].pop(endereco, None)
+    else:
+        mempool["saidas"][endereco] = novo
+
+def _menor_prioridade(mempool: Dict[str, Any]):
+    """Topo do heap descartando entradas de transações que já saíram."""
+    heap = mempool["heap"]
+    while heap:
+        prioridade, sequencia, tx_id = heap[0]
+        entrada = mempool["entradas"].get(tx_id)
+        if entrada is not None and entrada[1] == sequencia:
+            return heap[0]
+        heapq.heappop(heap)
+    return None
+
+def adicionar_a_mempool(mempool: Dict[str, Any], transacao: Dict[str, Any]) -> bool:
+    """
+    Insere a transação. Com a mempool cheia, remove as de menor prioridade
+    (as mais antigas, em caso de empate) até caber; se todas tiverem
+    prioridade maior que a nova, ela é recusada.
+    Não valida saldo nem duplicatas na cadeia (ver adicionar_transacao).
+    """
+    tx_id = transacao["id"]
+    if tx_id in mempool["txs"]:
+        return False
+    tamanho = tamanho_transacao(transacao)
+    if tamanho > mempool["max_bytes"]:
+        return False
+    prioridade = transacao.get("taxa", 0.0) / tamanho
+    sequencia = mempool["sequencia"]
+
+    # Escolhe as vítimas antes de remover qualquer uma, para não esvaziar
+    # a mempool à toa quando a nova acaba recusada
+    vitimas = []
+    liberados = 0
+    while (len(mempool["txs"]) - len(vitimas) >= mempool["max_transacoes"]
+           or mempool["bytes"] - liberados + tamanho > mempool["max_bytes"]):
+        menor = _menor_prioridade(mempool)
+        # Com prioridade igual sai a mais antiga; uma taxa menor que a de todas é recusada
+        if menor is None or menor[0] > prioridade:
+            for vitima in vitimas:
+                heapq.heappush(mempool["heap"], vitima)
+            return False
+        heapq.heappop(mempool["heap"])
+        vitimas.append(menor)
+        liberados += mempool["entradas"][menor[2]][2]
+    for _, _, vitima_id in vitimas:
+        remover_da_mempool(mempool, vitima_id)
+
+    mempool["sequencia"] = sequencia + 1
+    mempool["txs"][tx_id] = transacao
+    mempool["entradas"][tx_id] = (prioridade, sequencia, tamanho)
+    heapq.heappush(mempool["heap"], (prioridade, sequencia, tx_id))
+    mempool["bytes"] += tamanho
+    _somar_saida(mempool, transacao["origem"], custo_transacao(transacao))
+    return True
+
+def vitimas_para_lote(mempool: Dict[str, Any], transacoes: List[Dict[str, Any]]) -> Optional[List[str]]:
+    """
+    Ids que precisam sair para que todas as 'transacoes' caibam, sem
+    remover nada: as de menor prioridade primeiro, como em
+    adicionar_a_mempool, mas só entre as que não têm prioridade maior que a
+    menor do lote (assim nenhuma do lote desalojaria outra do lote ao entrar).
+    Retorna None se o lote não couber.
+    """
+    tamanhos = [tamanho_transacao(tx) for tx in transacoes]
+    excesso_txs = len(mempool["txs"]) + len(transacoes) - mempool["max_transacoes"]
+    excesso_bytes = mempool["bytes"] + sum(tamanhos) - mempool["max_bytes"]
+    if excesso_txs <= 0 and excesso_bytes <= 0:
+        return []
+    prioridade_lote = min(tx.get("taxa", 0.0) / tamanho for tx, tamanho in zip(transacoes, tamanhos))
+
+    # Percorre uma cópia do heap: a mempool só muda se o lote for aceito
+    heap = list(mempool["heap"])
+    vitimas = []
+    while excesso_txs > 0 or excesso_bytes > 0:
+        if not heap:
+            return None
+        prioridade, sequencia, tx_id = heapq.heappop(heap)
+        entrada = mempool["entradas"].get(tx_id)
+        if entrada is None or entrada[1] != sequencia:
+            continue # Entrada antiga de uma transação que já saiu
+        if prioridade > prioridade_lote:
+            return None
+        vitimas.append(tx_id)
+        excesso_txs -= 1
+        excesso_bytes -= entrada[2]
+    return vitimas
+
+def remover_da_mempool(mempool: Dict[str, Any], tx_id: str) -> Optional[Dict[str, Any]]:
+    """Remove uma transação pelo id em O(1). Retorna a transação removida (ou None)."""
+    transacao = mempool["txs"].pop(tx_id, None)
+    if transacao is None:
+        return None
+    _, _, tamanho = mempool["entradas"].pop(tx_id)
+    mempool["bytes"] -= tamanho
+    _somar_saida(mempool, transacao["origem"], -custo_transacao(transacao))
+    # O heap é limpo de vez em quando, não a cada remoção
+    if len(mempool["heap"]) > 2 * len(mempool["txs"]) + 64:
+        mempool["heap"] = [(p, s, i) for i, (p, s, _) in mempool["entradas"].items()]
+        heapq.heapify(mempool["heap"])
+    return transacao
+
+def remover_confirmadas(mempool: Dict[str, Any], transacoes: List[Dict[str, Any]]):
+    """Tira da mempool as transações de um bloco aceito (O(1) por transação)."""
+    for tx in transacoes:
+        remover_da_mempool(mempool, tx["id"])
+
+def listar_mempool(mempool: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Transações pendentes na ordem de chegada."""
+    with mempool["lock"]:
+        return list(mempool["txs"].values())
+
+def selecionar_para_bloco(mempool: Dict[str, Any], max_transacoes: int = MAX_TRANSACOES_BLOCO,
+                          max_bytes: int = MAX_BYTES_BLOCO) -> List[Dict[str, Any]]:
+    """
+    Monta o modelo de bloco: as transações de maior taxa por byte (as mais
+    antigas primeiro no empate) que couberem nos limites.
+    """
+    with mempool["lock"]:
+        return _selecionar(mempool, max_transacoes, max_bytes)
+
+def _selecionar(mempool: Dict[str, Any], max_transacoes: int, max_bytes: int) -> List[Dict[str, Any]]:
+    entradas = mempool["entradas"]
+    chave = lambda tx_id: (-entradas[tx_id][0], entradas[tx_id][1])
+    # Caso comum: as melhores 'max_transacoes' cabem nos bytes e não é preciso ordenar tudo
+    ordem = heapq.nsmallest(max_transacoes, entradas, key=chave)
+    if sum(entradas[tx_id][2] for tx_id in ordem) > max_bytes:
+        ordem = sorted(entradas, key=chave)
+    selecionadas = []
+    total = 0
+    for tx_id in ordem:
+        if len(selecionadas) >= max_transacoes:
+            break
+        tamanho = entradas[tx_id][2]
+        if total + tamanho > max_bytes:
+            continue
+        selecionadas.append(mempool["txs"][tx_id])
+        total += tamanho
+    return selecionadas
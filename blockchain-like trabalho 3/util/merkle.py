@@ -0,0 +1,63 @@
+# Funções utilitárias para a árvore de Merkle das transações
+
+import hashlib
+import json
+from typing import Any, Dict, List
+
+# Raiz usada por blocos sem transações
+RAIZ_VAZIA = "0" * 64
+
+def calcular_hash_transacao(transacao: Dict[str, Any]) -> str:
+    """Hash SHA-256 da transação (folha da árvore de Merkle)."""
+    tx_string = json.dumps(transacao, sort_keys=True)
+    return hashlib.sha256(tx_string.encode()).hexdigest()
+
+def _combinar(esquerda: str, direita: str) -> str:
+    """Hash de um nó interno a partir dos dois filhos."""
+    return hashlib.sha256(bytes.fromhex(esquerda) + bytes.fromhex(direita)).hexdigest()
+
+def _proximo_nivel(nivel: List[str]) -> List[str]:
+    """Sobe um nível da árvore. Em níveis ímpares o último hash é duplicado."""
+    if len(nivel) % 2 == 1:
+        nivel = nivel + [nivel[-1]]
+    return [_combinar(nivel[i], nivel[i + 1]) for i in range(0, len(nivel), 2)]
+
+def calcular_merkle_root(transacoes: List[Dict[str, Any]]) -> str:
+    """
+    Calcula a raiz de Merkle da lista de transações.
+    É esse valor (e não a lista inteira) que entra no cabeçalho do bloco.
+    """
+    if not transacoes:
+        return RAIZ_VAZIA
+    nivel = [calcular_hash_transacao(tx) for tx in transacoes]
+    while len(nivel) > 1:
+        nivel = _proximo_nivel(nivel)
+    return nivel[0]
+
+def gerar_prova_merkle(transacoes: List[Dict[str, Any]], posicao: int) -> List[Dict[str, str]]:
+    """
+    Gera a prova de inclusão da transação na posição indicada:
+    a lista de hashes irmãos, da folha até a raiz, com o lado de cada um.
+    """
+    prova = []
+    nivel = [calcular_hash_transacao(tx) for tx in transacoes]
+    while len(nivel) > 1:
+        if len(nivel) % 2 == 1:
+            nivel = nivel + [nivel[-1]]
+        if posicao % 2 == 0:
+            prova.append({"hash": nivel[posicao + 1], "lado": "direita"})
+        else:
+            prova.append({"hash": nivel[posicao - 1], "lado": "esquerda"})
+        nivel = _proximo_nivel(nivel)
+        posicao //= 2
+    return prova
+
+def verificar_prova_merkle(transacao: Dict[str, Any], prova: List[Dict[str, str]], merkle_root: str) -> bool:
+    """Refaz o caminho da folha até a raiz e confere com a merkle_root do cabeçalho."""
+    atual = calcular_hash_transacao(transacao)
+    for passo in prova:
+        if passo["lado"] == "direita":
+            atual = _combinar(atual, passo["hash"])
+        else:
+            atual = _combinar(passo["hash"], atual)
+    return atual == merkle_root
@@ -1,63 +1,157 @@
 # mineração com proof of work
 
+import os
 import time
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from typing import Any, Dict, List, Optional, Callable
 from .transaction import criar_transacao
-from .block import criar_bloco, calcular_hash_bloco, validar_proof_of_work
+from .block import criar_bloco, calcular_hash_bloco, prefixo_cabecalho
+from .dificuldade import calcular_alvo
 from .blockchain import adicionar_bloco
+from .mempool import selecionar_para_bloco
+from .validacao import RECOMPENSA_MINERACAO  # Regra de consenso: conferida na validação dos blocos
 
-# Configuração da Recompensa
-RECOMPENSA_MINERACAO = 50.0
+# Configuração da Mineração Paralela
+TAMANHO_FAIXA_NONCE = 20000   # Nonces testados por tarefa enviada a um worker
+INTERVALO_VERIFICACAO = 1000  # A cada quantos hashes o worker checa o cancelamento
+INTERVALO_PROGRESSO = 1.0     # Segundos entre chamadas de on_progress
+
+# Pool de processos reaproveitado entre blocos (criado sob demanda)
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_processos = 0
+_sinal_parada = None
+_contador_hashes = None
+
+# --- Lado do worker (executa em outro processo) ---
+
+def _iniciar_worker(sinal_parada, contador_hashes):
+    """Guarda no processo filho os objetos compartilhados com o pai."""
+    global _sinal_parada, _contador_hashes
+    _sinal_parada = sinal_parada
+    _contador_hashes = contador_hashes
+
+def _minerar_faixa(prefixo: bytes, inicio: int, fim: int, alvo: bytes) -> Optional[int]:
+    """
+    Testa os nonces em [inicio, fim). Retorna o nonce vencedor ou None se a
+    faixa acabou ou se outro worker já encontrou a solução.
+    Recebe só o prefixo do cabeçalho: o estado do sha256 é calculado uma vez
+    e copiado a cada tentativa. O alvo vem em 32 bytes big-endian, e a
+    comparação de bytes equivale à de inteiros (sem converter o hash).
+    """
+    base = hashlib.sha256(prefixo)
+    testados = 0
+    for nonce in range(inicio, fim):
+        h = base.copy()
+        h.update(str(nonce).encode())
+        if h.digest() < alvo:
+            _sinal_parada.set()
+            return nonce
+
+        testados += 1
+        if testados == INTERVALO_VERIFICACAO:
+            with _contador_hashes.get_lock():
+                _contador_hashes.value += testados
+            testados = 0
+            if _sinal_parada.is_set():
+                return None
+
+    with _contador_hashes.get_lock():
+        _contador_hashes.value += testados
+    return None
+
+# --- Lado do nó ---
+
+def _obter_pool(processos: int) -> ProcessPoolExecutor:
+    """Cria (ou reaproveita) o pool de workers de mineração."""
+    global _pool, _pool_processos, _sinal_parada, _contador_hashes
+    if _pool is None or _pool_processos != processos:
+        encerrar_mineradores()
+        # 'spawn' evita herdar locks de threads do nó (rede, Tkinter) via fork
+        ctx = multiprocessing.get_context("spawn")
+        _sinal_parada = ctx.Event()
+        _contador_hashes = ctx.Value("q", 0)
+        _pool = ProcessPoolExecutor(
+            max_workers=processos, mp_context=ctx,
+            initializer=_iniciar_worker, initargs=(_sinal_parada, _contador_hashes)
+        )
+        _pool_processos = processos
+    return _pool
+
+def encerrar_mineradores():
+    """Finaliza o pool de processos de mineração, se existir."""
+    global _pool, _pool_processos
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+        _pool_processos = 0
 
 def minerar_bloco(
     no_estado: Dict[str, Any], 
     endereco_minerador: str,
-    dificuldade: str = "000",
-    on_progress: Optional[Callable[[int], None]] = None
+    on_progress: Optional[Callable[[int], None]] = None,
+    processos: Optional[int] = None
 ) -> Optional[Dict[str, Any]]:
 
     #Executa o algoritmo de Proof of Work.
     #
     #Retorna o bloco minerado ou None se a mineração for interrompida 
     #(ex: no_estado['mining_active'] alterado para False).
+    #
+    #O espaço de nonces é dividido em faixas entre 'processos' workers
+    #(padrão: número de CPUs). on_progress recebe a taxa agregada em hashes/s.
+    #O alvo do PoW é o exigido pela cadeia atual (ver util/dificuldade.py).
 
     blockchain = no_estado["blockchain"]
     
-    # 1. Prepara as transações (Cópia das pendentes + Coinbase)
-    with no_estado["lock"]:
-        transacoes_candidatas = list(blockchain["pending_transactions"])
+    # 1. Prepara as transações (modelo de bloco: maior taxa por byte primeiro + Coinbase)
+    transacoes_candidatas = selecionar_para_bloco(blockchain["mempool"])
     
     timestamp_bloco = time.time()
     
-    # Adiciona transação de recompensa (Coinbase) no início da lista
+    # Adiciona transação de recompensa (Coinbase) no início da lista; as taxas vão para o minerador
     coinbase_tx = criar_transacao(
         origem="coinbase",
         destino=endereco_minerador,
-        valor=RECOMPENSA_MINERACAO,
+        valor=RECOMPENSA_MINERACAO + sum(tx.get("taxa", 0.0) for tx in transacoes_candidatas),
         timestamp=timestamp_bloco
     )
     transacoes_candidatas.insert(0, coinbase_tx)
 
     # 2. Prepara o bloco candidato
-    ultimo_bloco = blockchain["chain"][-1]
+    instantaneo = blockchain["instantaneo"]
+    ultimo_bloco = instantaneo["topo"]
+    alvo = calcular_alvo(instantaneo["chain"].__getitem__, ultimo_bloco["index"] + 1)
     bloco = criar_bloco(
-        index=len(blockchain["chain"]),
+        index=ultimo_bloco["index"] + 1,
         previous_hash=ultimo_bloco["hash"],
         transacoes=transacoes_candidatas,
         nonce=0,
-        timestamp=timestamp_bloco
+        timestamp=timestamp_bloco,
+        alvo=alvo
     )
+    alvo_bytes = alvo.to_bytes(32, "big")
 
     # 3. Loop de Proof of Work
     no_estado["mining_active"] = True
     no_estado["logger"].info(f"Minerando bloco #{bloco['index']}...")
 
+    processos = processos or os.cpu_count() or 1
+    if processos > 1:
+        return _minerar_em_paralelo(no_estado, bloco, alvo_bytes, on_progress, processos)
+
+    # O cabeçalho só muda no nonce: o prefixo é hasheado uma única vez
+    base = hashlib.sha256(prefixo_cabecalho(bloco))
+    inicio = ultimo_relatorio = time.time()
     while no_estado["mining_active"]:
         # Calcula o hash atual com o nonce presente
-        bloco["hash"] = calcular_hash_bloco(bloco)
+        h = base.copy()
+        h.update(str(bloco["nonce"]).encode())
 
-        # Verifica se atingiu a dificuldade
-        if validar_proof_of_work(bloco, dificuldade):
+        # Verifica se o hash ficou abaixo do alvo
+        if h.digest() < alvo_bytes:
+            bloco["hash"] = h.hexdigest()
             no_estado["mining_active"] = False
             return bloco
 
@@ -66,10 +160,76 @@ def minerar_bloco(
 
         # Reporta progresso opcionalmente (para logs ou interface)
         if on_progress and bloco["nonce"] % 10000 == 0:
-            on_progress(bloco["nonce"])
+            agora = time.time()
+            if agora - ultimo_relatorio >= INTERVALO_PROGRESSO:
+                on_progress(int(bloco["nonce"] / (agora - inicio)))
+                ultimo_relatorio = agora
             
     return None
 
+def _minerar_em_paralelo(
+    no_estado: Dict[str, Any],
+    bloco: Dict[str, Any],
+    alvo: bytes,
+    on_progress: Optional[Callable[[int], None]],
+    processos: int
+) -> Optional[Dict[str, Any]]:
+    """
+    Distribui faixas consecutivas de nonces entre os workers do pool.
+    O primeiro que encontrar a solução sinaliza os demais para pararem.
+    """
+    pool = _obter_pool(processos)
+    prefixo = prefixo_cabecalho(bloco)
+    _sinal_parada.clear()
+    with _contador_hashes.get_lock():
+        _contador_hashes.value = 0
+
+    proximo_nonce = 0
+    pendentes = set()
+
+    def submeter_faixa():
+        nonlocal proximo_nonce
+        fim = proximo_nonce + TAMANHO_FAIXA_NONCE
+        pendentes.add(pool.submit(_minerar_faixa, prefixo, proximo_nonce, fim, alvo))
+        proximo_nonce = fim
+
+    # Duas faixas por worker para que nenhum fique ocioso entre tarefas
+    for _ in range(processos * 2):
+        submeter_faixa()
+
+    nonce_vencedor = None
+    inicio = ultimo_relatorio = time.time()
+    try:
+        while no_estado["mining_active"] and nonce_vencedor is None:
+            concluidas, _ = wait(pendentes, timeout=0.2, return_when=FIRST_COMPLETED)
+            for tarefa in concluidas:
+                pendentes.discard(tarefa)
+                resultado = tarefa.result()
+                if resultado is not None and nonce_vencedor is None:
+                    nonce_vencedor = resultado
+            if nonce_vencedor is None:
+                for _ in concluidas:
+                    submeter_faixa()
+
+            agora = time.time()
+            if on_progress and agora - ultimo_relatorio >= INTERVALO_PROGRESSO:
+                on_progress(int(_contador_hashes.value / (agora - inicio)))
+                ultimo_relatorio = agora
+    finally:
+        # Cancela o que ainda está na fila e espera os workers ativos pararem
+        _sinal_parada.set()
+        for tarefa in pendentes:
+            tarefa.cancel()
+        wait(pendentes)
+
+    if nonce_vencedor is None:
+        return None
+
+    bloco["nonce"] = nonce_vencedor
+    bloco["hash"] = calcular_hash_bloco(bloco)
+    no_estado["mining_active"] = False
+    return bloco
+
 def interromper_mineracao(no_estado: Dict[str, Any]):
     """Sinaliza para a função de mineração parar o loop atual."""
     no_estado["mining_active"] = False
\ No newline at end of file
@@ -1,309 +1,810 @@
 # Funções utilitárias para lidar com a comunicação de rede p2p
 
-import socket
+import time
+import asyncio
 import threading
 import logging
 import json
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Optional
 
 # Importamos as funções que já transformamos em procedural
 from .blockchain import (
-    iniciar_blockchain, adicionar_bloco, adicionar_transacao, 
-    validar_cadeia_completa, obter_ultimo_bloco, substituir_pela_corrente_mais_longa
+    iniciar_blockchain, adicionar_bloco, adicionar_transacao, substituir_pela_corrente_mais_longa,
+    exportar_blockchain, obter_prova_transacao, verificar_prova_transacao,
+    construir_locator, cabecalhos_apos_locator, validar_sufixo, adicionar_bloco_lateral,
+    adicionar_lote_transacoes, obter_bloco_verificado
 )
 from .block import criar_bloco
+from .armazenamento import abrir_blockchain, fechar_blockchain, salvar_snapshot, snapshot_pendente
+from .mempool import listar_mempool, selecionar_para_bloco
+from .validacao import MIN_BLOCOS_PARALELO
+from .dificuldade import trabalho_do_bloco
+from .inventario import criar_inventario, foi_visto, marcar_visto, itens_para_pedir, ITEM_TX, ITEM_BLOCO
+from .peers import (
+    criar_tabela_peers, registrar_contato, registrar_falha, esquecer_peer, escolher_peers, em_espera,
+    ordenar_peers, peers_para_verificar
+)
 from .protocolo import (
-    criar_mensagem, MessageType, msg_solicitar_chain, msg_pong,
-    msg_ping, mensagem_para_bytes, bytes_para_mensagem
+    criar_mensagem, MessageType, msg_pong,
+    msg_ping, mensagem_para_bytes, bytes_para_mensagem, msg_solicitar_prova,
+    msg_resposta_prova, msg_solicitar_cabecalhos, msg_resposta_cabecalhos,
+    msg_solicitar_blocos, msg_resposta_blocos, TIPOS_COM_RESPOSTA, TAMANHO_MAXIMO_MENSAGEM,
+    CODECS_SUPORTADOS, msg_versao, codec_do_corpo, escolher_codec, msg_solicitar_mempool,
+    msg_resposta_mempool, msg_inventario, msg_solicitar_dados, msg_novo_bloco,
+    msg_submeter_transacoes, msg_resultado_submissao
     )
+from .codec import CODEC_JSON
 
 # Configurações
 BUFFER_SIZE = 65536
-
-def criar_estado_no(host: str = "localhost", port: int = 5000) -> Dict[str, Any]:
+MAX_CABECALHOS = 2000   # Cabeçalhos por resposta REQUEST_HEADERS
+LOTE_BLOCOS = 100       # Blocos por requisição REQUEST_BLOCKS
+TIMEOUT_CONEXAO = 5     # Segundos para conectar/aguardar resposta de um peer
+TIMEOUT_OCIOSO = 300    # Conexões de entrada sem tráfego por mais tempo são fechadas
+MAX_WORKERS = 8         # Threads para o trabalho bloqueante (validação, sync)
+MAX_CONEXOES_ENTRADA = 512
+FILA_MAX_POR_PEER = 1000  # Mensagens aguardando envio para um mesmo peer
+INTERVALO_ANUNCIO = 0.1   # Segundos que os anúncios (INV) de um peer esperam para sair juntos
+MAX_ITENS_INV = 1000      # Um INV com isso de itens sai sem esperar o intervalo
+MAX_PEERS = 125           # Peers novos além disso são ignorados até algum sair da tabela
+INTERVALO_VERIFICACAO = 5.0  # Segundos entre rodadas de verificação de vida dos peers
+
+def criar_estado_no(host: str = "localhost", port: int = 5000, diretorio_dados: Optional[str] = None) -> Dict[str, Any]:
     """
     Inicializa o 'cérebro' do nó. Substitui o __init__ da classe Node.
+    Com 'diretorio_dados' a blockchain é carregada do disco (e gravada nele);
+    sem ele, fica só em memória.
     """
     return {
         "host": host,
         "port": port,
         "address": f"{host}:{port}",
-        "blockchain": iniciar_blockchain(),
-        "peers": set(),
+        "blockchain": abrir_blockchain(diretorio_dados) if diretorio_dados else iniciar_blockchain(),
+        "peers": frozenset(),     # Trocado inteiro a cada mudança (ver adicionar_peers)
+        "codecs": list(CODECS_SUPORTADOS), # Formatos aceitos no fio, em ordem de preferência
         "running": False,
-        "lock": threading.Lock(), # Protege a blockchain de acessos simultâneos
+        "lock_peers": threading.Lock(), # Só para escritores da tabela de peers
+        "tabela_peers": criar_tabela_peers(), # Latência, falhas e espera de cada peer (util/peers.py)
         "logger": logging.getLogger(f"Node:{port}"),
-        "server_socket": None
+        "server_socket": None,
+        # Motor de rede: um event loop asyncio numa thread própria, mais um pool
+        # limitado de threads para o processamento bloqueante das mensagens
+        "loop": None,
+        "executor": None,
+        # Conexões persistentes de saída, uma por peer (só acessadas pelo loop)
+        "conexoes": {},
+        "tarefas_entrada": {},    # Corrotina -> writer de cada conexão de entrada
+        # Gossip por inventário: itens vistos/pedidos e anúncios aguardando envio por peer
+        "inventario": criar_inventario(),
+        "anuncios": {},           # peer -> itens [tipo, id] do próximo INV (só acessado pelo loop)
+        # Contadores de quadros/bytes no fio (só alterados pelo loop; leitura livre)
+        "trafego": {"msgs_enviadas": 0, "bytes_enviados": 0, "msgs_recebidas": 0, "bytes_recebidos": 0}
     }
 
 def iniciar_no(no_estado: Dict[str, Any]):
-    """Configura o socket e inicia a thread de escuta."""
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    sock.bind(("0.0.0.0", no_estado["port"]))
-    sock.listen(10)
-    no_estado["server_socket"] = sock
+    """
+    Inicia o motor de rede: um event loop asyncio em uma thread dedicada
+    atende todas as conexões, e o trabalho bloqueante vai para o executor.
+    Retorna quando o servidor já está escutando.
+    """
+    loop = asyncio.new_event_loop()
+    no_estado["loop"] = loop
+    no_estado["executor"] = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix=f"no-{no_estado['port']}")
     no_estado["running"] = True
-    no_estado["logger"].info(f"Nó procedural ativo em {no_estado['address']}")
 
-    # Thread para aceitar conexões
-    thread = threading.Thread(target=_loop_aceitar_conexoes, args=(no_estado,))
+    thread = threading.Thread(target=loop.run_forever)
     thread.daemon = True
     thread.start()
 
-def _loop_aceitar_conexoes(no_estado: Dict[str, Any]):
-    """Loop principal de rede."""
-    while no_estado["running"]:
-        try:
-            client_sock, addr = no_estado["server_socket"].accept()
-            thread = threading.Thread(target=_tratar_cliente, args=(no_estado, client_sock, addr))
-            thread.daemon = True
-            thread.start()
-        except:
-            break
-
-def _tratar_cliente(no_estado: Dict[str, Any], sock: socket.socket, addr: tuple):
-    """Lê e processa mensagens via socket com registro de peers."""
-    try:
-        #  Ler o tamanho da mensagem (4 bytes)
-        length_data = sock.recv(4)
-        if not length_data: 
-            return
-        
-        length = int.from_bytes(length_data, 'big')
-        
-        # 2. Ler o corpo da mensagem (JSON)
-        raw_data = sock.recv(length)
-        if not raw_data:
-            return
-
-        mensagem = bytes_para_mensagem(raw_data)
+    no_estado["server_socket"] = asyncio.run_coroutine_threadsafe(
+        asyncio.start_server(
+            lambda r, w: _tratar_cliente(no_estado, r, w),
+            "0.0.0.0", no_estado["port"], reuse_address=True
+        ),
+        loop
+    ).result()
+    loop.call_soon_threadsafe(loop.call_later, INTERVALO_VERIFICACAO, _verificar_peers, no_estado)
+    loop.call_soon_threadsafe(loop.call_later, INTERVALO_VERIFICACAO, _verificar_snapshot, no_estado)
+    no_estado["logger"].info(f"Nó procedural ativo em {no_estado['address']}")
 
-        # 3. Processar a lógica de negócio (Novo bloco, transação, etc)
-        resposta = _processar_mensagem(no_estado, mensagem)
-        # 4. Enviar resposta, se houver
-        if resposta:
+def encerrar_no(no_estado: Dict[str, Any]):
+    """Para o servidor, fecha as conexões com os peers e encerra o event loop."""
+    loop = no_estado["loop"]
+    if not no_estado["running"] or loop is None:
+        return
+    no_estado["running"] = False
+
+    async def encerrar():
+        no_estado["server_socket"].close()
+        for conexao in no_estado["conexoes"].values():
+            conexao["tarefa"].cancel()
+            _fechar_conexao(conexao)
+        no_estado["conexoes"].clear()
+        # Fechar o transporte faz cada _tratar_cliente sair normalmente
+        tarefas = list(no_estado["tarefas_entrada"])
+        for writer in no_estado["tarefas_entrada"].values():
+            writer.close()
+        if tarefas:
+            await asyncio.wait(tarefas, timeout=TIMEOUT_CONEXAO)
+
+    asyncio.run_coroutine_threadsafe(encerrar(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    no_estado["executor"].shutdown(wait=False, cancel_futures=True)
+    fechar_blockchain(no_estado["blockchain"])
+
+def _contar_trafego(no_estado: Dict[str, Any], sentido: str, quadro: bytes):
+    """Soma um quadro aos contadores ('enviados' ou 'recebidos'). Só chamar no event loop."""
+    trafego = no_estado["trafego"]
+    if sentido == "enviados":
+        trafego["msgs_enviadas"] += 1
+        trafego["bytes_enviados"] += len(quadro)
+    else:
+        trafego["msgs_recebidas"] += 1
+        trafego["bytes_recebidos"] += len(quadro) + 4  # + cabeçalho de tamanho
+
+async def _ler_quadro(reader: asyncio.StreamReader) -> bytes:
+    """Lê um quadro completo: [4 bytes de tamanho] + corpo."""
+    tamanho = int.from_bytes(await reader.readexactly(4), 'big')
+    if tamanho > TAMANHO_MAXIMO_MENSAGEM:
+        raise ValueError(f"Mensagem de {tamanho} bytes excede o limite")
+    return await reader.readexactly(tamanho)
+
+async def _tratar_cliente(no_estado: Dict[str, Any], reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """
+    Atende uma conexão persistente: lê e processa mensagens em sequência
+    até o peer fechar a conexão ou ela ficar ociosa.
+    O processamento (validação de blocos etc.) roda no executor para
+    não bloquear o event loop.
+    """
+    addr = writer.get_extra_info("peername")
+    if len(no_estado["tarefas_entrada"]) >= MAX_CONEXOES_ENTRADA:
+        writer.close()
+        return
+    no_estado["tarefas_entrada"][asyncio.current_task()] = writer
+    loop = asyncio.get_running_loop()
+    try:
+        while no_estado["running"]:
             try:
-                print(resposta)
-                msgBytes = mensagem_para_bytes(resposta)
-                sock.sendall(msgBytes)
-
-                no_estado["logger"].info(f"Resposta {resposta["type"]} encaminhada {addr}")
-            except Exception as e:
-                no_estado["logger"].error(f"Falha ao conectar em {addr}: {e}")
+                quadro = await asyncio.wait_for(_ler_quadro(reader), TIMEOUT_OCIOSO)
+            except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                return
+            _contar_trafego(no_estado, "recebidos", quadro)
+            mensagem = bytes_para_mensagem(quadro)
+
+            # Processar a lógica de negócio (Novo bloco, transação, etc)
+            resposta = await loop.run_in_executor(no_estado["executor"], _processar_mensagem, no_estado, mensagem)
+
+            # Só requisições têm resposta; sem ela o peer ficaria esperando, então fechamos
+            if mensagem.get("type") in TIPOS_COM_RESPOSTA:
+                if not resposta:
+                    return
+                # A resposta segue o mesmo formato da requisição
+                dados = mensagem_para_bytes(resposta, codec_do_corpo(quadro))
+                _contar_trafego(no_estado, "enviados", dados)
+                writer.write(dados)
+                await writer.drain()
+                no_estado["logger"].info(f"Resposta {resposta['type']} encaminhada {addr}")
 
     except Exception as e:
         no_estado["logger"].error(f"Erro ao tratar cliente {addr}: {e}")
     finally:
-        sock.close()
+        no_estado["tarefas_entrada"].pop(asyncio.current_task(), None)
+        writer.close()
 
 def _processar_mensagem(no_estado: Dict[str, Any], msg: Dict[str, Any]) -> Optional[Dict]:
     """
     O 'Dispatcher'. Decide o que fazer com a mensagem recebida.
-    Note o uso de no_estado['lock'] para segurança.
+    Não há lock global: cada estrutura tem o seu (cadeia, mempool, peers)
+    e as leituras usam o instantâneo imutável da blockchain.
     """
     m_type = msg.get("type")
     sender = msg.get("sender")
     payload = msg.get("payload", {})
 
-    if sender != no_estado["address"] and sender not in no_estado["peers"]:
-        no_estado["peers"].add(sender)
+    if sender and sender != no_estado["address"]:
+        if sender not in no_estado["peers"]:
+            adicionar_peers(no_estado, [sender])
+        registrar_contato(no_estado["tabela_peers"], sender)
+
+    if m_type == MessageType.PING.value:
+        pong_msg = msg_pong()
+        pong_msg["sender"] = no_estado["address"]
+        return pong_msg
+
+    elif m_type == MessageType.PONG.value:
+        return None
+
+    elif m_type == MessageType.DISCOVER_PEERS.value:
+        return criar_mensagem(MessageType.PEERS_LIST, {"peers": list(no_estado.get("peers"))}, no_estado.get("address"))
 
-    with no_estado["lock"]:
-        if m_type == MessageType.PING.value:
-            if sender not in no_estado.get("peers"):
-                no_estado["peers"].add(sender)
-            pong_msg = msg_pong()
-            pong_msg["sender"] = no_estado["address"]
-            return pong_msg
+    elif m_type == MessageType.PEERS_LIST.value:
+        novos_peers = set(payload.get("peers", [])) - no_estado["peers"] - {no_estado["address"]}
+        adicionar_peers(no_estado, novos_peers)
+        return None
 
-        elif m_type == MessageType.PONG.value:
-            if sender not in no_estado.get("peers"):
-                no_estado["peers"].add(sender)
+    elif m_type == MessageType.NEW_TRANSACTION.value:
+        _receber_transacoes(no_estado, [payload["transaction"]], sender)
+
+    elif m_type == MessageType.NEW_BLOCK.value:
+        bloco = payload["block"]
+        blockchain_local = no_estado["blockchain"]
+        proximo_index_esperado = blockchain_local["instantaneo"]["altura"]
+        # O mesmo bloco chega por vários vizinhos: só a primeira cópia é processada
+        if not marcar_visto(no_estado["inventario"], (ITEM_BLOCO, bloco["hash"])):
             return None
-        
-        elif m_type == MessageType.DISCOVER_PEERS.value:
-            return criar_mensagem(MessageType.PEERS_LIST, {"peers": list(no_estado.get("peers"))}, no_estado.get("address"))
-        
-        elif m_type == MessageType.PEERS_LIST.value:
-            novos_peers = payload["peers"] - no_estado["peers"] - {no_estado["address"]}
-            for peer in novos_peers:
-                no_estado["peers"].add(peer)
+
+        if bloco["index"] == proximo_index_esperado and adicionar_bloco(blockchain_local, bloco):
+            # Caso ideal: bloco sequencial
+            no_estado["logger"].info(f"Novo bloco #{bloco['index']} adicionado via rede.")
+            anunciar(no_estado, [(ITEM_BLOCO, bloco["hash"])], exceto={sender})
             return None
 
-        elif m_type == MessageType.NEW_TRANSACTION.value:
-            tx = payload["transaction"]
-            if adicionar_transacao(no_estado["blockchain"], tx):
-                # Propaga para os outros (exceto quem enviou)
-                propagar_mensagem(no_estado, msg, peers_propag=(no_estado["peers"] - {sender}))
-                
-        elif m_type == MessageType.NEW_BLOCK.value:
-            bloco = payload["block"]
-            blockchain_local = no_estado["blockchain"]
-            proximo_index_esperado = len(blockchain_local["chain"])
-
-            if bloco["index"] == proximo_index_esperado:
-                # Caso ideal: bloco sequencial
-                if adicionar_bloco(blockchain_local, bloco):
-                    no_estado["logger"].info(f"Novo bloco #{bloco['index']} adicionado via rede.")
-                    return None
-        
-            elif bloco["index"] > proximo_index_esperado:
-                # Estamos atrasados! Pedimos a chain completa
-                no_estado["logger"].info("Recebido bloco muito avançado. Solicitando sincronização completa...")
-                from util.protocolo import msg_solicitar_chain
-                return msg_solicitar_chain() 
-
-        elif m_type == MessageType.RESPONSE_CHAIN.value:
-            chain_recebida = payload["blockchain"]["chain"]
-            if substituir_pela_corrente_mais_longa(no_estado, chain_recebida):
-                no_estado["logger"].info("Blockchain sincronizada com a versão mais longa dos peers.")
-
-        elif m_type == "REQUEST_CHAIN":
-            return {
-                "type": "RESPONSE_CHAIN",
-                "sender": no_estado["address"],
-                "payload": {"blockchain": no_estado["blockchain"]}
-            }
+        # Bloco de um ramo concorrente cujo pai já conhecemos (árvore de forks)
+        if adicionar_bloco_lateral(blockchain_local, bloco):
+            no_estado["logger"].info(f"Reorganização: ramo com o bloco #{bloco['index']} passou a ser o principal.")
+            anunciar(no_estado, [(ITEM_BLOCO, bloco["hash"])], exceto={sender})
+            return None
 
+        if bloco["index"] >= proximo_index_esperado and bloco["hash"] not in blockchain_local["ramos"]:
+            # Estamos atrasados! Buscamos só os cabeçalhos/blocos que faltam
+            no_estado["logger"].info("Recebido bloco muito avançado. Sincronizando por cabeçalhos...")
+            no_estado["executor"].submit(sincronizar_com_peer, no_estado, sender)
+            return None
+
+    elif m_type == MessageType.RESPONSE_CHAIN.value:
+        chain_recebida = payload["blockchain"]["chain"]
+        if substituir_pela_corrente_mais_longa(no_estado, chain_recebida):
+            no_estado["logger"].info("Blockchain sincronizada com a versão mais longa dos peers.")
+
+    elif m_type == MessageType.REQUEST_HEADERS.value:
+        cabecalhos = cabecalhos_apos_locator(no_estado["blockchain"], payload["locator"], MAX_CABECALHOS)
+        resposta = msg_resposta_cabecalhos(cabecalhos)
+        resposta["sender"] = no_estado["address"]
+        return resposta
+
+    elif m_type == MessageType.REQUEST_BLOCKS.value:
+        inicio = payload["inicio"]
+        quantidade = min(payload["quantidade"], LOTE_BLOCOS)
+        resposta = msg_resposta_blocos(no_estado["blockchain"]["instantaneo"]["chain"][inicio:inicio + quantidade])
+        resposta["sender"] = no_estado["address"]
+        return resposta
+
+    elif m_type == MessageType.REQUEST_TX_PROOF.value:
+        prova = obter_prova_transacao(no_estado["blockchain"], payload["tx_id"])
+        resposta = msg_resposta_prova(prova)
+        resposta["sender"] = no_estado["address"]
+        return resposta
+
+    elif m_type == MessageType.REQUEST_MEMPOOL.value:
+        mempool = no_estado["blockchain"]["mempool"]
+        limite = payload.get("limite")
+        # Com limite, vão as de maior prioridade (as que entrariam no próximo bloco)
+        transacoes = (selecionar_para_bloco(mempool, limite, mempool["max_bytes"])
+                      if limite else listar_mempool(mempool))
+        resposta = msg_resposta_mempool(transacoes)
+        resposta["sender"] = no_estado["address"]
+        return resposta
+
+    elif m_type == MessageType.RESPONSE_MEMPOOL.value:
+        _receber_transacoes(no_estado, payload.get("transactions", []), sender)
+        return None
+
+    elif m_type == MessageType.INV.value:
+        # Pede só o que não conhecemos e ninguém está nos enviando ainda
+        desconhecidos = [tuple(item) for item in payload.get("itens", [])
+                         if not _item_conhecido(no_estado, tuple(item))]
+        pedir = itens_para_pedir(no_estado["inventario"], desconhecidos)
+        if pedir:
+            propagar_mensagem(no_estado, msg_solicitar_dados([list(i) for i in pedir]), peers_propag=[sender])
+        return None
+
+    elif m_type == MessageType.GETDATA.value:
+        blockchain = no_estado["blockchain"]
+        transacoes = []
+        for tipo, identificador in payload.get("itens", []):
+            if tipo == ITEM_TX:
+                tx = blockchain["mempool"]["txs"].get(identificador)
+                if tx is not None:
+                    transacoes.append(tx)
+            elif tipo == ITEM_BLOCO:
+                bloco = obter_bloco_verificado(blockchain, identificador)
+                if bloco is not None:
+                    propagar_mensagem(no_estado, msg_novo_bloco(bloco), peers_propag=[sender])
+        # As transações pedidas vão todas numa única mensagem
+        if transacoes:
+            propagar_mensagem(no_estado, msg_resposta_mempool(transacoes), peers_propag=[sender])
+        return None
+
+    elif m_type == MessageType.SUBMIT_TRANSACTIONS.value:
+        transacoes = payload.get("transactions", [])
+        recusadas = adicionar_lote_transacoes(no_estado["blockchain"], transacoes)
+        if not recusadas:
+            _anunciar_lote(no_estado, transacoes, sender)
+        resposta = msg_resultado_submissao(0 if recusadas else len(transacoes), recusadas)
+        resposta["sender"] = no_estado["address"]
+        return resposta
+
+    elif m_type == MessageType.VERSION.value:
+        codec = escolher_codec(payload.get("codecs", []), no_estado["codecs"])
+        resposta = msg_versao(no_estado["codecs"], codec)
+        resposta["sender"] = no_estado["address"]
+        return resposta
+
+    elif m_type == "REQUEST_CHAIN":
+        return {
+            "type": "RESPONSE_CHAIN",
+            "sender": no_estado["address"],
+            "payload": {"blockchain": exportar_blockchain(no_estado["blockchain"])}
+        }
     return None
 
+def adicionar_peers(no_estado: Dict[str, Any], peers):
+    """
+    Acrescenta peers à tabela. O conjunto é imutável e trocado por um novo
+    (copy-on-write), então quem itera no_estado["peers"] não precisa de lock.
+    """
+    with no_estado["lock_peers"]:
+        novos = set(peers) - no_estado["peers"] - {no_estado["address"]}
+        vagas = MAX_PEERS - len(no_estado["peers"])
+        if novos and vagas > 0:
+            no_estado["peers"] = no_estado["peers"] | set(list(novos)[:vagas])
+
+def remover_peer(no_estado: Dict[str, Any], peer: str):
+    """Tira o peer da tabela e descarta a conexão e os anúncios pendentes para ele."""
+    with no_estado["lock_peers"]:
+        no_estado["peers"] = no_estado["peers"] - {peer}
+    esquecer_peer(no_estado["tabela_peers"], peer)
+    if no_estado["running"]:
+        no_estado["loop"].call_soon_threadsafe(_descartar_conexao, no_estado, peer)
+    no_estado["logger"].info(f"Peer {peer} removido após falhas seguidas.")
+
+def _receber_transacoes(no_estado: Dict[str, Any], transacoes: List[Dict], origem: Optional[str]) -> int:
+    """
+    Adiciona à mempool local as transações válidas recebidas de um peer
+    e anuncia as novas aos demais. Cópias repetidas são descartadas.
+    Só a transação aceita entra no cache de vistos: uma recusada agora
+    (ex.: saldo ainda não confirmado) pode ser pedida de novo depois.
+    """
+    novas = []
+    for tx in transacoes:
+        item = (ITEM_TX, tx["id"])
+        if foi_visto(no_estado["inventario"], item):
+            continue
+        if adicionar_transacao(no_estado["blockchain"], tx):
+            marcar_visto(no_estado["inventario"], item)
+            novas.append(item)
+    if novas:
+        anunciar(no_estado, novas, exceto={origem})
+    return len(novas)
+
+def _anunciar_lote(no_estado: Dict[str, Any], transacoes: List[Dict], origem: Optional[str]):
+    """Anuncia um lote admitido de uma vez: os itens saem juntos no mesmo INV de cada peer."""
+    itens = [(ITEM_TX, tx["id"]) for tx in transacoes]
+    for item in itens:
+        marcar_visto(no_estado["inventario"], item)
+    anunciar(no_estado, itens, exceto={origem})
+
+def _item_conhecido(no_estado: Dict[str, Any], item) -> bool:
+    """Se o corpo do item já está na mempool ou na cadeia (principal ou ramos)."""
+    tipo, identificador = item
+    blockchain = no_estado["blockchain"]
+    if tipo == ITEM_TX:
+        return identificador in blockchain["mempool"]["txs"] or identificador in blockchain["ids_confirmados"]
+    if tipo == ITEM_BLOCO:
+        return obter_bloco_verificado(blockchain, identificador) is not None
+    return True # Tipo desconhecido: não pedimos
+
+def anunciar_transacao(no_estado: Dict[str, Any], tx: Dict[str, Any]):
+    """Anuncia aos peers uma transação criada localmente (já na mempool)."""
+    marcar_visto(no_estado["inventario"], (ITEM_TX, tx["id"]))
+    anunciar(no_estado, [(ITEM_TX, tx["id"])])
+
+def anunciar_bloco(no_estado: Dict[str, Any], bloco: Dict[str, Any]):
+    """Anuncia aos peers um bloco minerado localmente (já na cadeia)."""
+    marcar_visto(no_estado["inventario"], (ITEM_BLOCO, bloco["hash"]))
+    anunciar(no_estado, [(ITEM_BLOCO, bloco["hash"])])
+
 def conectar_a_peer(no_estado: Dict[str, Any], peer_addr: str):
     """Handshake inicial com um novo nó."""
     if peer_addr == no_estado["address"]: return
     
     try:
-        host, port = peer_addr.split(":")
-        conectado = False
-        resposta = None
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-            sock.settimeout(5)
-            sock.connect((host, int(port)))
-            conectado = True
-            # Pede a chain para se sincronizar
-            msg = msg_solicitar_chain()
-            msg["sender"] = no_estado["address"]
-            msgBytes = mensagem_para_bytes(msg)
-            sock.sendall(msgBytes)
-
-            try:
-                #  Ler o tamanho da mensagem (4 bytes)
-                length_data = sock.recv(4)
-                if not length_data: 
-                    return
-
-                length = int.from_bytes(length_data, 'big')
-        
-                # 2. Ler o corpo da mensagem (JSON)
-                raw_data = sock.recv(length)
-                if not raw_data:
-                    return
-
-                resposta = bytes_para_mensagem(raw_data)
-            except:
-                pass
-            
-        if (conectado == False):
+        # PING apenas confirma que o peer está no ar antes de sincronizar
+        if solicitar_a_peer(no_estado, peer_addr, msg_ping()) is None:
             no_estado["logger"].error(f"Falha ao conectar em {peer_addr}")
             return
         
-        if peer_addr not in no_estado["peers"]:
-            no_estado["peers"].add(peer_addr)
+        adicionar_peers(no_estado, [peer_addr])
+
+        # Sincroniza por cabeçalhos: só os blocos que faltam são baixados
+        if sincronizar_com_peer(no_estado, peer_addr):
+            no_estado["logger"].info(f"Blockchain sincronizada com {peer_addr}.")
+
+        # Traz as transações pendentes do peer (as que ainda não vimos)
+        resposta = solicitar_a_peer(no_estado, peer_addr, msg_solicitar_mempool())
+        if resposta and resposta["type"] == MessageType.RESPONSE_MEMPOOL.value:
+            _receber_transacoes(no_estado, resposta["payload"].get("transactions", []), peer_addr)
+
+        # Descobre os peers do novo nó e avisa os desconhecidos (PING)
+        msg = criar_mensagem(MessageType.DISCOVER_PEERS, {}, no_estado.get("address"))
+        resposta = solicitar_a_peer(no_estado, peer_addr, msg)
+        if resposta and resposta["type"] == MessageType.PEERS_LIST.value:
+            novos_peers = set(resposta["payload"]["peers"]) - {no_estado["address"]}
+            adc = novos_peers - no_estado["peers"]
+            if (adc):
+                adicionar_peers(no_estado, adc)
+                propagar_mensagem(no_estado=no_estado, msg=criar_mensagem(MessageType.PING, {}), peers_propag=adc)
+            else:
+                no_estado["logger"].info(f"Não há peers desconhecidos na lista")
 
-        if resposta and resposta["type"] == MessageType.RESPONSE_CHAIN.value:
-            block_dict_list = resposta["payload"]["blockchain"]["chain"]
-            substituir_pela_corrente_mais_longa(no_estado, block_dict_list)
-        else:
-            no_estado["logger"].info(f"Aguardando conexão de {peer_addr} via endereço de escuta principal.")
+        no_estado["logger"].info(f"Conectado ao peer {peer_addr}")
+    except Exception as e:
+        no_estado["logger"].error(f"Falha ao conectar em {peer_addr}: {e}")
+
+# --- Conexões persistentes com os peers ---
+#
+# Cada peer tem uma conexão e uma fila de saída consumida por uma única
+# corrotina, que envia as mensagens em ordem e, para requisições, lê a
+# resposta antes de seguir. Não há threads por envio: tudo roda no loop.
+
+def _obter_conexao(no_estado: Dict[str, Any], peer_addr: str) -> Dict[str, Any]:
+    """Retorna (criando se preciso) a conexão com o peer. Só chamar no event loop."""
+    conexao = no_estado["conexoes"].get(peer_addr)
+    if conexao is None:
+        conexao = {
+            "reader": None,
+            "writer": None,
+            "codec": CODEC_JSON,
+            "sem_versao": False,  # Peer não respondeu ao VERSION: fica em JSON
+            "fila": asyncio.Queue(maxsize=FILA_MAX_POR_PEER)
+        }
+        conexao["tarefa"] = asyncio.get_running_loop().create_task(_loop_envio_peer(no_estado, peer_addr, conexao))
+        no_estado["conexoes"][peer_addr] = conexao
+    return conexao
+
+def _fechar_conexao(conexao: Dict[str, Any]):
+    if conexao["writer"] is not None:
+        conexao["writer"].close()
+    conexao["reader"] = conexao["writer"] = None
+
+def _descartar_conexao(no_estado: Dict[str, Any], peer_addr: str):
+    """Executa no event loop: encerra a conexão e falha o que ainda estava na fila."""
+    no_estado["anuncios"].pop(peer_addr, None)
+    conexao = no_estado["conexoes"].pop(peer_addr, None)
+    if conexao is None:
+        return
+    conexao["tarefa"].cancel()
+    _fechar_conexao(conexao)
+    while not conexao["fila"].empty():
+        _, _, futuro = conexao["fila"].get_nowait()
+        if futuro is not None and not futuro.done():
+            futuro.set_exception(ConnectionError(f"Peer {peer_addr} removido"))
+
+def _preparar_envio(no_estado: Dict[str, Any], msg: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Serializa a mensagem no codec preferido do nó (na thread chamadora).
+    Outros codecs são gerados sob demanda e reaproveitados entre peers.
+    """
+    codec = no_estado["codecs"][0]
+    return {"msg": msg, "tipo": msg["type"], "quadros": {codec: mensagem_para_bytes(msg, codec)}}
+
+def _quadro_no_codec(envio: Dict[str, Any], codec: str) -> bytes:
+    quadro = envio["quadros"].get(codec)
+    if quadro is None:
+        quadro = envio["quadros"][codec] = mensagem_para_bytes(envio["msg"], codec)
+    return quadro
+
+async def _abrir_conexao(conexao: Dict[str, Any], peer_addr: str):
+    host, port = peer_addr.split(":")
+    conexao["reader"], conexao["writer"] = await asyncio.wait_for(
+        asyncio.open_connection(host, int(port)), TIMEOUT_CONEXAO
+    )
 
+async def _negociar_codec(no_estado: Dict[str, Any], conexao: Dict[str, Any], peer_addr: str) -> str:
+    """
+    Handshake VERSION (sempre em JSON) logo após abrir a conexão.
+    Um peer antigo, que não conhece VERSION, pode fechar a conexão ou não
+    responder: ela é reaberta e segue em JSON, sem negociar de novo.
+    """
+    if no_estado["codecs"] == [CODEC_JSON] or conexao["sem_versao"]:
+        return CODEC_JSON
+    msg = msg_versao(no_estado["codecs"])
+    msg["sender"] = no_estado["address"]
+    dados = mensagem_para_bytes(msg)
+    try:
+        conexao["writer"].write(dados)
+        await conexao["writer"].drain()
+        _contar_trafego(no_estado, "enviados", dados)
+        quadro = await asyncio.wait_for(_ler_quadro(conexao["reader"]), TIMEOUT_CONEXAO)
+        _contar_trafego(no_estado, "recebidos", quadro)
+        resposta = bytes_para_mensagem(quadro)
+    except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+        no_estado["logger"].info(f"Peer {peer_addr} não respondeu ao VERSION; usando JSON.")
+        conexao["sem_versao"] = True
+        _fechar_conexao(conexao)
+        await _abrir_conexao(conexao, peer_addr)
+        return CODEC_JSON
+    codec = resposta.get("payload", {}).get("codec", CODEC_JSON)
+    return codec if codec in no_estado["codecs"] else CODEC_JSON
+
+async def _transmitir(no_estado: Dict[str, Any], conexao: Dict[str, Any], peer_addr: str,
+                      envio: Dict[str, Any], com_resposta: bool) -> Optional[Dict]:
+    """
+    Envia um quadro pela conexão (abrindo-a e negociando o codec se
+    necessário) e, se for uma requisição, lê a resposta.
+    Uma conexão que caiu é reaberta uma vez.
+    """
+    for tentativa in range(2):
         try:
-            conectado = False
-            resposta = None
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-                sock.settimeout(5)
-                sock.connect((host, int(port)))
-                conectado = True
-                msg = criar_mensagem(MessageType.DISCOVER_PEERS, {}, no_estado.get("address"))
-                sock.sendall(mensagem_para_bytes(msg))
-                try:
-                    #  Ler o tamanho da mensagem (4 bytes)
-                    length_data = sock.recv(4)
-                    if not length_data: 
-                        return
-
-                    length = int.from_bytes(length_data, 'big')
-        
-                    # 2. Ler o corpo da mensagem (JSON)
-                    raw_data = sock.recv(length)
-                    if not raw_data:
-                        return
-
-                    resposta = bytes_para_mensagem(raw_data)
-                    # propagar ping para a lista recebida
-                except Exception as e:
-                    no_estado["logger"].error(f":Falha ao extrair dados, é possível que o nó mande para o endereço main' {e}")
-
-                if (conectado == False):
-                    no_estado["logger"].error(f"Falha ao conectar em {peer_addr}")
-                    return
-                
-                if resposta and resposta["type"] == MessageType.PEERS_LIST.value:
-                    novos_peers = set(resposta["payload"]["peers"]) - {no_estado["address"]}
-                    adc = novos_peers - no_estado["peers"]
-                    if (adc):
-                        for p in adc:
-                            no_estado["peers"].add(p)
-                        propagar_mensagem(no_estado=no_estado, msg=criar_mensagem(MessageType.PING, {}), peers_propag=adc)
-                    else:
-                        no_estado["logger"].info(f"Não há peers desconhecidos na lista")
-                else:
-                    no_estado["logger"].info(f"Mensagem recebida no endereço principal.")
+            if conexao["writer"] is None:
+                await _abrir_conexao(conexao, peer_addr)
+                conexao["codec"] = await _negociar_codec(no_estado, conexao, peer_addr)
+            dados = _quadro_no_codec(envio, conexao["codec"])
+            conexao["writer"].write(dados)
+            await conexao["writer"].drain()
+            _contar_trafego(no_estado, "enviados", dados)
+            if com_resposta:
+                quadro = await asyncio.wait_for(_ler_quadro(conexao["reader"]), TIMEOUT_CONEXAO)
+                _contar_trafego(no_estado, "recebidos", quadro)
+                return bytes_para_mensagem(quadro)
+            return None
+        except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            _fechar_conexao(conexao)
+            if tentativa == 1:
+                raise ConnectionError(f"Falha ao enviar para {peer_addr}: {e}") from e
+
+async def _loop_envio_peer(no_estado: Dict[str, Any], peer_addr: str, conexao: Dict[str, Any]):
+    """Consome a fila de saída do peer, uma mensagem por vez."""
+    while True:
+        envio, com_resposta, futuro = await conexao["fila"].get()
+        if futuro is not None and futuro.cancelled():
+            continue
+        if em_espera(no_estado["tabela_peers"], peer_addr):
+            # Peer em backoff: nem tenta conectar (o PING de _verificar_peers reabre depois)
+            if futuro is not None and not futuro.done():
+                futuro.set_exception(ConnectionError(f"Peer {peer_addr} em espera após falhas"))
+            continue
+        try:
+            inicio = time.perf_counter()
+            resposta = await _transmitir(no_estado, conexao, peer_addr, envio, com_resposta)
+            # Só o PING mede latência: nas outras requisições o tempo inclui o processamento
+            latencia = time.perf_counter() - inicio if envio["tipo"] == MessageType.PING.value else None
+            registrar_contato(no_estado["tabela_peers"], peer_addr, latencia)
+            if futuro is not None and not futuro.done():
+                futuro.set_result(resposta)
         except Exception as e:
-            no_estado["logger"].error(f"Falha ao descobrir novos peers: {e}")
+            if registrar_falha(no_estado["tabela_peers"], peer_addr):
+                remover_peer(no_estado, peer_addr)
+            if futuro is not None and not futuro.done():
+                futuro.set_exception(e)
+
+async def _requisitar(no_estado: Dict[str, Any], peer_addr: str, envio: Dict[str, Any], com_resposta: bool) -> Optional[Dict]:
+    """Enfileira o quadro para o peer e aguarda o envio (e a resposta, se houver)."""
+    futuro = asyncio.get_running_loop().create_future()
+    fila = _obter_conexao(no_estado, peer_addr)["fila"]
+    if fila.full():
+        raise ConnectionError(f"Fila de envio para {peer_addr} cheia")
+    fila.put_nowait((envio, com_resposta, futuro))
+    return await asyncio.wait_for(futuro, TIMEOUT_CONEXAO * 3)
+
+def enviar_para_peer(no_estado: Dict[str, Any], peer_addr: str, msg: Dict[str, Any]) -> Optional[Dict]:
+    """
+    Envia uma mensagem pela conexão persistente com o peer e, se for uma
+    requisição, retorna a resposta. Bloqueia a thread chamadora (nunca
+    chamar de dentro do event loop). Falhas lançam ConnectionError.
+    """
+    envio = _preparar_envio(no_estado, msg)
+    futuro = asyncio.run_coroutine_threadsafe(
+        _requisitar(no_estado, peer_addr, envio, envio["tipo"] in TIPOS_COM_RESPOSTA),
+        no_estado["loop"]
+    )
+    return futuro.result()
 
-        no_estado["logger"].info(f"Conectado ao peer {peer_addr}")
+def solicitar_a_peer(no_estado: Dict[str, Any], peer_addr: str, msg: Dict[str, Any]) -> Optional[Dict]:
+    """Envia uma requisição a um peer e aguarda a resposta (None em caso de falha)."""
+    msg["sender"] = no_estado["address"]
+    try:
+        return enviar_para_peer(no_estado, peer_addr, msg)
     except Exception as e:
-        no_estado["logger"].error(f"Falha ao conectar em {peer_addr}: {e}")
+        no_estado["logger"].error(f"Falha na requisição {msg['type']} para {peer_addr}: {e}")
+        return None
+
+def sincronizar_com_peer(no_estado: Dict[str, Any], peer_addr: str) -> bool:
+    """
+    Sincronização 'headers-first':
+      1. Envia o locator da cadeia local e recebe só os cabeçalhos que faltam.
+      2. Valida encadeamento e PoW dos cabeçalhos (barato, sem transações).
+      3. Baixa os corpos em lotes e aplica apenas o sufixo divergente, em
+         partes: o que já foi baixado é validado e aplicado enquanto o resto
+         ainda não chegou.
+    Retorna True se a cadeia local foi atualizada.
+    """
+    blockchain = no_estado["blockchain"]
+    atualizou = False
+    while True:
+        locator = construir_locator(blockchain["instantaneo"]["chain"])
+        resposta = solicitar_a_peer(no_estado, peer_addr, msg_solicitar_cabecalhos(locator))
+        if not resposta or resposta["type"] != MessageType.RESPONSE_HEADERS.value:
+            return atualizou
+        cabecalhos = resposta["payload"]["headers"]
+        if not cabecalhos:
+            return atualizou
+
+        base = cabecalhos[0]["index"]
+        chain_local = blockchain["instantaneo"]["chain"]
+        if not 0 < base <= len(chain_local):
+            return atualizou
+        # Só vale baixar se o ramo anunciado tiver mais trabalho que o local desde 'base'
+        trabalho_local = sum(map(trabalho_do_bloco, chain_local[base:]))
+        if sum(map(trabalho_do_bloco, cabecalhos)) <= trabalho_local:
+            return atualizou
+        if not validar_sufixo(chain_local[base - 1], cabecalhos, chain_local):
+            no_estado["logger"].warning(f"Cabeçalhos inválidos recebidos de {peer_addr}.")
+            return atualizou
+
+        blocos = []
+        trabalho_baixado = 0
+        aplicados = 0
+        for i in range(0, len(cabecalhos), LOTE_BLOCOS):
+            lote = cabecalhos[i:i + LOTE_BLOCOS]
+            resposta = solicitar_a_peer(no_estado, peer_addr, msg_solicitar_blocos(lote[0]["index"], len(lote)))
+            if not resposta or resposta["type"] != MessageType.RESPONSE_BLOCKS.value:
+                return atualizou
+            recebidos = resposta["payload"]["blocks"]
+            # Os corpos precisam bater com os cabeçalhos já validados
+            if [b["hash"] for b in recebidos] != [c["hash"] for c in lote]:
+                no_estado["logger"].warning(f"Blocos de {peer_addr} não correspondem aos cabeçalhos.")
+                return atualizou
+            blocos.extend(recebidos)
+            trabalho_baixado += sum(map(trabalho_do_bloco, lote))
+
+            # Valida quando há blocos suficientes para o pipeline paralelo (ou no
+            # último lote) e só se eles já deixam a cadeia recebida mais pesada;
+            # os blocos aplicados numa rodada anterior não são validados de novo
+            ultimo_lote = i + LOTE_BLOCOS >= len(cabecalhos)
+            if not ultimo_lote and (len(blocos) - aplicados < MIN_BLOCOS_PARALELO
+                                    or trabalho_baixado <= trabalho_local):
+                continue
+            if not substituir_pela_corrente_mais_longa(no_estado, blocos):
+                return atualizou
+            atualizou = True
+            aplicados = len(blocos)
+            no_estado["logger"].info(f"{aplicados}/{len(cabecalhos)} blocos sincronizados a partir de {peer_addr}.")
+
+        # Respostas incompletas indicam que não há mais cabeçalhos a buscar
+        if len(cabecalhos) < MAX_CABECALHOS:
+            return atualizou
+
+def confirmar_pagamento(no_estado: Dict[str, Any], tx_id: str) -> Optional[Dict]:
+    """
+    Confirma um pagamento como cliente leve: pede aos peers a prova de
+    Merkle da transação em vez de baixar os blocos. O cabeçalho da prova
+    precisa estar na cadeia local (ver verificar_prova_transacao).
+    Retorna a prova válida encontrada ou None.
+    """
+    for peer in ordenar_peers(no_estado["tabela_peers"], no_estado["peers"]):
+        resposta = solicitar_a_peer(no_estado, peer, msg_solicitar_prova(tx_id))
+        if not resposta or resposta["type"] != MessageType.RESPONSE_TX_PROOF.value:
+            continue
+        if verificar_prova_transacao(no_estado["blockchain"], resposta["payload"], tx_id):
+            return resposta["payload"]
+    return None
+
+def submeter_lote(no_estado: Dict[str, Any], peer_addr: str, transacoes: List[Dict]) -> Optional[Dict]:
+    """
+    Envia um lote de transações prontas a um nó (SUBMIT_TRANSACTIONS).
+    Retorna o payload da resposta ({"aceitas", "recusadas"}) ou None se o
+    peer não respondeu.
+    """
+    resposta = solicitar_a_peer(no_estado, peer_addr, msg_submeter_transacoes(transacoes))
+    if not resposta or resposta["type"] != MessageType.RESPONSE_SUBMIT.value:
+        return None
+    return resposta["payload"]
 
 def propagar_mensagem(no_estado: Dict[str, Any], msg: Dict[str, Any], peers_propag: set() = None):
-    """Envia uma mensagem para todos os conhecidos (Broadcast)."""
+    """
+    Envia uma mensagem para todos os conhecidos (Broadcast).
+    Não bloqueia: a mensagem é serializada uma vez e entregue às filas de
+    saída dos peers pelo event loop.
+    """
     msg["sender"] = no_estado["address"] # Atualiza quem está enviando agora
-    no_estado["logger"].info(f"Mensagem {msg["type"]} propagada para {len(peers_propag)} peers.")
-    for peer in list(peers_propag):
-        
-        def enviar():
-            try:
-                h, p = peer.split(":")
-                conectado = False
-                resposta = None
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                    s.settimeout(5)
-                    s.connect((h, int(p)))
-                    s.sendall(mensagem_para_bytes(msg))
-
-                    try:
-                        #  Ler o tamanho da mensagem (4 bytes)
-                        length_data = s.recv(4)
-                        if not length_data: 
-                            return
-
-                        length = int.from_bytes(length_data, 'big')
-
-                        # 2. Ler o corpo da mensagem (JSON)
-                        raw_data = s.recv(length)
-                        if not raw_data:
-                            return
-
-                        resposta = bytes_para_mensagem(raw_data)
-                        if resposta and resposta["type"] == MessageType.RESPONSE_CHAIN.value:
-                            chain_recebida = resposta["payload"]["blockchain"]["chain"]
-                            if substituir_pela_corrente_mais_longa(no_estado, chain_recebida):
-                                no_estado["logger"].info("Blockchain sincronizada com a versão mais longa dos peers.")
-
-                    except Exception as e:
-                        no_estado["logger"].error(f"Falha ao conectar: {e}")
-
-            except:
-                pass # Peer offline, ignorar ou remover da lista
-        
-        threading.Thread(target=enviar).start()
\ No newline at end of file
+    if peers_propag is None:
+        # Broadcast: só os melhores peers disponíveis (os que estão em espera ficam de fora)
+        peers_propag = escolher_peers(no_estado["tabela_peers"], no_estado["peers"])
+    peers = list(peers_propag)
+    no_estado["logger"].info(f"Mensagem {msg['type']} propagada para {len(peers)} peers.")
+    envio = _preparar_envio(no_estado, msg)
+    com_resposta = envio["tipo"] in TIPOS_COM_RESPOSTA
+    no_estado["loop"].call_soon_threadsafe(_propagar, no_estado, peers, envio, com_resposta)
+
+def _propagar(no_estado: Dict[str, Any], peers: List[str], envio: Dict[str, Any], com_resposta: bool):
+    """Executa no event loop: coloca o quadro na fila de cada peer."""
+    for peer in peers:
+        if not com_resposta:
+            fila = _obter_conexao(no_estado, peer)["fila"]
+            if fila.full():
+                no_estado["logger"].warning(f"Fila de envio para {peer} cheia; mensagem descartada.")
+            else:
+                fila.put_nowait((envio, False, None))
+            continue
+        tarefa = asyncio.ensure_future(_requisitar(no_estado, peer, envio, True))
+        tarefa.add_done_callback(lambda t: _tratar_resposta_propagada(no_estado, t))
+
+# --- Anúncios (INV) agrupados por peer ---
+
+def anunciar(no_estado: Dict[str, Any], itens: List, exceto: set = frozenset()):
+    """
+    Agenda o anúncio dos itens (tipo, id) para todos os peers, menos 'exceto'.
+    Os anúncios de um peer são agrupados num único INV a cada
+    INTERVALO_ANUNCIO, em vez de uma mensagem por item.
+    """
+    peers = escolher_peers(no_estado["tabela_peers"], [p for p in no_estado["peers"] if p not in exceto])
+    if not peers or not no_estado["running"]:
+        return
+    itens = [list(item) for item in itens]
+    no_estado["loop"].call_soon_threadsafe(_enfileirar_anuncio, no_estado, peers, itens)
+
+def _enfileirar_anuncio(no_estado: Dict[str, Any], peers: List[str], itens: List[List[str]]):
+    """Executa no event loop."""
+    loop = no_estado["loop"]
+    for peer in peers:
+        pendentes = no_estado["anuncios"].setdefault(peer, [])
+        if not pendentes:
+            loop.call_later(INTERVALO_ANUNCIO, _descarregar_anuncios, no_estado, peer)
+        pendentes.extend(itens)
+        if len(pendentes) >= MAX_ITENS_INV:
+            _descarregar_anuncios(no_estado, peer)
+
+def _descarregar_anuncios(no_estado: Dict[str, Any], peer: str):
+    """Executa no event loop: envia o INV acumulado para o peer."""
+    itens = no_estado["anuncios"].pop(peer, None)
+    if not itens or not no_estado["running"]:
+        return
+    msg = msg_inventario(itens)
+    msg["sender"] = no_estado["address"]
+    fila = _obter_conexao(no_estado, peer)["fila"]
+    if fila.full():
+        no_estado["logger"].warning(f"Fila de envio para {peer} cheia; anúncio descartado.")
+    else:
+        fila.put_nowait((_preparar_envio(no_estado, msg), False, None))
+
+def _tratar_resposta_propagada(no_estado: Dict[str, Any], tarefa: "asyncio.Future"):
+    """Respostas a requisições em broadcast (ex: REQUEST_CHAIN legado) vão para o executor."""
+    if tarefa.cancelled() or tarefa.exception() is not None:
+        return # Peer offline: a falha já foi contada em _loop_envio_peer
+    resposta = tarefa.result()
+    if resposta and resposta["type"] == MessageType.RESPONSE_CHAIN.value:
+        chain_recebida = resposta["payload"]["blockchain"]["chain"]
+        no_estado["executor"].submit(substituir_pela_corrente_mais_longa, no_estado, chain_recebida)
+
+# --- Verificação de vida dos peers ---
+
+def _verificar_peers(no_estado: Dict[str, Any]):
+    """
+    Executa no event loop, a cada INTERVALO_VERIFICACAO: manda PING aos
+    peers sem contato recente e aos que saíram da espera. O resultado é
+    registrado por _loop_envio_peer (latência ou falha).
+    """
+    if not no_estado["running"]:
+        return
+    ping = msg_ping()
+    ping["sender"] = no_estado["address"]
+    envio = None
+    for peer in peers_para_verificar(no_estado["tabela_peers"], no_estado["peers"]):
+        envio = envio or _preparar_envio(no_estado, ping)
+        tarefa = asyncio.ensure_future(_requisitar(no_estado, peer, envio, True))
+        tarefa.add_done_callback(lambda t: t.cancelled() or t.exception())
+    no_estado["loop"].call_later(INTERVALO_VERIFICACAO, _verificar_peers, no_estado)
+
+def _verificar_snapshot(no_estado: Dict[str, Any]):
+    """
+    Executa no event loop, a cada INTERVALO_VERIFICACAO: se a cadeia em disco
+    cresceu SNAPSHOT_A_CADA_BLOCOS desde o último snapshot, grava outro no
+    executor (a gravação pega o lock da blockchain e faz fsync).
+    """
+    if not no_estado["running"]:
+        return
+    if snapshot_pendente(no_estado["blockchain"]):
+        no_estado["executor"].submit(salvar_snapshot, no_estado["blockchain"])
+    no_estado["loop"].call_later(INTERVALO_VERIFICACAO, _verificar_snapshot, no_estado)
@@ -0,0 +1,132 @@
+# Funções utilitárias para a tabela de peers
+#
+# Para cada peer guardamos a latência (média móvel dos PING/PONG), as
+# falhas seguidas de envio e o último contato. Um peer que falha fica em
+# espera (backoff exponencial) e não é escolhido para o gossip; o que
+# estava na fila para ele falha na hora, sem contar como nova falha (conta
+# no máximo uma por espera). Depois de MAX_FALHAS seguidas sai da tabela. O broadcast vai só para FANOUT peers
+# disponíveis: metade os de menor latência e metade sorteada entre os
+# demais. Sem o sorteio, todos os nós escolheriam os mesmos "melhores" e
+# quem ficasse de fora não receberia o anúncio de ninguém.
+#
+# O conjunto de peers em si continua em no_estado["peers"]; aqui fica só
+# o que se sabe de cada um.
+
+import time
+import random
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+FANOUT = 8                   # Peers que recebem cada broadcast
+FANOUT_ALEATORIO = 4         # Quantas dessas vagas são sorteadas entre os demais
+MAX_FALHAS = 11              # Falhas seguidas até o peer ser removido
+BACKOFF_INICIAL = 1.0        # Segundos de espera após a primeira falha (dobra a cada falha)
+BACKOFF_MAXIMO = 300.0       # Atingido na 10ª falha: o peer é removido após ~13 min sem resposta
+LATENCIA_DESCONHECIDA = 0.5  # Segundos assumidos para quem ainda não respondeu a um PING
+PESO_LATENCIA = 0.3          # Peso da medida nova na média móvel
+INTERVALO_PING = 30.0        # Peers sem contato há mais que isso recebem um PING de verificação
+
+def criar_tabela_peers() -> Dict[str, Any]:
+    """Inicializa a tabela de informações dos peers."""
+    return {
+        "info": {},               # peer -> {"latencia", "falhas", "ultimo_contato", "espera_ate"}
+        "lock": threading.Lock(), # Atualizada pelo event loop e lida pelas threads do executor
+    }
+
+def _info(tabela: Dict[str, Any], peer: str) -> Dict[str, Any]:
+    info = tabela["info"].get(peer)
+    if info is None:
+        info = tabela["info"][peer] = {"latencia": None, "falhas": 0, "ultimo_contato": 0.0, "espera_ate": 0.0}
+    return info
+
+def registrar_contato(tabela: Dict[str, Any], peer: str, latencia: Optional[float] = None):
+    """O peer respondeu (ou nos enviou algo): zera as falhas e atualiza a latência, se medida."""
+    with tabela["lock"]:
+        info = _info(tabela, peer)
+        info["falhas"] = 0
+        info["espera_ate"] = 0.0
+        info["ultimo_contato"] = time.monotonic()
+        if latencia is not None:
+            anterior = info["latencia"]
+            info["latencia"] = latencia if anterior is None else \
+                anterior + PESO_LATENCIA * (latencia - anterior)
+
+def registrar_falha(tabela: Dict[str, Any], peer: str) -> bool:
+    """
+    Conta uma falha de envio e coloca o peer em espera. Falhas durante a
+    espera (mensagens que já estavam na fila) não contam.
+    Retorna True quando ele atingiu MAX_FALHAS e deve ser removido.
+    """
+    with tabela["lock"]:
+        info = _info(tabela, peer)
+        if info["espera_ate"] > time.monotonic():
+            return False
+        info["falhas"] += 1
+        espera = min(BACKOFF_INICIAL * 2 ** (info["falhas"] - 1), BACKOFF_MAXIMO)
+        info["espera_ate"] = time.monotonic() + espera
+        return info["falhas"] >= MAX_FALHAS
+
+def em_espera(tabela: Dict[str, Any], peer: str) -> bool:
+    with tabela["lock"]:
+        info = tabela["info"].get(peer)
+        return info is not None and info["espera_ate"] > time.monotonic()
+
+def esquecer_peer(tabela: Dict[str, Any], peer: str):
+    with tabela["lock"]:
+        tabela["info"].pop(peer, None)
+
+def _pontuacao(info: Optional[Dict[str, Any]]) -> float:
+    """Menor é melhor: latência, piorada pelas falhas recentes."""
+    if info is None:
+        return LATENCIA_DESCONHECIDA
+    latencia = info["latencia"] if info["latencia"] is not None else LATENCIA_DESCONHECIDA
+    return latencia * (1 + info["falhas"])
+
+def _disponiveis(tabela: Dict[str, Any], peers: Iterable[str], agora: float) -> List[str]:
+    info = tabela["info"]
+    return [p for p in peers if p not in info or info[p]["espera_ate"] <= agora]
+
+def ordenar_peers(tabela: Dict[str, Any], peers: Iterable[str]) -> List[str]:
+    """Peers disponíveis (fora de espera), do melhor para o pior."""
+    with tabela["lock"]:
+        disponiveis = _disponiveis(tabela, peers, time.monotonic())
+        random.shuffle(disponiveis)  # Empates (ex: latência desconhecida) não saem sempre na mesma ordem
+        return sorted(disponiveis, key=lambda p: _pontuacao(tabela["info"].get(p)))
+
+def escolher_peers(tabela: Dict[str, Any], peers: Iterable[str], limite: Optional[int] = None) -> List[str]:
+    """
+    Destinos de um broadcast: os melhores peers disponíveis, até 'limite'
+    (padrão: FANOUT). FANOUT_ALEATORIO das vagas são sorteadas entre os
+    que ficaram de fora.
+    """
+    if limite is None:
+        limite = FANOUT
+    ordenados = ordenar_peers(tabela, peers)
+    if len(ordenados) <= limite:
+        return ordenados
+    sorteados = min(FANOUT_ALEATORIO, limite)
+    escolhidos = ordenados[:limite - sorteados]
+    return escolhidos + random.sample(ordenados[limite - sorteados:], sorteados)
+
+def peers_para_verificar(tabela: Dict[str, Any], peers: Iterable[str], intervalo: float = INTERVALO_PING) -> List[str]:
+    """
+    Peers disponíveis sem contato há mais de 'intervalo' segundos, que
+    saíram da espera ou cuja latência ainda não foi medida.
+    """
+    agora = time.monotonic()
+    with tabela["lock"]:
+        info = tabela["info"]
+        return [p for p in _disponiveis(tabela, peers, agora)
+                if p not in info or info[p]["latencia"] is None or info[p]["falhas"]
+                or agora - info[p]["ultimo_contato"] > intervalo]
+
+def resumo_peers(tabela: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Cópia das informações, para exibição (latência em ms)."""
+    agora = time.monotonic()
+    with tabela["lock"]:
+        return {peer: {
+            "latencia_ms": round(info["latencia"] * 1000, 2) if info["latencia"] is not None else None,
+            "falhas": info["falhas"],
+            "em_espera": info["espera_ate"] > agora,
+            "sem_contato_s": round(agora - info["ultimo_contato"], 1) if info["ultimo_contato"] else None,
+        } for peer, info in tabela["info"].items()}
@@ -2,7 +2,8 @@
 
 import json
 from enum import Enum
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
+from .codec import CODEC_JSON, CODEC_BINARIO, codificar, decodificar, eh_binario
 
 class MessageType(Enum):
     """Tipos de mensagens."""
@@ -16,25 +17,78 @@ class MessageType(Enum):
     PONG = "PONG"
     DISCOVER_PEERS = "DISCOVER_PEERS"
     PEERS_LIST = "PEERS_LIST"
+    REQUEST_HEADERS = "REQUEST_HEADERS"
+    RESPONSE_HEADERS = "RESPONSE_HEADERS"
+    REQUEST_BLOCKS = "REQUEST_BLOCKS"
+    RESPONSE_BLOCKS = "RESPONSE_BLOCKS"
+    REQUEST_TX_PROOF = "REQUEST_TX_PROOF"
+    RESPONSE_TX_PROOF = "RESPONSE_TX_PROOF"
+    VERSION = "VERSION"
+    INV = "INV"
+    GETDATA = "GETDATA"
+    SUBMIT_TRANSACTIONS = "SUBMIT_TRANSACTIONS"
+    RESPONSE_SUBMIT = "RESPONSE_SUBMIT"
+
+# Requisições que sempre recebem uma resposta na mesma conexão.
+# As demais mensagens são só notificações: quem envia não espera retorno.
+TIPOS_COM_RESPOSTA = {
+    MessageType.PING.value,
+    MessageType.DISCOVER_PEERS.value,
+    MessageType.REQUEST_CHAIN.value,
+    MessageType.REQUEST_HEADERS.value,
+    MessageType.REQUEST_BLOCKS.value,
+    MessageType.REQUEST_TX_PROOF.value,
+    MessageType.REQUEST_MEMPOOL.value,
+    MessageType.VERSION.value,
+    MessageType.SUBMIT_TRANSACTIONS.value,
+}
+
+VERSAO_PROTOCOLO = 1
+# Em ordem de preferência. No "benchmarks.py codec" (100 blocos x 20 txs)
+# o binário codifica em ~5 ms e decodifica em ~4 ms, contra ~8 ms e ~5 ms
+# do JSON, com ~3x menos bytes. O JSON fica para nós que não negociam.
+CODECS_SUPORTADOS = [CODEC_BINARIO, CODEC_JSON]
+
+TAMANHO_MAXIMO_MENSAGEM = 64 * 1024 * 1024  # Protege contra cabeçalhos de tamanho corrompidos
 
 # --- Funções de Serialização ---
 
-def mensagem_para_bytes(mensagem: Dict[str, Any]) -> bytes:
+def mensagem_para_bytes(mensagem: Dict[str, Any], codec: str = CODEC_JSON) -> bytes:
     """
     Converte um dicionário de mensagem em bytes com cabeçalho de tamanho.
-    Estrutura: [4 bytes de tamanho (Big Endian)] + [Corpo JSON em UTF-8]
+    Estrutura: [4 bytes de tamanho (Big Endian)] + [Corpo JSON em UTF-8 ou binário]
+    O codec binário só deve ser usado se o peer o aceitou no VERSION.
     """
     # Garantir que o tipo seja a string do valor do Enum se necessário
     if isinstance(mensagem["type"], MessageType):
         mensagem["type"] = mensagem["type"].value
-    corpo_json = json.dumps(mensagem).encode('utf-8')
-    tamanho = len(corpo_json)
-    return tamanho.to_bytes(4, 'big') + corpo_json
+    if codec == CODEC_BINARIO:
+        corpo = codificar(mensagem)
+    else:
+        corpo = json.dumps(mensagem).encode('utf-8')
+    tamanho = len(corpo)
+    return tamanho.to_bytes(4, 'big') + corpo
 
 def bytes_para_mensagem(dados: bytes) -> Dict[str, Any]:
-    """Converte bytes recebidos do socket de volta para um dicionário."""
+    """
+    Converte bytes recebidos do socket de volta para um dicionário.
+    O formato é detectado pelo primeiro byte (JSON sempre começa com '{').
+    """
+    if eh_binario(dados):
+        return decodificar(dados)
     return json.loads(dados.decode('utf-8'))
 
+def codec_do_corpo(dados: bytes) -> str:
+    """Retorna o codec em que um corpo recebido foi serializado."""
+    return CODEC_BINARIO if eh_binario(dados) else CODEC_JSON
+
+def escolher_codec(oferecidos: List[str], aceitos: List[str]) -> str:
+    """Primeiro codec da nossa preferência que o peer também oferece (JSON é o fallback)."""
+    for codec in aceitos:
+        if codec in oferecidos:
+            return codec
+    return CODEC_JSON
+
 # --- Factory Functions (Substituem a classe Protocol) ---
 
 def criar_mensagem(tipo: MessageType, payload: Dict, sender: str = "") -> Dict[str, Any]:
@@ -57,14 +111,58 @@ def msg_solicitar_chain() -> Dict:
 def msg_resposta_chain(blockchain_dict: Dict) -> Dict:
     return criar_mensagem(MessageType.RESPONSE_CHAIN, {"blockchain": blockchain_dict})
 
-def msg_solicitar_mempool() -> Dict:
-    return criar_mensagem(MessageType.REQUEST_MEMPOOL, {})
+def msg_solicitar_cabecalhos(locator: List[List]) -> Dict:
+    # locator: pares [index, hash] do topo da cadeia local até o gênesis
+    return criar_mensagem(MessageType.REQUEST_HEADERS, {"locator": locator})
+
+def msg_resposta_cabecalhos(cabecalhos: List[Dict]) -> Dict:
+    return criar_mensagem(MessageType.RESPONSE_HEADERS, {"headers": cabecalhos})
+
+def msg_solicitar_blocos(inicio: int, quantidade: int) -> Dict:
+    return criar_mensagem(MessageType.REQUEST_BLOCKS, {"inicio": inicio, "quantidade": quantidade})
+
+def msg_resposta_blocos(blocos: List[Dict]) -> Dict:
+    return criar_mensagem(MessageType.RESPONSE_BLOCKS, {"blocks": blocos})
+
+def msg_solicitar_mempool(limite: int = None) -> Dict:
+    # limite: quantas transações (as de maior prioridade) o peer deve enviar
+    return criar_mensagem(MessageType.REQUEST_MEMPOOL, {"limite": limite} if limite else {})
 
 def msg_resposta_mempool(transacoes: List[Dict]) -> Dict:
     return criar_mensagem(MessageType.RESPONSE_MEMPOOL, {"transactions": transacoes})
 
+def msg_inventario(itens: List[List[str]]) -> Dict:
+    # itens: pares [tipo, id], tipo "tx" (id da transação) ou "bloco" (hash)
+    return criar_mensagem(MessageType.INV, {"itens": itens})
+
+def msg_solicitar_dados(itens: List[List[str]]) -> Dict:
+    # Pede os corpos de itens anunciados; chegam como RESPONSE_MEMPOOL / NEW_BLOCK
+    return criar_mensagem(MessageType.GETDATA, {"itens": itens})
+
+def msg_submeter_transacoes(transacoes: List[Dict]) -> Dict:
+    # Lote já montado (e assinado, se for o caso) pelo cliente; admitido inteiro ou recusado
+    return criar_mensagem(MessageType.SUBMIT_TRANSACTIONS, {"transactions": transacoes})
+
+def msg_resultado_submissao(aceitas: int, recusadas: List[List[str]]) -> Dict:
+    # recusadas: pares [id, motivo]; vazia quando o lote inteiro entrou na mempool
+    return criar_mensagem(MessageType.RESPONSE_SUBMIT, {"aceitas": aceitas, "recusadas": recusadas})
+
 def msg_ping() -> Dict:
     return criar_mensagem(MessageType.PING, {})
 
 def msg_pong() -> Dict:
-    return criar_mensagem(MessageType.PONG, {})
\ No newline at end of file
+    return criar_mensagem(MessageType.PONG, {})
+
+def msg_solicitar_prova(tx_id: str) -> Dict:
+    return criar_mensagem(MessageType.REQUEST_TX_PROOF, {"tx_id": tx_id})
+
+def msg_resposta_prova(prova: Optional[Dict]) -> Dict:
+    # prova: {"transaction", "header", "proof"} ou None se a transação não foi encontrada
+    return criar_mensagem(MessageType.RESPONSE_TX_PROOF, prova or {"transaction": None})
+
+def msg_versao(codecs: List[str], codec: str = None) -> Dict:
+    # Handshake: a requisição lista os codecs aceitos; a resposta traz o escolhido
+    payload = {"versao": VERSAO_PROTOCOLO, "codecs": codecs}
+    if codec:
+        payload["codec"] = codec
+    return criar_mensagem(MessageType.VERSION, payload)
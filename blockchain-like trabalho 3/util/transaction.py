@@ -5,10 +5,11 @@ import time
 from typing import Any, Dict
 
 def criar_transacao(origem: str, destino: str, valor: float, 
-                     id_transacao: str = None, timestamp: float = None) -> Dict[str, Any]:
+                     id_transacao: str = None, timestamp: float = None, taxa: float = 0.0) -> Dict[str, Any]:
     """
     Cria uma estrutura de dados (dicionário) para uma transação.
     Substitui o antigo construtor da classe Transaction.
+    A taxa é opcional: vai para o minerador e dá prioridade na mempool.
     """
     
     # Se não for passado um ID ou timestamp (ex: nova transação), gera na hora
@@ -19,6 +20,9 @@ def criar_transacao(origem: str, destino: str, valor: float,
         "valor": valor,
         "timestamp": timestamp if timestamp else time.time()
     }
+    # O campo só existe quando há taxa, para não mudar o formato (e o hash) das demais
+    if taxa:
+        transacao["taxa"] = taxa
     
     # Validação imediata (Baseada no __post_init__)
     validar_estrutura_transacao(transacao)
@@ -32,6 +36,9 @@ def validar_estrutura_transacao(transacao: Dict[str, Any]) -> bool:
     """
     if transacao["valor"] <= 0:
         raise ValueError("Erro: O valor da transação deve ser positivo.")
+
+    if transacao.get("taxa", 0.0) < 0:
+        raise ValueError("Erro: A taxa da transação não pode ser negativa.")
     
     if not transacao["origem"] or not transacao["destino"]:
         raise ValueError("Erro: Origem e destino são obrigatórios.")
@@ -0,0 +1,193 @@
+# Pipeline de validação de blocos em dois estágios
+#
+# 1. Estágio paralelizável (pool de processos, se pedido): o que depende só
+#    do próprio bloco — estrutura das transações, merkle root, hash do
+#    cabeçalho e PoW contra o alvo declarado.
+# 2. Estágio sequencial (no nó, barato): encadeamento, alvo exigido,
+#    timestamp e saldos, que dependem dos blocos anteriores.
+# Os blocos vão aos workers em lotes e os resultados são consumidos em
+# ordem; a cada lote aprovado 'ao_progredir' recebe o total já verificado,
+# para que quem chamou possa aplicar esse prefixo sem esperar o resto.
+
+import multiprocessing
+from collections import ChainMap
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+from .block import calcular_hash_bloco, validar_proof_of_work, validar_merkle_root
+from .transaction import validar_estrutura_transacao
+from .mempool import custo_transacao
+from .dificuldade import alvo_e_tempo_validos
+
+LOTE_VALIDACAO = 128        # Blocos por tarefa enviada a um worker
+MIN_BLOCOS_PARALELO = 256   # Abaixo disso, mandar os blocos ao pool custa mais que validá-los aqui
+# Workers do estágio paralelo por padrão. No "benchmarks.py validacao" (1000
+# blocos, pool já iniciado) o pool perde: ~353 ms aqui contra ~398 ms com 2
+# processos e ~434 ms com 4, e o 1º prefixo sai em ~44 ms contra 122/192 ms
+# (os blocos são baratos de verificar e caros de serializar). Só aumentar
+# com uma medição que mostre ganho.
+PROCESSOS_VALIDACAO = 1
+ORIGENS_RESERVADAS = ("genesis", "coinbase")  # Origens que emitem moeda (só dentro dos blocos)
+RECOMPENSA_MINERACAO = 50.0  # Moeda nova por bloco (a coinbase leva também as taxas)
+
+# Pool de processos reaproveitado entre validações (criado sob demanda)
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_processos = 0
+
+# --- Estágio paralelo (executa nos workers) ---
+
+def _estrutura_valida(bloco: Dict[str, Any]) -> bool:
+    try:
+        for tx in bloco["transactions"]:
+            validar_estrutura_transacao(tx)
+    except (ValueError, KeyError, TypeError):
+        return False
+    return True
+
+def validar_bloco_isolado(bloco: Dict[str, Any]) -> bool:
+    """
+    Verificações que não dependem de outros blocos. Também aceita
+    cabeçalhos puros (sem 'transactions').
+    """
+    if "transactions" in bloco and not (_estrutura_valida(bloco) and validar_merkle_root(bloco)):
+        return False
+    return bloco["hash"] == calcular_hash_bloco(bloco) and validar_proof_of_work(bloco)
+
+def _validar_lote(blocos: List[Dict]) -> List[bool]:
+    """Resultado por bloco; depois do primeiro inválido o resto nem é verificado."""
+    resultado = []
+    for bloco in blocos:
+        if not validar_bloco_isolado(bloco):
+            break
+        resultado.append(True)
+    return resultado + [False] * (len(blocos) - len(resultado))
+
+def _obter_pool(processos: int) -> ProcessPoolExecutor:
+    """Cria (ou reaproveita) o pool de workers de validação."""
+    global _pool, _pool_processos
+    if _pool is None or _pool_processos != processos:
+        encerrar_validadores()
+        # 'spawn' pelo mesmo motivo da mineração: não herdar locks das threads do nó
+        _pool = ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context("spawn"))
+        _pool_processos = processos
+    return _pool
+
+def encerrar_validadores():
+    """Finaliza o pool de processos de validação, se existir."""
+    global _pool, _pool_processos
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+        _pool_processos = 0
+
+def _resultados_em_ordem(lotes: List[List[Dict]], processos: int) -> Iterator[List[bool]]:
+    """Resultados do estágio paralelo, lote a lote, na ordem dos blocos."""
+    if processos <= 1:
+        for lote in lotes:
+            yield _validar_lote(lote)
+        return
+    pool = _obter_pool(processos)
+    futuros = [pool.submit(_validar_lote, lote) for lote in lotes]
+    try:
+        for futuro in futuros:
+            yield futuro.result()
+    finally:
+        # Um bloco inválido interrompe o consumo: o que ainda não começou é descartado
+        for futuro in futuros:
+            futuro.cancel()
+
+# --- Estágio sequencial ---
+
+def encadeado(anterior: Dict[str, Any], bloco: Dict[str, Any]) -> bool:
+    """Confere se 'bloco' vem logo depois de 'anterior'."""
+    return bloco["index"] == anterior["index"] + 1 and bloco["previous_hash"] == anterior["hash"]
+
+def _mover_saldos(saldos, bloco: Dict[str, Any], sinal: int):
+    for tx in bloco["transactions"]:
+        saldos[tx["destino"]] = saldos.get(tx["destino"], 0.0) + sinal * tx["valor"]
+        saldos[tx["origem"]] = saldos.get(tx["origem"], 0.0) - sinal * custo_transacao(tx)
+
+def aplicar_saldos(saldos, bloco: Dict[str, Any]) -> bool:
+    """
+    Aplica as transações do bloco em 'saldos' (uma cópia de trabalho),
+    na ordem, e confere que nenhuma origem gasta mais do que tem.
+    Moeda nova só entra por uma coinbase, a primeira transação, de no máximo
+    RECOMPENSA_MINERACAO mais as taxas do bloco; "genesis" só vale no bloco 0.
+    Retorna False na primeira violação (os saldos ficam pela metade).
+    """
+    transacoes = bloco["transactions"]
+    taxas = sum(tx.get("taxa", 0.0) for tx in transacoes[1:])
+    for posicao, tx in enumerate(transacoes):
+        origem = tx["origem"]
+        custo = custo_transacao(tx)
+        if origem == "coinbase":
+            if posicao != 0 or tx["valor"] > RECOMPENSA_MINERACAO + taxas + 1e-9:
+                return False
+        elif origem == "genesis":
+            if bloco["index"] != 0:
+                return False
+        elif saldos.get(origem, 0.0) < custo - 1e-9:
+            return False
+        saldos[origem] = saldos.get(origem, 0.0) - custo
+        saldos[tx["destino"]] = saldos.get(tx["destino"], 0.0) + tx["valor"]
+    return True
+
+def saldos_na_altura(instantaneo: Dict[str, Any], altura: int) -> ChainMap:
+    """
+    Saldos logo após o bloco 'altura - 1', a partir de um instantâneo:
+    os blocos acima são desfeitos numa camada de rascunho, sem copiar o índice.
+    """
+    saldos = ChainMap({}, instantaneo["saldos"])
+    for bloco in reversed(instantaneo["chain"][altura:]):
+        _mover_saldos(saldos, bloco, -1)
+    return saldos
+
+# --- Pipeline ---
+
+def validar_blocos(
+    ancora: Dict[str, Any],
+    blocos: List[Dict],
+    cadeia_local: Sequence[Dict],
+    saldos=None,
+    ao_progredir: Optional[Callable[[int], None]] = None,
+    conhecidos=frozenset(),
+    processos: int = PROCESSOS_VALIDACAO
+) -> int:
+    """
+    Valida a sequência 'blocos' a partir de 'ancora' (bloco já aceito).
+    Retorna quantos blocos do início são válidos (len(blocos) se todos).
+
+    cadeia_local: cadeia que contém a âncora (e os blocos abaixo dela),
+    lida para calcular o alvo exigido e a mediana dos timestamps.
+    saldos: saldos logo após a âncora (é alterado); None pula a conferência
+    de saldos, como para cabeçalhos.
+    ao_progredir: recebe o total verificado ao fim de cada lote aprovado.
+    conhecidos: hashes de blocos já validados pelo nó, que pulam o estágio
+    paralelo (o encadeamento e os saldos são conferidos do mesmo jeito).
+    processos: workers do estágio paralelo (padrão: PROCESSOS_VALIDACAO,
+    tudo neste processo); com poucos blocos a validação roda toda aqui.
+    """
+    if len(blocos) < MIN_BLOCOS_PARALELO:
+        processos = 1
+
+    base = ancora["index"] + 1
+
+    def obter_bloco(altura: int) -> Dict[str, Any]:
+        return blocos[altura - base] if altura >= base else cadeia_local[altura]
+
+    lotes = [blocos[i:i + LOTE_VALIDACAO] for i in range(0, len(blocos), LOTE_VALIDACAO)]
+    pendentes = [[b for b in lote if b["hash"] not in conhecidos] for lote in lotes]
+    anterior = ancora
+    verificados = 0
+    for lote, resultados in zip(lotes, _resultados_em_ordem(pendentes, processos)):
+        resultados = iter(resultados)
+        for bloco in lote:
+            isolado_ok = bloco["hash"] in conhecidos or next(resultados)
+            if not (isolado_ok and encadeado(anterior, bloco) and alvo_e_tempo_validos(obter_bloco, bloco)):
+                return verificados
+            if saldos is not None and not aplicar_saldos(saldos, bloco):
+                return verificados
+            anterior = bloco
+            verificados += 1
+        if ao_progredir:
+            ao_progredir(verificados)
+    return verificados